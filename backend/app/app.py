@@ -2,17 +2,26 @@ import logging.config
 import asyncio
 import traceback
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 
+from .crud.user import user_loader_scope
 from .db.mongodb_utils import close_mongo_connection, connect_to_mongo
 from .routers.estimate import router as estimates_router
 from .logging.logging_config import LOGGING
-from .s3.file_ops import daily_backup_file
+from .s3.file_ops import daily_backup_file, reconcile_listing_cache
+from .s3.client import close_client
+from .s3.audit_log import close_damage_log
+from .s3.delta_log import compact_all_patched_json
+from .s3.rename import resume_renames
+from .s3.staging import prune_staged_pdfs
+from .config import settings
 from .routers.order import router as orders_router
 from .routers.room import router as rooms_router
 from .routers.user import router as users_router
+from .routers.stats import router as stats_router
+from .routers.storage import router as storage_router
 from .repair_tools.repare import router as repair_router
 from .shedule.json_check_schedule import get_fpo_list_with_pdf
 from pytz import timezone
@@ -41,12 +50,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def load_users_per_request(request: Request, call_next):
+    # Coalesces the user lookups of one request into batched queries
+    with user_loader_scope():
+        return await call_next(request)
+
+
 scheduler = AsyncIOScheduler()
 
 app.add_event_handler("startup", connect_to_mongo)
 app.add_event_handler("startup", lambda: scheduler.start())
 app.add_event_handler("shutdown", close_mongo_connection)
 app.add_event_handler("shutdown", lambda: scheduler.shutdown())
+app.add_event_handler("shutdown", close_damage_log)
+app.add_event_handler("shutdown", close_client)
 
 
 @app.on_event("startup")
@@ -58,6 +77,11 @@ async def schedule_periodic_tasks():
     # This cod will run the planner every hour
     scheduler.add_job(periodic_task, "interval", hours=1)
     scheduler.add_job(backup_damage_file, CronTrigger(hour=7, timezone=timezone('Europe/Moscow')))
+    scheduler.add_job(compact_result_json_deltas, "interval", seconds=settings.result_json_compaction_interval)
+    scheduler.add_job(reconcile_s3_listings, "interval", seconds=settings.s3_listing_cache_reconcile_interval)
+    scheduler.add_job(prune_staged_pdf_uploads, "interval", hours=6)
+    # Finish renames interrupted by a restart
+    scheduler.add_job(resume_pending_renames)
 
 
 async def periodic_task():
@@ -77,10 +101,45 @@ async def backup_damage_file():
                         f"{traceback.format_exc()}")
 
 
-routers = (orders_router, rooms_router, users_router, repair_router)
+async def compact_result_json_deltas():
+    try:
+        await compact_all_patched_json()
+    except asyncio.CancelledError:
+        logger.critical(f"The task was cancelled. Detail: "
+                        f"{traceback.format_exc()}")
+    except Exception as e:
+        logger.error(f"Failed to compact result.json deltas: {e}")
+
+
+async def reconcile_s3_listings():
+    try:
+        await reconcile_listing_cache()
+    except Exception as e:
+        logger.error(f"Failed to reconcile S3 listing cache: {e}")
+
+
+async def prune_staged_pdf_uploads():
+    try:
+        await prune_staged_pdfs()
+    except Exception as e:
+        logger.error(f"Failed to prune staged PDF uploads: {e}")
+
+
+async def resume_pending_renames():
+    try:
+        await resume_renames()
+    except Exception as e:
+        logger.error(f"Failed to resume pending renames: {e}")
+
+
+routers = (orders_router, rooms_router, users_router, repair_router, stats_router)
 for router in routers:
     app.include_router(router)
 
+if settings.s3_client_backend == "local":
+    # Receives the presigned POST uploads that would otherwise go to S3
+    app.include_router(storage_router)
+
 
 @app.get("/")
 async def welcome():
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class Settings:
     branch_env: str
 
@@ -13,6 +16,98 @@ class Settings:
     s3_region_name: str
     s3_bucket_name: str
     s3_path_prefix: str
+    s3_endpoint_url: Optional[str] = None
+
+    # "aiobotocore" - native async client, "executor" - boto3 in a thread pool,
+    # "local" - files under local_storage_root instead of S3
+    s3_client_backend: str = "aiobotocore"
+    local_storage_root: str = "storage_data"
+    # Where clients post presigned uploads with the "local" backend
+    local_storage_upload_url: str = "/estimator-api/local_storage/upload"
+    s3_max_pool_connections: int = 64
+    s3_keepalive_timeout: float = 60
+    s3_connect_timeout: float = 5
+    s3_read_timeout: float = 30
+    s3_retry_mode: str = "adaptive"
+    s3_max_attempts: int = 5
+    s3_operation_timeout: float = 30
+    s3_operation_timeouts: dict[str, float] = {
+        "copy_object": 120,
+        "delete_objects": 60,
+        "list_objects_v2": 60,
+        "upload_part": 120,
+    }
+    s3_read_chunk_size: int = 256 * 1024
+    # JSON documents larger than this are parsed in a worker thread
+    s3_json_offload_threshold: int = 1024 * 1024
+    # Payloads with more nested values than this are encoded in a worker thread
+    s3_json_serialize_offload_items: int = 20_000
+    # JSON bodies larger than this are streamed to S3 as a multipart upload
+    s3_multipart_threshold: int = 16 * 1024 * 1024
+    # S3 requires every part except the last to be at least 5 MiB
+    s3_multipart_part_size: int = 8 * 1024 * 1024
+    s3_multipart_concurrency: int = 4
+    # Read-merge-write attempts of update_json_file before giving up with 409
+    s3_conditional_write_attempts: int = 5
+    # Set to "gzip" to store JSON objects with Content-Encoding: gzip
+    s3_json_compression: Optional[str] = None
+    s3_json_compression_min_bytes: int = 8 * 1024
+    s3_json_compression_level: int = 6
+    s3_json_cache_max_bytes: int = 64 * 1024 * 1024
+    s3_json_cache_max_object_bytes: int = 8 * 1024 * 1024
+    s3_exists_cache_ttl: float = 60
+    s3_exists_cache_max_entries: int = 50_000
+    # Cached prefix listings are re-listed after this many seconds at the latest
+    s3_listing_cache_max_age: float = 600
+    s3_listing_cache_max_entries: int = 1_000
+    s3_listing_cache_reconcile_interval: int = 300
+    s3_backup_copy_attempts: int = 3
+    # Approximate order counts are served from memory for this long
+    order_count_ttl: float = 60
+    order_count_max_entries: int = 10_000
+
+    # User documents are cached for this long; lookups that found no user
+    # are cached for the shorter negative TTL
+    user_cache_ttl: float = 300
+    user_cache_negative_ttl: float = 30
+    user_cache_max_entries: int = 10_000
+
+    # Direct (presigned POST) Estimate PDF uploads
+    pdf_upload_max_bytes: int = 50 * 1024 * 1024
+    pdf_upload_expires_in: int = 900
+    # Number of daily backup snapshots kept, including the newest one
+    backup_retention: int = 7
+
+    # Maximum number of concurrent calls per fan-out workload
+    fan_out_default_limit: int = 16
+    fan_out_limits: dict[str, int] = {
+        "backup_copy": 32,
+        "catalog_listing": 8,
+        "existence_check": 16,
+        "damage_update": 16,
+        "rename": 16,
+        "repair_result_json": 8,
+        "repair_damage_json": 4,
+        "room_json": 8,
+        "delta_log": 16,
+        "delta_compaction": 4,
+        "audit_log_read": 16,
+        "listing_reconcile": 8,
+        "delete_batch": 8,
+    }
+
+    # Damage update audit log: buffered entries are written as a new segment
+    # once they reach this size or this many seconds after the first entry
+    damage_log_prefix: str = "damage_log/"
+    damage_log_flush_bytes: int = 64 * 1024
+    damage_log_flush_interval: float = 30
+
+    # Pending result.json patches are folded into the base document this often
+    result_json_compaction_interval: int = 60
+    # Appending a patch compacts inline once this many deltas are pending
+    result_json_max_pending_deltas: int = 50
+    # Folded views of recently patched result.json files kept for appends
+    result_json_view_cache_entries: int = 64
 
     base_image_url: str
     base_json_url: str
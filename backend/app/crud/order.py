@@ -1,52 +1,88 @@
 from datetime import datetime
 import logging
-import asyncio
 from typing import Optional
 
 from beanie import PydanticObjectId
 
-from .user import retrieve_user_by_id
-from ..models.order import Order, OrderId, OrderWithRooms, OrderWithPicture
+from .order_count import order_counts
+from ..models.order import Order, OrderId, OrderWithPicture
+from ..models.user import User
 from ..utils.url import UrlBuilder, ImageSize
 
 log = logging.getLogger(__name__)
 
 
-async def retrieve_orders(limit: int, offset: int) -> list[Order]:
-    log.debug("retrieve_orders calling")
-    return await Order.find_all().skip(offset).limit(limit).to_list()
-
-
-async def transform_order_in_order_with_rooms(orders: list[Order]) -> list[OrderWithRooms]:
-    log.debug("transform_order_in_order_with_rooms calling")
-
-    order_ids = [order.id for order in orders]
-
-    new_orders = await Order.find({"_id": {"$in": order_ids}}).project(OrderWithRooms).to_list()
-
-    return new_orders
-
-
-async def get_url_picture_orders(orders: list[Order]) -> list[OrderWithPicture]:
-    log.debug("get_url_picture_orders calling")
-
-    new_orders = await transform_order_in_order_with_rooms(orders)
-
-    async def process_order_for_url(order):
-        try:
-            user = await retrieve_user_by_id(order.userID)
-            if user and hasattr(order, 'panoramas'):
-                builder = UrlBuilder(user.identity, order.itemID)
-                for room in order.panoramas:
-                    if room.isFirst:
-                        url_picture = builder.get_img_url(ImageSize.size_150, room.filename)
-                        return OrderWithPicture(**order.dict(), url_picture=url_picture)
-            return OrderWithPicture(**order.dict(), url_picture=None)
-        except Exception as e:
-            log.error(f"Error for process order {order}: {e}")
-            return OrderWithPicture(**order.dict(), url_picture=None)
-
-    return list(await asyncio.gather(*[process_order_for_url(order) for order in new_orders]))
+def order_listing_pipeline(match: dict, limit: int, offset: int,
+                           after: Optional[PydanticObjectId]) -> list[dict]:
+    if after is not None:
+        match = {**match, "_id": {"$gt": after}}
+
+    pipeline = [{"$match": match}, {"$sort": {"_id": 1}}]
+    if after is None:
+        pipeline.append({"$skip": offset})
+
+    return pipeline + [
+        {"$limit": limit},
+        {"$lookup": {
+            "from": User.get_collection_name(),
+            "localField": "userID",
+            "foreignField": "_id",
+            "as": "user"
+        }},
+        {"$project": {
+            "name": 1,
+            "userID": 1,
+            "lineItemJsonUrl": 1,
+            "itemID": 1,
+            "modified": 1,
+            "createdByUser": 1,
+            "user_identity": {"$arrayElemAt": ["$user.identity", 0]},
+            "first_panorama": {"$arrayElemAt": [
+                {"$map": {
+                    "input": {"$filter": {
+                        "input": {"$ifNull": ["$panoramas", []]},
+                        "as": "room",
+                        "cond": {"$eq": ["$$room.isFirst", True]}
+                    }},
+                    "as": "room",
+                    "in": "$$room.filename"
+                }},
+                0
+            ]},
+        }},
+    ]
+
+
+async def retrieve_order_listing(
+        limit: int, offset: int,
+        after: Optional[PydanticObjectId] = None,
+        user_id: Optional[PydanticObjectId] = None,
+) -> list[tuple[OrderWithPicture, Optional[str]]]:
+    """
+    Returns a page of orders with their picture URL and the identity of
+    their user, from a single aggregation, optionally filtered by user.
+
+    Pages are in `_id` order. With `after` (keyset mode) the page starts
+    right after that id through the index, so deep pages cost the same as
+    the first one; otherwise `offset` documents are skipped.
+    """
+    log.debug("retrieve_order_listing calling")
+
+    match = {"userID": user_id} if user_id is not None else {}
+    rows = await Order.aggregate(order_listing_pipeline(match, limit, offset, after)).to_list()
+
+    listing = []
+    for row in rows:
+        identity = row.pop("user_identity", None)
+        filename = row.pop("first_panorama", None)
+
+        url_picture = None
+        if identity and filename:
+            url_picture = UrlBuilder(identity, row.get("itemID")).get_img_url(ImageSize.size_150, filename)
+
+        listing.append((OrderWithPicture(**row, url_picture=url_picture), identity))
+
+    return listing
 
 
 async def retrieve_orders_ids(limit: int, offset: int) -> list[PydanticObjectId]:
@@ -62,14 +98,6 @@ async def retrieve_order_by_id(order_id: PydanticObjectId) -> Optional[Order]:
     return await Order.get(order_id)
 
 
-async def retrieve_orders_by_user_id(
-        user_id: PydanticObjectId, limit: int, offset: int
-) -> list[Order]:
-    log.debug("retrieve_orders_by_user_id calling")
-
-    return await Order.find(Order.userID == user_id).skip(offset).limit(limit).to_list()
-
-
 async def retrieve_orders_ids_by_user_id(
         user_id: PydanticObjectId, limit: int, offset: int
 ) -> list[PydanticObjectId]:
@@ -81,9 +109,9 @@ async def retrieve_orders_ids_by_user_id(
     return [order.id async for order in query]
 
 
-async def retrieve_orders_count_by_user_id(user_id: PydanticObjectId) -> int:
+async def retrieve_orders_count_by_user_id(user_id: PydanticObjectId, exact: bool = False) -> int:
     log.debug("retrieve_orders_count_by_user_id calling")
-    return await Order.find(Order.userID == user_id).count()
+    return await order_counts.by_user(user_id, exact)
 
 
 async def create_order(name: str, userID: PydanticObjectId, created: datetime):
@@ -104,12 +132,15 @@ async def create_order(name: str, userID: PydanticObjectId, created: datetime):
         modified=created,
         createdByUser=created,
     )
-    return await new_order.create()
+    order = await new_order.create()
+    order_counts.record_created(userID)
+
+    return order
 
 
-async def retrieve_total_orders() -> int:
+async def retrieve_total_orders(exact: bool = False) -> int:
     log.debug("retrieve_total_orders_count calling")
-    return await Order.find().count()
+    return await order_counts.total(exact)
 
 
 async def retrieve_all_orders() -> list[Order]:
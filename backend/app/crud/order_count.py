@@ -0,0 +1,109 @@
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from beanie import PydanticObjectId
+
+from ..config import settings
+from ..models.order import Order
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class CountStats:
+    hits: int = 0
+    misses: int = 0
+    exact_counts: int = 0
+    estimated_counts: int = 0
+    increments: int = 0
+    invalidations: int = 0
+
+
+class OrderCounts:
+    """
+    Order counts for listings, kept for `ttl` seconds.
+
+    Approximate counts come from this cache. The unfiltered total is
+    refreshed with `estimated_document_count`, which reads collection
+    metadata instead of scanning `virtualTour`. Per-user counts are
+    refreshed with a `countDocuments` on the user's orders. Orders created
+    through `create_order` increment the cached values, so this process
+    sees its own writes straight away. Writes from elsewhere appear once the
+    entry expires. Exact counts always query and refresh the cache.
+    Deleting orders drops the affected entries instead of decrementing
+    them, so a delete that matched nothing cannot skew the count.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CountStats()
+        self._total: Optional[tuple[int, float]] = None
+        self._by_user: dict[PydanticObjectId, tuple[int, float]] = {}
+
+    def _fresh(self, entry: Optional[tuple[int, float]]) -> Optional[int]:
+        if entry is None or entry[1] < time.monotonic():
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return entry[0]
+
+    async def total(self, exact: bool = False) -> int:
+        if not exact and (count := self._fresh(self._total)) is not None:
+            return count
+
+        if exact:
+            self.stats.exact_counts += 1
+            count = await Order.find().count()
+        else:
+            self.stats.estimated_counts += 1
+            count = await Order.get_motor_collection().estimated_document_count()
+
+        self._total = (count, time.monotonic() + self.ttl)
+        return count
+
+    async def by_user(self, user_id: PydanticObjectId, exact: bool = False) -> int:
+        if not exact and (count := self._fresh(self._by_user.get(user_id))) is not None:
+            return count
+
+        self.stats.exact_counts += 1
+        count = await Order.find(Order.userID == user_id).count()
+
+        if len(self._by_user) >= self.max_entries:
+            self._prune()
+        self._by_user[user_id] = (count, time.monotonic() + self.ttl)
+
+        return count
+
+    def record_created(self, user_id: PydanticObjectId) -> None:
+        self.stats.increments += 1
+
+        if self._total is not None:
+            self._total = (self._total[0] + 1, self._total[1])
+        if (entry := self._by_user.get(user_id)) is not None:
+            self._by_user[user_id] = (entry[0] + 1, entry[1])
+
+    def record_deleted(self, user_id: PydanticObjectId) -> None:
+        self.stats.invalidations += 1
+
+        self._total = None
+        self._by_user.pop(user_id, None)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        self._by_user = {key: entry for key, entry in self._by_user.items() if entry[1] >= now}
+
+        if len(self._by_user) >= self.max_entries:
+            self._by_user.clear()
+
+    def snapshot(self) -> dict:
+        return {**asdict(self.stats), "users": len(self._by_user), "ttl": self.ttl}
+
+
+order_counts = OrderCounts(
+    ttl=settings.order_count_ttl,
+    max_entries=settings.order_count_max_entries,
+)
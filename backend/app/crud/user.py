@@ -1,19 +1,123 @@
+import asyncio
+import contextlib
 import logging
+from contextvars import ContextVar
+from typing import Iterator, Optional
 
 from pydantic import EmailStr
 
 from beanie import PydanticObjectId
+from beanie.operators import In
 
 from ..models.user import User
+from .user_cache import MISSING, user_cache
 
 logger = logging.getLogger(__name__)
 
 
+async def retrieve_users_by_ids(user_ids: list[PydanticObjectId]) -> list[User]:
+    logger.debug("retrieve_users_by_ids calling")
+    return await User.find(In(User.id, user_ids)).to_list()
+
+
+class UserLoader:
+    """
+    Request-scoped batching of user lookups by id.
+
+    Every `load` made before the event loop gets back to the loader is
+    collected, and the batch is resolved with a single `$in` query. Results,
+    including missing users, are kept for the life of the loader, so each id
+    is fetched at most once per request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self._results: dict[PydanticObjectId, asyncio.Future] = {}
+        self._pending: dict[PydanticObjectId, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, user_id: PydanticObjectId) -> Optional[User]:
+        future = self._results.get(user_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._results[user_id] = future
+
+            if not self._pending:
+                asyncio.get_running_loop().call_soon(self._dispatch)
+            self._pending[user_id] = future
+
+        # The future is shared, so one cancelled caller must not cancel it for the rest
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._fetch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, batch: dict[PydanticObjectId, asyncio.Future]) -> None:
+        self.queries += 1
+        logger.debug(f"Loading {len(batch)} users in one query")
+
+        try:
+            users = await retrieve_users_by_ids(list(batch))
+        except Exception as e:
+            for user_id, future in batch.items():
+                # Let a later load retry instead of memoizing the failure
+                self._results.pop(user_id, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        found = {user.id: user for user in users}
+        for user_id, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(user_id))
+
+
+user_loader: ContextVar[Optional[UserLoader]] = ContextVar("user_loader", default=None)
+
+
+@contextlib.contextmanager
+def user_loader_scope() -> Iterator[UserLoader]:
+    """
+    Routes `retrieve_user_by_id` through a fresh `UserLoader` until the
+    block exits. Used per request by the middleware and by scheduled jobs.
+    """
+    loader = UserLoader()
+    token = user_loader.set(loader)
+    try:
+        yield loader
+    finally:
+        user_loader.reset(token)
+
+
 async def retrieve_user_by_id(user_id: PydanticObjectId):
     logger.debug("retrieve_user_by_id calling")
-    return await User.get(user_id)
+
+    key = user_cache.id_key(user_id)
+    user = user_cache.get(key)
+    if user is not MISSING:
+        return user
+
+    loader = user_loader.get()
+    if loader is not None:
+        user = await loader.load(user_id)
+    else:
+        user = await User.get(user_id)
+
+    user_cache.put(key, user)
+    return user
 
 
 async def retrieve_user_by_email(email: EmailStr):
     logger.debug("retrieve_user_by_email calling")
-    return await User.find_one(User.email == email)
+
+    key = user_cache.email_key(email)
+    user = user_cache.get(key)
+    if user is not MISSING:
+        return user
+
+    user = await User.find_one(User.email == email)
+    user_cache.put(key, user)
+    return user
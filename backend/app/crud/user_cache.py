@@ -0,0 +1,106 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Hashable, Optional
+
+from ..config import settings
+from ..models.user import User
+
+MISSING = object()
+
+
+@dataclass
+class UserCacheStats:
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    evictions: int = 0
+
+
+class UserCache:
+    """
+    Process-wide LRU cache of user documents, looked up by id or email.
+
+    Users are kept for `ttl` seconds. Lookups that found no user are kept
+    for the shorter `negative_ttl`, so a user created elsewhere shows up
+    soon. The least recently used entries are evicted once `max_entries` is
+    reached. Cached documents are shared between callers and must not be
+    modified.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.stats = UserCacheStats()
+        self._entries: OrderedDict[Hashable, tuple[Optional[User], float]] = OrderedDict()
+
+    @staticmethod
+    def id_key(user_id: Any) -> tuple:
+        return "id", str(user_id)
+
+    @staticmethod
+    def email_key(email: str) -> tuple:
+        return "email", str(email)
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Returns the cached user, None for a cached miss, or MISSING.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return MISSING
+
+        user, expires = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            self.stats.expired += 1
+            self.stats.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        if user is None:
+            self.stats.negative_hits += 1
+        else:
+            self.stats.hits += 1
+
+        return user
+
+    def put(self, key: Hashable, user: Optional[User]) -> None:
+        expires = time.monotonic() + (self.ttl if user is not None else self.negative_ttl)
+        keys = [key]
+        if user is not None:
+            keys += [self.id_key(user.id), self.email_key(user.email)]
+
+        for cache_key in keys:
+            self._entries[cache_key] = (user, expires)
+            self._entries.move_to_end(cache_key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, user: User) -> None:
+        self._entries.pop(self.id_key(user.id), None)
+        self._entries.pop(self.email_key(user.email), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def snapshot(self) -> dict:
+        return {
+            **asdict(self.stats),
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+        }
+
+
+user_cache = UserCache(
+    ttl=settings.user_cache_ttl,
+    negative_ttl=settings.user_cache_negative_ttl,
+    max_entries=settings.user_cache_max_entries,
+)
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from beanie import Document
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class IndexReport:
+    collection: str
+    declared: list[str] = field(default_factory=list)
+    present: list[str] = field(default_factory=list)
+    missing: list[str] = field(default_factory=list)
+    extra: list[str] = field(default_factory=list)
+    created: list[str] = field(default_factory=list)
+    error: Optional[str] = None
+    state: str = "pending"
+    checked: Optional[float] = None
+    seconds: float = 0.0
+
+
+index_reports: dict[str, IndexReport] = {}
+_build_tasks: set[asyncio.Task] = set()
+
+
+def index_key(key) -> tuple:
+    """
+    Normalizes an index key spec, either a `{field: direction}` mapping or
+    the `[(field, direction)]` list returned by `index_information`.
+    """
+    items = key.items() if isinstance(key, dict) else key
+    return tuple((name, direction) for name, direction in items)
+
+
+def compare_indexes(declared: list[IndexModel], live: dict) -> tuple[list[IndexModel], list[str], list[str]]:
+    """
+    Matches declared indexes to the live ones by key, not by name, so an
+    index built by hand under another name still counts.
+
+    Returns (missing models, names of declared indexes that are present,
+    names of live indexes that are not declared).
+    """
+    live_keys = {index_key(info["key"]): name for name, info in live.items()}
+    declared_keys = {index_key(model.document["key"]) for model in declared}
+
+    missing, present = [], []
+    for model in declared:
+        if index_key(model.document["key"]) in live_keys:
+            present.append(model.document["name"])
+        else:
+            missing.append(model)
+
+    extra = [name for key, name in live_keys.items() if key not in declared_keys and name != "_id_"]
+    return missing, present, extra
+
+
+def declared_indexes(model: type[Document]) -> list[IndexModel]:
+    # Kept out of Settings.indexes, which init_beanie builds inline at startup
+    settings_class = getattr(model, "Settings", None)
+    return list(getattr(settings_class, "background_indexes", []))
+
+
+async def check_indexes(model: type[Document]) -> tuple[IndexReport, list[IndexModel]]:
+    collection = model.get_motor_collection()
+    declared = declared_indexes(model)
+
+    report = IndexReport(
+        collection=collection.name,
+        declared=[index.document["name"] for index in declared],
+        checked=time.time()
+    )
+    index_reports[report.collection] = report
+
+    try:
+        live = await collection.index_information()
+    except PyMongoError as e:
+        log.error(f"Failed to read the indexes of {report.collection}: {e}")
+        report.state, report.error = "failed", str(e)
+        return report, []
+
+    missing, report.present, report.extra = compare_indexes(declared, live)
+    report.missing = [index.document["name"] for index in missing]
+    report.state = "missing" if missing else "ok"
+
+    return report, missing
+
+
+async def build_indexes(model: type[Document], report: IndexReport, missing: list[IndexModel]) -> None:
+    started = time.monotonic()
+    log.info(f"Building indexes {report.missing} on {report.collection}")
+
+    try:
+        report.created = await model.get_motor_collection().create_indexes(missing)
+        report.missing = []
+        report.state = "ok"
+        log.info(f"Built indexes {report.created} on {report.collection}")
+    except PyMongoError as e:
+        log.error(f"Failed to build indexes on {report.collection}: {e}")
+        report.state, report.error = "failed", str(e)
+    finally:
+        report.seconds = time.monotonic() - started
+
+
+async def ensure_indexes(models: list[type[Document]]) -> None:
+    """
+    Compares the indexes declared in each model's
+    `Settings.background_indexes` with the live ones and builds the missing
+    ones in a background task, so a long build on a large collection does
+    not hold up startup. Indexes that exist only in the database are
+    reported but never dropped.
+    """
+    for model in models:
+        report, missing = await check_indexes(model)
+        if not missing:
+            continue
+
+        report.state = "building"
+        task = asyncio.create_task(build_indexes(model, report, missing))
+        _build_tasks.add(task)
+        task.add_done_callback(_build_tasks.discard)
+
+
+async def refresh_index_reports(models: list[type[Document]]) -> None:
+    """
+    Re-reads the live indexes without building anything. Collections with a
+    build still running keep their current report.
+    """
+    for model in models:
+        report = index_reports.get(model.get_motor_collection().name)
+        if report is None or report.state != "building":
+            await check_indexes(model)
+
+
+def snapshot() -> dict:
+    return {name: asdict(report) for name, report in index_reports.items()}
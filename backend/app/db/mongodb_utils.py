@@ -9,17 +9,21 @@ from ..models.floorplan_order import FloorplanOrder
 from ..models.order import Order
 from ..models.room import Room
 from ..models.user import User
+from .indexes import ensure_indexes
 from .mongodb import db
 
 log = logging.getLogger(__name__)
 
+DOCUMENT_MODELS = [Order, Room, User, Estimate, FloorplanOrder]
+
 
 async def connect_to_mongo():
     db.client = AsyncIOMotorClient(settings.mongodb_url)
     await init_beanie(
         database=db.client[settings.database_name],
-        document_models=[Order, Room, User, Estimate, FloorplanOrder],
+        document_models=DOCUMENT_MODELS,
     )
+    await ensure_indexes(DOCUMENT_MODELS)
     logging.info("Connection is active")
 
 
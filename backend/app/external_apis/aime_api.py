@@ -1,6 +1,7 @@
 from base64 import b64encode
 import logging
-from typing import Optional
+from typing import AsyncIterator, Optional, Union
+from urllib.parse import quote, urlencode
 
 from httpx import AsyncClient
 
@@ -10,25 +11,57 @@ from ..config import settings
 logger = logging.getLogger(__name__)
 
 
-async def read_estimate_post_call(filename: str, content: bytes) -> Optional[AiMeAPIResponse]:
+PdfContent = Union[bytes, AsyncIterator[bytes]]
+
+
+async def iter_estimate_form(fields: dict, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Yields the urlencoded readestimate form with the PDF base64-encoded one
+    chunk at a time, so a streamed file is never held in memory as a whole.
+    The result is the same body as `urlencode` of the complete form.
+    """
+    yield f"{urlencode(fields)}&Base64PdfString=".encode()
+
+    rest = b""
+    async for chunk in chunks:
+        chunk = rest + chunk
+        # Base64 encodes 3 bytes at a time, the remainder goes with the next chunk
+        end = len(chunk) - len(chunk) % 3
+        rest = chunk[end:]
+        if end:
+            yield quote(b64encode(chunk[:end]), safe="").encode()
+
+    yield quote(b64encode(rest), safe="").encode()
+
+
+async def read_estimate_post_call(filename: str, content: PdfContent) -> Optional[AiMeAPIResponse]:
     logger.debug("The start of the READ_ESTIMATE_POST_CALL function")
 
-    data = {
+    fields = {
         "UserID": settings.aime_api_user_id,
         "FileName": filename,
         "CompanyCode": settings.aime_api_company_code,
-        "Base64PdfString": str(b64encode(content), encoding="utf-8"),
     }
+    if isinstance(content, bytes):
+        request = {"data": {**fields, "Base64PdfString": str(b64encode(content), encoding="utf-8")}}
+    else:
+        request = {
+            "content": iter_estimate_form(fields, content),
+            "headers": {"Content-Type": "application/x-www-form-urlencoded"},
+        }
     api_url = settings.aime_api_url + "readestimate"
     
     async with AsyncClient() as client:
         try:
-            response = await client.post(api_url, data=data)
+            response = await client.post(api_url, **request)
         except Exception as e:
             logger.warning(f"Exception {e} during API call to {api_url}")
             return None
     if response.status_code == 200:
         return AiMeAPIResponse.model_validate(response.json())
     return None
+    if response.status_code == 200:
+        return AiMeAPIResponse.model_validate(response.json())
+    return None
 
 
@@ -2,6 +2,8 @@ from typing import Optional
 
 from pydantic import BaseModel
 
+from pymongo import IndexModel
+
 from beanie import Document, PydanticObjectId
 
 
@@ -15,6 +17,10 @@ class Estimate(Document):
 
     class Settings:
         name = "estimate"
+        background_indexes = [
+            IndexModel([("floorplanOrderId", 1)]),
+            IndexModel([("iterations.pdfFile", 1)]),
+        ]
 
 
 class EstimateOrder(BaseModel):
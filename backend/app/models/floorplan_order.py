@@ -1,3 +1,5 @@
+from pymongo import IndexModel
+
 from beanie import Document, PydanticObjectId
 
 
@@ -7,3 +9,7 @@ class FloorplanOrder(Document):
 
     class Settings:
         name = "floorplanOrder"
+        background_indexes = [
+            # Claim number lookups
+            IndexModel([("internalOrderId", 1)]),
+        ]
@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import Optional, Any, Union, List, Tuple, Dict
+from typing import Optional, Any, Union, List, Tuple, Dict, Literal
 
-from pydantic import BaseModel, HttpUrl, Field
+from pydantic import BaseModel, HttpUrl, Field, ConfigDict
+
+from pymongo import IndexModel
 
 from beanie import Document, PydanticObjectId
 
@@ -11,6 +13,10 @@ from .room import Room
 class OrderId(Document):
     class Settings:
         name = "virtualTour"
+        background_indexes = [
+            # Per-user listings and counts, already in listing (_id) order
+            IndexModel([("userID", 1), ("_id", 1)]),
+        ]
 
 
 class BaseOrder(OrderId):
@@ -45,9 +51,22 @@ class PdfUploadResponse(BaseModel):
     rooms_json_urls: list[HttpUrl]
 
 
+class PdfUploadRequest(BaseModel):
+    filename: str
+
+
+class PdfUploadTicket(BaseModel):
+    upload_id: str
+    url: str
+    fields: dict[str, str] = Field(..., description="Form fields to post before the file")
+    expires_in: int
+
+
 class OrderResponse(BaseModel):
     total_orders: int
     orders: list[Order]
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` to get the next page; "
+                                                         "null on the last page")
 
 
 class OrderResponseWithPicture(OrderResponse):
@@ -62,6 +81,24 @@ class UpdateJSON(BaseModel):
     updates: dict = Field(...)
 
 
+class JSONPatchOperation(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    op: Literal["add", "remove", "replace", "move", "copy", "test"]
+    path: str = Field(..., description="JSON Pointer (RFC 6901) to the target location")
+    value: Any = None
+    from_: Optional[str] = Field(None, alias="from")
+
+
+class RestorePoint(BaseModel):
+    backup_date: str = Field(..., description="Snapshot date in DDMMYYYY format, "
+                                              "as accepted by /repair/restore_backup")
+    snapshot: str
+    created: datetime
+    objects: int = Field(..., description="Number of damage catalog objects in the snapshot")
+    bytes: int
+
+
 class JSONSubstitutionResponse(BaseModel):
     json_substitution_name: str = Field(..., description="The name of the Substitution "
                                                          "JSON file")
@@ -2,12 +2,17 @@ from typing import Optional
 
 from pydantic import EmailStr
 
+from pymongo import IndexModel
+
 from beanie import Document
 
 
 class User(Document):
     class Settings:
         name = "user"
+        background_indexes = [
+            IndexModel([("email", 1)]),
+        ]
 
     name: Optional[str] = None
     email: EmailStr
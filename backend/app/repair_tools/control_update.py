@@ -1,11 +1,9 @@
-import asyncio
 from datetime import datetime
-from ..config import settings
 from typing import Callable
 from fastapi import Request
 from ..models.order import UpdateResponse
 from functools import wraps
-from ..s3.async_boto_wrapper import put_object, get_object, executor
+from ..s3.audit_log import damage_log
 
 
 def determine_status_code(message: str) -> int:
@@ -38,22 +36,7 @@ def decorator_damage_log(function: Callable):
 
             log_content = log_message + "\n" + log_response + "\n"
 
-            log_response = await get_object(
-                Bucket=settings.s3_bucket_name,
-                Key="log_update.log"
-            )
-
-            loop = asyncio.get_running_loop()
-            log_data = await loop.run_in_executor(executor, log_response['Body'].read)
-
-            log_content_bytes = log_content.encode('utf-8')
-            new_log_data = log_data + log_content_bytes
-
-            await put_object(
-                Bucket=settings.s3_bucket_name,
-                Key="log_update.log",
-                Body=new_log_data
-            )
+            await damage_log.append(log_content)
 
         return response
 
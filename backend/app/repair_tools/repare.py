@@ -1,18 +1,21 @@
 import logging
-import asyncio
 import json
 
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, Body
-from concurrent.futures import ThreadPoolExecutor
+from fastapi.responses import PlainTextResponse
 from typing import Any
-from ..models.order import UpdateResponse, UpdateJSON
+from ..models.order import UpdateResponse, UpdateJSON, RestorePoint
 from ..models.damage import DamageLineItemList, DamageLineItem
 from pydantic import ValidationError
+from botocore.exceptions import ClientError
 from ..routers.order import repair_result_json
 
-from ..s3.async_boto_wrapper import delete_objects
+from ..s3.client import delete_objects
 from ..s3.file_ops import rename_new_file_name, delete_json_file, sort_directory_list
 from starlette.status import (
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 from ..s3.file_ops import (
@@ -23,10 +26,14 @@ from ..s3.file_ops import (
     delete_all_files_from_directories,
     delete_json_file,
     sort_directory_list,
-    create_json_file
+    create_json_file,
+    restore_daily_backup
 )
 
+from ..s3.audit_log import damage_log, SEGMENT_DATE_FORMAT, LEGACY_LOG_KEY
+from ..s3.backup import list_restore_points, BACKUP_PREFIX
 from ..config import settings
+from ..utils.fan_out import fan_out
 
 router = APIRouter(prefix="/repair", tags=["Repairs"])
 
@@ -64,10 +71,6 @@ async def repair_damage_json_id(file_path: str) -> None:
         logger.error(f"Failed for updated {file_path}: {e}")
 
 
-def repair_damage_json_id_sync(file_path: str):
-    asyncio.run(repair_damage_json_id(file_path))
-
-
 @router.get(
     path="/repair_all_damage_json_id",
     summary="Repair id in damage file",
@@ -90,8 +93,7 @@ async def repair_all_damage_json_id():
                                             and not key.startswith(exclusion_prefix)
         ]
 
-        with ThreadPoolExecutor(max_workers=3) as executor:
-            executor.map(repair_damage_json_id_sync, damage_file_name)
+        await fan_out("repair_damage_json", damage_file_name, repair_damage_json_id)
 
         return UpdateResponse(message="Successfully updated id in all damage "
                                       "json files")
@@ -155,3 +157,118 @@ async def repair_damage_path(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to repair damage path. Detail: {e}"
         )
+
+
+@router.put(
+    path="/restore_backup/{backup_date}",
+    summary="Restore damage files from a daily backup (date in DDMMYYYY format)",
+    response_model=UpdateResponse
+)
+async def restore_backup(backup_date: str):
+    logger.debug("The start of the RESTORE_BACKUP route")
+
+    try:
+        return await restore_daily_backup(backup_date)
+
+    except HTTPException as http_exc:
+        if http_exc.status_code == HTTP_404_NOT_FOUND:
+            raise http_exc
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to restore backup. Detail: {http_exc.detail}"
+        )
+
+    except Exception as e:
+        logger.error(f"An error occurred during the operation of the "
+                     f"RESTORE_BACKUP. DETAIL: {e}")
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to restore backup. Detail: {e}"
+        )
+
+
+@router.get(
+    path="/backups",
+    summary="List the daily backups that can be restored, oldest first",
+    response_model=list[RestorePoint]
+)
+async def get_restore_points():
+    logger.debug("The start of the GET_RESTORE_POINTS route")
+
+    try:
+        return [
+            RestorePoint(backup_date=entry["snapshot"][len(BACKUP_PREFIX):].strip("/"), **entry)
+            for entry in await list_restore_points()
+        ]
+
+    except Exception as e:
+        logger.error(f"An error occurred during the operation of the "
+                     f"GET_RESTORE_POINTS. DETAIL: {e}")
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list backups. Detail: {e}"
+        )
+
+
+@router.get(
+    path="/damage_log/{log_date}",
+    summary="Read the damage update log for a day (date in YYYY-MM-DD format)",
+    response_class=PlainTextResponse
+)
+async def read_damage_log(log_date: str):
+    logger.debug("The start of the READ_DAMAGE_LOG route")
+
+    try:
+        day = datetime.strptime(log_date, SEGMENT_DATE_FORMAT).date()
+    except ValueError:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=f"Invalid date {log_date}, expected YYYY-MM-DD"
+        )
+
+    try:
+        if day == datetime.now().date():
+            await damage_log.flush()
+
+        return PlainTextResponse(await damage_log.read(day))
+
+    except Exception as e:
+        logger.error(f"An error occurred during the operation of the "
+                     f"READ_DAMAGE_LOG. DETAIL: {e}")
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read damage log. Detail: {e}"
+        )
+
+
+@router.put(
+    path="/damage_log/import_legacy",
+    summary="Split the old single-object damage update log into daily segments",
+    response_model=UpdateResponse
+)
+async def import_legacy_damage_log():
+    logger.debug("The start of the IMPORT_LEGACY_DAMAGE_LOG route")
+
+    try:
+        days = await damage_log.import_legacy(LEGACY_LOG_KEY)
+
+        return UpdateResponse(message=f"Imported {days} days of {LEGACY_LOG_KEY}")
+
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            raise HTTPException(
+                status_code=HTTP_404_NOT_FOUND,
+                detail=f"{LEGACY_LOG_KEY} not found"
+            )
+
+        logger.error(f"An error occurred during the operation of the "
+                     f"IMPORT_LEGACY_DAMAGE_LOG. DETAIL: {e}")
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to import damage log. Detail: {e}"
+        )
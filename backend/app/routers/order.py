@@ -1,5 +1,4 @@
 import logging
-import asyncio
 
 from typing import Optional, Any, Union
 from pydantic import ValidationError
@@ -10,6 +9,7 @@ from starlette.status import (
     HTTP_201_CREATED,
     HTTP_400_BAD_REQUEST,
     HTTP_404_NOT_FOUND,
+    HTTP_422_UNPROCESSABLE_ENTITY,
     HTTP_500_INTERNAL_SERVER_ERROR,
 )
 
@@ -17,29 +17,29 @@ from ..crud.floorplan_order import retrieve_order_id_by_claim_number
 from ..crud.order import (
     create_order,
     retrieve_order_by_id,
-    retrieve_orders,
-    retrieve_orders_by_user_id,
+    retrieve_order_listing,
     retrieve_orders_count_by_user_id,
     retrieve_orders_ids,
     retrieve_orders_ids_by_user_id,
     retrieve_total_orders,
-    get_url_picture_orders,
     retrieve_all_orders,
 )
 
 from ..crud.room import retrieve_order_rooms
 from ..repair_tools.control_update import decorator_damage_log
 from ..crud.user import retrieve_user_by_id
-from ..external_apis.aime_api import read_estimate_post_call
-from ..models.area import AiMeAPIResponse
+from ..external_apis.aime_api import PdfContent, read_estimate_post_call
+from ..models.area import AiMeAPIResponse, Area, LineItem
 from ..models.damage import DamageLineItem, DamageLineItemList
 from ..models.order import (Order, OrderPost, PdfUploadResponse,
+                            PdfUploadRequest, PdfUploadTicket,
                             OrderResponse, UpdateResponse, UpdateJSON,
-                            OrderResponseWithPicture,
+                            OrderResponseWithPicture, OrderWithPicture,
                             JSONSubstitutionResponse,
                             DamageContentResponse,
                             UpdateResponseWithReport,
-                            UpdateResponseWithURL
+                            UpdateResponseWithURL,
+                            JSONPatchOperation
                             )
 from ..models.user import User
 from ..s3.file_ops import (create_json_file,
@@ -52,8 +52,14 @@ from ..s3.file_ops import (create_json_file,
                            update_damage_file,
                            rename_new_file_name,
                            set_new_directory_name,
-                           update_backup, copy_object_in_s3, reupdate_backup
+                           update_backup, copy_object_in_s3, reupdate_backup,
+                           check_files_exist_in_s3
                            )
+from ..s3.delta_log import append_patch, compact_patched_json, drop_all_deltas, replace_patched_json
+from ..s3.staging import create_pdf_upload, open_staged_pdf, drop_staged_pdf
+from ..utils.cursor import InvalidCursor, decode_cursor, next_cursor
+from ..utils.fan_out import fan_out
+from ..utils.json_patch import JsonPatchError, parse_pointer
 from ..utils.url import UrlBuilder, check_url
 from ..utils.process_areas import process_areas
 
@@ -78,25 +84,40 @@ async def get_order_and_user_by_id(
         raise
 
 
+def get_cursor_id(cursor: Optional[str]) -> Optional[PydanticObjectId]:
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor as e:
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.get(
     path="/",
     response_model=OrderResponseWithPicture,
 )
 async def get_orders(
         limit: int = Query(20, gt=0),
-        offset: int = Query(0, ge=0)
+        offset: int = Query(0, ge=0),
+        cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page; "
+                                                        "takes precedence over offset"),
+        exact_total: bool = Query(False, description="Count all orders instead of using "
+                                                     "the cached estimate")
 ) -> OrderResponseWithPicture:
+    after = get_cursor_id(cursor)
+
     try:
         logger.debug("The start of the GET_ORDERS route")
 
-        orders = await retrieve_orders(limit, offset)
-        orders = await get_url_picture_orders(orders)
-        await update_orders_with_user_info(orders)
-        total = await retrieve_total_orders()
+        orders = await get_order_listing(limit, offset, after)
+        following = next_cursor([order.id for order in orders], limit)
+        total = await retrieve_total_orders(exact=exact_total)
 
         logger.success("The route GET_ORDERS has been successfully completed, "
                        "The request is being sent")
-        return OrderResponseWithPicture(total_orders=total, orders=orders)
+        return OrderResponseWithPicture(total_orders=total, orders=orders, next_cursor=following)
     except Exception as e:
         logger.critical("An error occurred during the operation of the route"
                         "GET_ORDERS. DETAILS: {}".format(e))
@@ -202,28 +223,24 @@ async def get_orders_by_user_id(
         user_id: PydanticObjectId,
         limit: int = Query(20, gt=0),
         offset: int = Query(0, ge=0),
+        cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page; "
+                                                        "takes precedence over offset"),
+        exact_total: bool = Query(False, description="Count the user's orders instead of using "
+                                                     "the cached count")
 ) -> OrderResponse:
+    after = get_cursor_id(cursor)
+
     try:
         logger.debug("The start of the GET_ORDERS_BY_USER_ID route")
 
-        orders = await retrieve_orders_by_user_id(user_id, limit, offset)
-
-        if orders is None:
-            logger.warning("Orders has not been found with user_id %s",
-                           str(user_id))
-
-            raise HTTPException(
-                status_code=HTTP_404_NOT_FOUND,
-                detail=f"Orders with this user_id does not"
-            )
-
-        orders = await get_url_picture_orders(orders)
-        await update_orders_with_user_info(orders)
+        orders = await get_order_listing(limit, offset, after, user_id)
+        following = next_cursor([order.id for order in orders], limit)
+        total = await retrieve_orders_count_by_user_id(user_id, exact=exact_total)
 
         logger.success("The route GET_ORDERS_BY_USERS_ID has been successfully completed. "
                        "The request is being sent")
 
-        return OrderResponseWithPicture(total_orders=len(orders), orders=orders)
+        return OrderResponseWithPicture(total_orders=total, orders=orders, next_cursor=following)
     except Exception as e:
         logger.critical("An error occurred during the operation of the route"
                         "GET_ORDERS_BY_USER_ID. DETAILS: {}".format(e))
@@ -264,11 +281,13 @@ async def get_orders_ids_by_user_id(
 @router.get("/by_user_id/{user_id}/count", response_model=int)
 async def get_orders_count_by_user_id(
         user_id: PydanticObjectId,
+        exact: bool = Query(False, description="Count the user's orders instead of using "
+                                               "the cached value"),
 ) -> int:
     try:
         logger.debug("The start of the GET_ORDERS_COUNT_BY_USER_ID route")
 
-        count_orders = await retrieve_orders_count_by_user_id(user_id)
+        count_orders = await retrieve_orders_count_by_user_id(user_id, exact)
 
         logger.success("The route GET_ORDERS_COUNT_BY_USER_ID has been "
                        "successfully completed. The request is being sent")
@@ -298,7 +317,7 @@ async def validate_file_type(content_type: str,
         )
 
 
-async def process_file(filename: str, content: bytes) -> AiMeAPIResponse:
+async def process_file(filename: str, content: PdfContent) -> AiMeAPIResponse:
     try:
         logger.debug("The start of the PROCESS_FILE function")
 
@@ -360,7 +379,7 @@ async def process_room_and_generate_url(room_id, room_items, builder: UrlBuilder
 
     try:
         s3_path = builder.get_s3_json_path(f"{room_id}.json")
-        await create_json_file(room_items.model_dump(by_alias=True), s3_path)
+        await create_json_file(room_items, s3_path)
         return builder.get_external_json_url(f"{room_id}.json")
 
     except Exception as e:
@@ -376,12 +395,15 @@ async def process_rooms_and_generate_urls(order_id: PydanticObjectId,
         rooms = await retrieve_order_rooms(order_id, url_check=False)
         rooms_with_areas = process_areas(api_result, rooms)
 
-        tasks = [process_room_and_generate_url(room_id, room_items, builder) for room_id, room_items in
-                 rooms_with_areas.items()]
-
-        external_urls = await asyncio.gather(*tasks)
+        result = await fan_out(
+            "room_json",
+            rooms_with_areas.items(),
+            lambda room: process_room_and_generate_url(*room, builder),
+            name=f"room_json:{order_id}"
+        )
+        result.raise_for_failures()
 
-        return list(external_urls)
+        return result.results
 
     except Exception as e:
         logger.error("An error occurred during the operation of the function "
@@ -455,14 +477,18 @@ async def upload_pdf(file: UploadFile) -> PdfUploadResponse:
     await validate_file_type(file.content_type)
     file_content = await file.read()
 
-    api_result = await process_file(file.filename, file_content)
+    return await process_estimate_pdf(file.filename, file_content)
+
+
+async def process_estimate_pdf(filename: str, content: PdfContent) -> PdfUploadResponse:
+    api_result = await process_file(filename, content)
     claim_number = api_result.Claim
 
     order_id = await get_single_order_ids_by_claim_number(claim_number=claim_number)
     builder = await get_order_builder_path(order_id=order_id)
 
     try:
-        await create_json_file(api_result.model_dump(by_alias=True), builder.get_s3_json_path("result.json"))
+        await replace_patched_json(str(order_id), builder.get_s3_json_path("result.json"), api_result)
 
         logger.success("The route UPLOAD_PDF has been successfully completed. "
                        "The request is being sent")
@@ -510,14 +536,19 @@ async def upload_pdf_to_order(order_id: PydanticObjectId, file: UploadFile) -> P
     await validate_file_type(file.content_type)
     file_content = await file.read()
 
-    api_result = await process_file(file.filename, file_content)
+    return await process_order_estimate_pdf(order_id, file.filename, file_content)
+
+
+async def process_order_estimate_pdf(order_id: PydanticObjectId, filename: str,
+                                     content: PdfContent) -> PdfUploadResponse:
+    api_result = await process_file(filename, content)
     builder = await get_order_builder_path(order_id=order_id)
 
     try:
         logger.success("The route UPLOAD_PDF_TO_ORDER has been successfully completed. "
                        "The request is being sent")
 
-        await create_json_file(api_result.model_dump(by_alias=True), builder.get_s3_json_path("result.json"))
+        await replace_patched_json(str(order_id), builder.get_s3_json_path("result.json"), api_result)
 
         return PdfUploadResponse(
             order_id=order_id,
@@ -536,6 +567,64 @@ async def upload_pdf_to_order(order_id: PydanticObjectId, file: UploadFile) -> P
         )
 
 
+@router.post(
+    "/upload_pdf/presign",
+    summary="Start a direct Estimate PDF upload",
+    response_model=PdfUploadTicket,
+)
+async def presign_pdf_upload(upload: PdfUploadRequest) -> PdfUploadTicket:
+    """
+    Returns a presigned POST for uploading an Estimate PDF straight to S3.
+
+    The client posts `fields` plus the file (as the last form field named
+    `file`) to `url`, then calls `/upload_pdf/staged/{upload_id}` or
+    `/{order_id}/upload_pdf/staged/{upload_id}` to process it. The API never
+    receives the file body itself.
+    """
+    logger.debug("The start of the PRESIGN_PDF_UPLOAD route")
+
+    try:
+        return PdfUploadTicket(**await create_pdf_upload(upload.filename))
+    except Exception as e:
+        logger.critical("An error occurred during the operation of the route"
+                        "PRESIGN_PDF_UPLOAD. DETAILS: {}".format(e))
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error when preparing the upload",
+        )
+
+
+@router.post(
+    "/upload_pdf/staged/{upload_id}",
+    summary="Process a directly uploaded Estimate PDF",
+    response_model=PdfUploadResponse,
+)
+async def upload_staged_pdf(upload_id: str) -> PdfUploadResponse:
+    logger.debug("The start of the UPLOAD_STAGED_PDF route")
+
+    async with open_staged_pdf(upload_id) as (key, filename, content):
+        response = await process_estimate_pdf(filename, content)
+    await drop_staged_pdf(key)
+
+    return response
+
+
+@router.post(
+    "/{order_id}/upload_pdf/staged/{upload_id}",
+    summary="Process a directly uploaded Estimate PDF for an Order",
+    response_model=PdfUploadResponse,
+)
+async def upload_staged_pdf_to_order(order_id: PydanticObjectId, upload_id: str) -> PdfUploadResponse:
+    logger.debug("The start of the UPLOAD_STAGED_PDF_TO_ORDER route")
+
+    async with open_staged_pdf(upload_id) as (key, filename, content):
+        response = await process_order_estimate_pdf(order_id, filename, content)
+    await drop_staged_pdf(key)
+
+    return response
+
+
 def repair_result_json(updates_json: dict) -> dict:
     logger.debug("The start of the REPAIR_RESULT_JSON function")
 
@@ -575,6 +664,7 @@ async def change_result_json_file(order_id: PydanticObjectId,
     try:
         new_updates = repair_result_json(updates_json=updates.updates)
         builder = await get_order_builder_path(order_id)
+        await compact_patched_json(str(order_id), builder.get_s3_json_path("result.json"))
         update_response = await update_json_file(update_data=new_updates,
                                                  s3_path=builder.get_s3_json_path("result.json"))
 
@@ -612,6 +702,93 @@ async def change_result_json_file(order_id: PydanticObjectId,
         )
 
 
+def repair_patch_value(path: str, value: Any) -> Any:
+    """
+    Validates only the part of result.json a patch operation touches:
+    whole line items and areas are repaired like in repair_result_json,
+    anything else is passed through.
+    """
+    tokens = parse_pointer(path)
+    models = {"LineItems": LineItem, "Areas": Area, "ChildAreas": Area}
+
+    try:
+        if len(tokens) >= 2 and tokens[-2] in models:
+            return models[tokens[-2]].model_validate(value).model_dump(by_alias=True)
+        if tokens and tokens[-1] in models and isinstance(value, list):
+            return [models[tokens[-1]].model_validate(item).model_dump(by_alias=True) for item in value]
+    except ValidationError as e:
+        logger.error(f"Error when repair patch value for {path}: {e}")
+
+    return value
+
+
+@router.patch(
+    path="/patch_result_json/{order_id}",
+    summary="Apply JSON Patch to result.json file",
+    response_model=UpdateResponseWithURL,
+)
+async def patch_result_json_file(order_id: PydanticObjectId,
+                                 operations: list[JSONPatchOperation]) -> UpdateResponseWithURL:
+    """
+        Apply an RFC 6902 JSON Patch to the JSON Result file for Order.
+
+        The patch is appended to the order's delta log and folded into result.json
+        by the background compactor, so only the patched values are sent and validated.
+
+        Parameters:
+        - order_id: The ID of the Order. (Type: PydanticObjectId)
+        - operations: JSON Patch operations. (Type: list)
+
+        Returns:
+        - An UpdateResponseWithURL object with message confirming the completion of the operation. (Type: dict)
+
+        Raises:
+        - HTTPException: If the order, the user or result.json is not found.
+        - HTTPException: If the patch cannot be applied to result.json.
+        - HTTPException: If result.json was patched concurrently too many times.
+    """
+    logger.debug("The start of the PATCH_RESULT_JSON_FILE function")
+
+    try:
+        patch = []
+        for operation in operations:
+            item = operation.model_dump(by_alias=True, exclude_unset=True)
+            if "value" in item:
+                item["value"] = repair_patch_value(operation.path, item["value"])
+            patch.append(item)
+
+        builder = await get_order_builder_path(order_id)
+        sequence = await append_patch(str(order_id), builder.get_s3_json_path("result.json"), patch)
+
+        logger.success("The route PATCH_RESULT_JSON_FILE has been successfully completed. "
+                       "The request is being sent")
+
+        return UpdateResponseWithURL(
+            message=f"Patch {sequence} accepted",
+            json_url=builder.get_external_json_url("result.json")
+        )
+
+    except JsonPatchError as e:
+        logger.error(f"PATCH_RESULT_JSON_FILE: patch does not apply: {e}")
+
+        raise HTTPException(
+            status_code=HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Patch cannot be applied: {e}"
+        )
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.critical("An error occurred during the operation of the route"
+                        "PATCH_RESULT_JSON_FILE. DETAILS: {}".format(e))
+
+        raise HTTPException(
+            status_code=HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f'Failed to patch result.json file. Detail: {e}',
+        )
+
+
 @router.delete(
     path="/delete_result_json/{order_id}",
     summary="Delete result.json file",
@@ -637,6 +814,7 @@ async def delete_result_json_file(order_id: PydanticObjectId) -> UpdateResponse:
     try:
         builder = await get_order_builder_path(order_id)
         delete_response = await delete_json_file(s3_path=builder.get_s3_json_path("result.json"))
+        await drop_all_deltas(str(order_id))
 
         logger.success("The route DELETE_RESULT_JSON_FILE has been successfully completed. "
                        "The request is being sent")
@@ -690,23 +868,29 @@ async def update_order_with_url(order: Order, user: User):
         )
 
 
-async def update_orders_with_user_info(orders: list[Order]):
-    logger.debug("The start of the UPDATE_ORDER_WITH_URL function")
+async def get_order_listing(limit: int, offset: int,
+                            after: Optional[PydanticObjectId] = None,
+                            user_id: Optional[PydanticObjectId] = None) -> list[OrderWithPicture]:
+    """
+    Loads a page of orders with one aggregation and sets `lineItemJsonUrl`
+    for the orders whose result.json exists. Existence is checked in bulk
+    behind the existence cache, with at most one HEAD per order on the page.
+    """
+    logger.debug("The start of the GET_ORDER_LISTING function")
 
-    try:
-        user_ids = {order.userID for order in orders}
-        user_tasks = [retrieve_user_by_id(user_id) for user_id in user_ids]
-        users = await asyncio.gather(*user_tasks)
-        user_map = {user.id: user for user in users}
+    listing = await retrieve_order_listing(limit, offset, after, user_id)
 
-        update_tasks = [update_order_with_url(order, user_map.get(order.userID)) for order in orders]
-        await asyncio.gather(*update_tasks)
+    json_paths = {
+        order.id: UrlBuilder(identity, order.itemID).get_s3_json_path("result.json")
+        for order, identity in listing if identity
+    }
+    existing = await check_files_exist_in_s3(list(json_paths.values()))
 
-    except Exception as e:
-        logger.error("An error occurred during the operation of the function"
-                     "UPDATE_ORDERS_WITH_USER_INFO. DETAILS: {}".format(e))
+    for order, identity in listing:
+        if order.id in json_paths and existing.get(json_paths[order.id]):
+            order.lineItemJsonUrl = UrlBuilder(identity, order.itemID).get_external_json_url("result.json")
 
-        raise
+    return [order for order, _ in listing]
 
 
 @router.put(
@@ -888,6 +1072,7 @@ async def preparing_json_for_repair(order: Order) -> None:
 
     try:
         builder = await get_order_builder_path(order.id)
+        await compact_patched_json(str(order.id), builder.get_s3_json_path("result.json"))
         result_json = await get_json_from_s3(s3_path=builder.get_s3_json_path("result.json"))
         updates = UpdateJSON(updates=result_json)
         await change_result_json_file(order_id=order.id, updates=updates)
@@ -920,9 +1105,13 @@ async def repair_all_result_json() -> UpdateResponse:
     try:
         all_orders = await retrieve_all_orders()
 
-        tasks = [preparing_json_for_repair(order) for order in all_orders]
+        result = await fan_out("repair_result_json", all_orders, preparing_json_for_repair)
+
+        if result.failures:
+            logger.warning(f"REPAIR_ALL_RESULT_JSON: {len(result.failures)} of {result.total} orders failed")
 
-        await asyncio.gather(*tasks)
+            return UpdateResponse(message=f"Completed repairs on {result.succeeded} result.json files, "
+                                          f"{len(result.failures)} failed")
 
         logger.success("The route REPAIR_ALL_RESULT_JSON_ has been successfully completed. "
                        "The request is being sent")
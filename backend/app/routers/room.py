@@ -62,7 +62,7 @@ async def post_room_area(id: PydanticObjectId, room_id: PydanticObjectId, area:
             )
         builder = UrlBuilder(user.identity, order.itemID)
         s3_path = builder.get_s3_json_path(f"{room_id}.json")
-        await create_json_file(area.model_dump(by_alias=True), s3_path)
+        await create_json_file(area, s3_path)
 
         logger.success("The route POST_ROOM_AREA has been successfully completed. "
                        "The request is being sent")
@@ -0,0 +1,66 @@
+import logging
+
+from fastapi import APIRouter, Query
+
+from ..crud.order_count import order_counts
+from ..crud.user_cache import user_cache
+from ..db import indexes
+from ..db.mongodb_utils import DOCUMENT_MODELS
+from ..s3.metrics import json_read_metrics
+from ..s3.cache import json_cache, exists_cache, listing_cache
+from ..s3.backup import last_summaries
+from ..s3.deletion import last_summaries as delete_summaries
+from ..s3.delta_log import recent_conflicts as delta_conflicts
+from ..utils.fan_out import last_runs as fan_out_runs
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+
+@router.get("/s3", response_model=dict, summary="S3 JSON I/O metrics")
+async def get_s3_stats() -> dict:
+    logger.debug("The start of the GET_S3_STATS route")
+
+    return {
+        "json_reads": json_read_metrics.snapshot(),
+        "json_cache": json_cache.snapshot(),
+        "exists_cache": exists_cache.snapshot(),
+        "listing_cache": listing_cache.snapshot(),
+        "copy_runs": last_summaries,
+        "delete_runs": delete_summaries,
+        "delta_conflicts": list(delta_conflicts),
+        "fan_out_runs": fan_out_runs,
+    }
+
+
+@router.get("/orders", response_model=dict, summary="Order count cache metrics")
+async def get_order_stats() -> dict:
+    logger.debug("The start of the GET_ORDER_STATS route")
+
+    return {
+        "order_counts": order_counts.snapshot(),
+    }
+
+
+@router.get("/users", response_model=dict, summary="User cache metrics")
+async def get_user_stats() -> dict:
+    logger.debug("The start of the GET_USER_STATS route")
+
+    return {
+        "user_cache": user_cache.snapshot(),
+    }
+
+
+@router.get("/indexes", response_model=dict, summary="Declared vs live MongoDB indexes")
+async def get_index_stats(
+        refresh: bool = Query(False, description="Re-read the live indexes before reporting")
+) -> dict:
+    logger.debug("The start of the GET_INDEX_STATS route")
+
+    if refresh:
+        await indexes.refresh_index_reports(DOCUMENT_MODELS)
+
+    return {
+        "indexes": indexes.snapshot(),
+    }
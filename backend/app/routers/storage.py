@@ -0,0 +1,50 @@
+import logging
+
+from botocore.exceptions import ClientError
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.datastructures import UploadFile
+from starlette.status import HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST, HTTP_403_FORBIDDEN
+
+from ..s3.local_storage import storage
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/local_storage", tags=["Local storage"])
+
+
+@router.post(
+    "/upload",
+    summary="Receive a presigned POST upload (local storage backend only)",
+    status_code=HTTP_204_NO_CONTENT,
+)
+async def upload_object(request: Request) -> Response:
+    """
+    Stands in for the S3 endpoint that presigned POST forms are sent to when
+    `s3_client_backend` is "local". The form fields are checked against the
+    signed policy and the `file` field is stored under `key`.
+    """
+    logger.debug("The start of the UPLOAD_OBJECT route")
+
+    form = await request.form()
+    file = form.get("file")
+    if not isinstance(file, UploadFile):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="The file must be posted as the `file` form field"
+        )
+
+    fields = {name: value for name, value in form.items() if name != "file"}
+    try:
+        await storage.accept_presigned_post(fields, file.file, file.size)
+    except ClientError as e:
+        error = e.response["Error"]
+        logger.error(f"UPLOAD_OBJECT: rejected upload of {fields.get('key')}: {error['Message']}")
+
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN if error["Code"] == "AccessDenied" else HTTP_400_BAD_REQUEST,
+            detail=error["Message"]
+        )
+    finally:
+        await form.close()
+
+    return Response(status_code=HTTP_204_NO_CONTENT)
@@ -13,6 +13,7 @@ s3 = boto3.client(
     aws_access_key_id=settings.s3_access_key_id,
     aws_secret_access_key=settings.s3_secret_access_key,
     region_name=settings.s3_region_name,
+    endpoint_url=settings.s3_endpoint_url,
 )
 
 
@@ -25,13 +26,13 @@ def aio(f):
     return aio_wrapper
 
 
-def aio_paginator(f):
+def aio_paginator(f, result_key="Contents"):
     def sync_wrapper(**kwargs):
         paginator = f()
 
         results = []
         for page in paginator.paginate(**kwargs):
-            results.extend([item for item in page.get("Contents", [])])
+            results.extend([item for item in page.get(result_key, [])])
 
         return results
 
@@ -43,10 +44,61 @@ def aio_paginator(f):
     return aio_wrapper
 
 
+def aio_page_iterator(f, result_key="Contents"):
+    async def aio_wrapper(**kwargs):
+        loop = asyncio.get_running_loop()
+        pages = iter(f().paginate(**kwargs))
+
+        while True:
+            page = await loop.run_in_executor(executor, next, pages, None)
+            if page is None:
+                break
+
+            yield page.get(result_key, [])
+
+    return aio_wrapper
+
+
+async def read_body(response: dict) -> bytes:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, response["Body"].read)
+
+
+async def iter_body(response: dict, chunk_size: int):
+    loop = asyncio.get_running_loop()
+    body = response["Body"]
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, body.read, chunk_size)
+            if not chunk:
+                break
+
+            yield chunk
+    finally:
+        body.close()
+
+
+def release_body(response: dict) -> None:
+    response["Body"].close()
+
+
+async def close_client() -> None:
+    executor.shutdown(wait=False)
+
+
 put_object = aio(s3.put_object)
 get_object = aio(s3.get_object)
+head_object = aio(s3.head_object)
 delete_object = aio(s3.delete_object)
 list_objects = aio_paginator(functools.partial(s3.get_paginator, "list_objects_v2"))
+list_common_prefixes = aio_paginator(functools.partial(s3.get_paginator, "list_objects_v2"),
+                                     "CommonPrefixes")
+iter_object_pages = aio_page_iterator(functools.partial(s3.get_paginator, "list_objects_v2"))
 delete_objects = aio(s3.delete_objects)
 copy_object = aio(s3.copy_object)
 directory_object = aio(s3.list_objects_v2)
+create_multipart_upload = aio(s3.create_multipart_upload)
+upload_part = aio(s3.upload_part)
+complete_multipart_upload = aio(s3.complete_multipart_upload)
+abort_multipart_upload = aio(s3.abort_multipart_upload)
+generate_presigned_post = aio(s3.generate_presigned_post)
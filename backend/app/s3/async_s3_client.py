@@ -0,0 +1,202 @@
+import asyncio
+import contextlib
+import logging
+
+from aiobotocore.config import AioConfig
+from aiobotocore.session import get_session
+
+from ..config import settings
+
+log = logging.getLogger(__name__)
+
+
+class AsyncS3Client:
+    """
+    Native async S3 client built on aiobotocore.
+
+    One client (and one aiohttp connection pool) is shared by everything
+    that runs on the same event loop. An aiohttp session only works on the
+    loop it was created on, so code that runs its own loop (`asyncio.run` in
+    a thread, a scheduler job) gets a client of its own instead of breaking
+    the one of the main loop. Clients are created lazily on the first call,
+    so importing the module never opens connections, and `close()` closes
+    the client of the calling loop on shutdown.
+    """
+
+    def __init__(
+            self,
+            max_pool_connections: int,
+            keepalive_timeout: float,
+            connect_timeout: float,
+            read_timeout: float,
+            retry_mode: str,
+            max_attempts: int,
+            operation_timeout: float,
+            operation_timeouts: dict[str, float],
+            endpoint_url: str = None,
+    ):
+        self.config = AioConfig(
+            max_pool_connections=max_pool_connections,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={"mode": retry_mode, "max_attempts": max_attempts},
+            connector_args={"keepalive_timeout": keepalive_timeout},
+        )
+        self.endpoint_url = endpoint_url
+        self.operation_timeout = operation_timeout
+        self.operation_timeouts = operation_timeouts
+
+        # event loop -> (client, exit stack)
+        self._clients: dict[asyncio.AbstractEventLoop, tuple] = {}
+        self._locks: dict[asyncio.AbstractEventLoop, asyncio.Lock] = {}
+
+    def get_timeout(self, operation_name: str) -> float:
+        return self.operation_timeouts.get(operation_name, self.operation_timeout)
+
+    async def get_client(self):
+        loop = asyncio.get_running_loop()
+        if loop in self._clients:
+            return self._clients[loop][0]
+
+        lock = self._locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            if loop not in self._clients:
+                self.forget_closed_loops()
+                log.info(f"Opening S3 client with pool size {self.config.max_pool_connections}")
+
+                exit_stack = contextlib.AsyncExitStack()
+                session = get_session()
+                client = await exit_stack.enter_async_context(
+                    session.create_client(
+                        "s3",
+                        aws_access_key_id=settings.s3_access_key_id,
+                        aws_secret_access_key=settings.s3_secret_access_key,
+                        region_name=settings.s3_region_name,
+                        endpoint_url=self.endpoint_url,
+                        config=self.config,
+                    )
+                )
+                self._clients[loop] = (client, exit_stack)
+
+        return self._clients[loop][0]
+
+    def forget_closed_loops(self) -> None:
+        # A loop that was closed without closing its client cannot run the
+        # cleanup any more, so its client is only dropped
+        for loop in [loop for loop in list(self._clients) if loop.is_closed()]:
+            log.warning("Dropping the S3 client of a closed event loop")
+            self._clients.pop(loop, None)
+            self._locks.pop(loop, None)
+
+    async def close(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._locks.setdefault(loop, asyncio.Lock()):
+            entry = self._clients.pop(loop, None)
+            if entry is not None:
+                await entry[1].aclose()
+
+        self._locks.pop(loop, None)
+
+    def operation(self, operation_name: str):
+        async def aio_wrapper(**kwargs):
+            client = await self.get_client()
+            method = getattr(client, operation_name)
+
+            return await asyncio.wait_for(
+                method(**kwargs),
+                timeout=self.get_timeout(operation_name)
+            )
+
+        return aio_wrapper
+
+    def page_iterator(self, operation_name: str, result_key: str = "Contents"):
+        async def aio_wrapper(**kwargs):
+            client = await self.get_client()
+            paginator = client.get_paginator(operation_name)
+
+            pages = aiter(paginator.paginate(**kwargs))
+            while True:
+                try:
+                    page = await asyncio.wait_for(
+                        anext(pages),
+                        timeout=self.get_timeout(operation_name)
+                    )
+                except StopAsyncIteration:
+                    break
+
+                yield page.get(result_key, [])
+
+        return aio_wrapper
+
+    def paginator(self, operation_name: str, result_key: str = "Contents"):
+        iterate = self.page_iterator(operation_name, result_key)
+
+        async def aio_wrapper(**kwargs):
+            results = []
+            async for items in iterate(**kwargs):
+                results.extend(items)
+
+            return results
+
+        return aio_wrapper
+
+
+client = AsyncS3Client(
+    max_pool_connections=settings.s3_max_pool_connections,
+    keepalive_timeout=settings.s3_keepalive_timeout,
+    connect_timeout=settings.s3_connect_timeout,
+    read_timeout=settings.s3_read_timeout,
+    retry_mode=settings.s3_retry_mode,
+    max_attempts=settings.s3_max_attempts,
+    operation_timeout=settings.s3_operation_timeout,
+    operation_timeouts=settings.s3_operation_timeouts,
+    endpoint_url=settings.s3_endpoint_url,
+)
+
+
+async def read_body(response: dict) -> bytes:
+    body = response["Body"]
+    async with body:
+        return await asyncio.wait_for(
+            body.read(),
+            timeout=client.get_timeout("get_object")
+        )
+
+
+async def iter_body(response: dict, chunk_size: int):
+    body = response["Body"]
+    async with body:
+        while True:
+            chunk = await asyncio.wait_for(
+                body.read(chunk_size),
+                timeout=client.get_timeout("get_object")
+            )
+            if not chunk:
+                break
+
+            yield chunk
+
+
+def release_body(response: dict) -> None:
+    response["Body"].close()
+
+
+async def close_client() -> None:
+    await client.close()
+
+
+put_object = client.operation("put_object")
+get_object = client.operation("get_object")
+head_object = client.operation("head_object")
+delete_object = client.operation("delete_object")
+list_objects = client.paginator("list_objects_v2")
+list_common_prefixes = client.paginator("list_objects_v2", "CommonPrefixes")
+iter_object_pages = client.page_iterator("list_objects_v2")
+delete_objects = client.operation("delete_objects")
+copy_object = client.operation("copy_object")
+directory_object = client.operation("list_objects_v2")
+create_multipart_upload = client.operation("create_multipart_upload")
+upload_part = client.operation("upload_part")
+complete_multipart_upload = client.operation("complete_multipart_upload")
+abort_multipart_upload = client.operation("abort_multipart_upload")
+generate_presigned_post = client.operation("generate_presigned_post")
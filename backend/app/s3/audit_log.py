@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import logging
+import re
+import time
+import uuid
+from datetime import date, datetime
+from typing import Optional
+
+from ..config import settings
+from ..utils.fan_out import fan_out
+from .cache import record_write
+from .client import put_object, get_object, list_objects, read_body
+
+log = logging.getLogger(__name__)
+
+SEGMENT_DATE_FORMAT = "%Y-%m-%d"
+# Entries of the single log object written before the log was segmented
+LEGACY_LOG_KEY = "log_update.log"
+LEGACY_ENTRY_DATE = re.compile(rb"^\[(\d{4}-\d{2}-\d{2}) ")
+
+
+class SegmentedLog:
+    """
+    Append-only log stored as many small S3 objects.
+
+    Entries are buffered in memory and written as a new segment when the
+    buffer reaches `flush_bytes` or `flush_interval` seconds after the first
+    buffered entry. Segments are grouped by day
+    (`<prefix><YYYY-MM-DD>/<time_ns>-<writer>-<n>.log`), so writers never
+    touch existing objects and several processes can log concurrently.
+
+    Appending never fails because of S3: entries that could not be written
+    stay buffered and go out with the next flush.
+    """
+
+    def __init__(self, prefix: str, flush_bytes: int, flush_interval: float):
+        self.prefix = prefix
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.writer_id = uuid.uuid4().hex[:8]
+
+        self._buffer: list[tuple[date, bytes]] = []
+        self._buffer_bytes = 0
+        self._counter = itertools.count()
+        self._lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def get_day_prefix(self, day: date) -> str:
+        return f"{self.prefix}{day.strftime(SEGMENT_DATE_FORMAT)}/"
+
+    def get_segment_key(self, day: date) -> str:
+        return f"{self.get_day_prefix(day)}{time.time_ns():020d}-{self.writer_id}-{next(self._counter)}.log"
+
+    async def append(self, entry: str) -> None:
+        body = entry.encode("utf-8")
+        self._buffer.append((datetime.now().date(), body))
+        self._buffer_bytes += len(body)
+
+        if self._buffer_bytes >= self.flush_bytes:
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Failed to flush {self.prefix} log, keeping {len(self._buffer)} entries: {e}")
+
+        if self._buffer and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+
+        try:
+            await self.flush()
+        except Exception as e:
+            log.error(f"Failed to flush {self.prefix} log: {e}")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            entries, self._buffer, self._buffer_bytes = self._buffer, [], 0
+            if not entries:
+                return
+
+            segments: dict[date, list[bytes]] = {}
+            for day, entry in entries:
+                segments.setdefault(day, []).append(entry)
+
+            for day, day_entries in segments.items():
+                key = self.get_segment_key(day)
+                try:
+                    await put_object(
+                        Bucket=settings.s3_bucket_name,
+                        Key=key,
+                        Body=b"".join(day_entries)
+                    )
+                    record_write(key)
+
+                except Exception:
+                    # Keep unwritten entries for the next flush
+                    failed = [(segment_day, entry) for segment_day, entry in entries
+                              if segment_day >= day]
+                    self._buffer[:0] = failed
+                    self._buffer_bytes += sum(len(body) for _, body in failed)
+                    raise
+
+    async def read(self, day: date) -> str:
+        segments = await list_objects(
+            Bucket=settings.s3_bucket_name,
+            Prefix=self.get_day_prefix(day)
+        )
+        keys = sorted(item["Key"] for item in segments)
+
+        async def read_segment(key: str) -> bytes:
+            return await read_body(await get_object(Bucket=settings.s3_bucket_name, Key=key))
+
+        result = await fan_out("audit_log_read", keys, read_segment)
+        result.raise_for_failures()
+
+        return b"".join(result.results).decode("utf-8")
+
+    async def import_legacy(self, key: str) -> int:
+        """
+        Splits a single-object log into one segment per day of its entries
+        and returns the number of days. Each day goes to a fixed key that
+        sorts before the segments written since, so running the import
+        again overwrites it instead of duplicating entries.
+        """
+        content = await read_body(await get_object(Bucket=settings.s3_bucket_name, Key=key))
+
+        days: dict[str, list[bytes]] = {}
+        day = None
+        for line in content.splitlines(keepends=True):
+            match = LEGACY_ENTRY_DATE.match(line)
+            if match:
+                day = match.group(1).decode()
+            # Continuation lines belong to the entry above them
+            days.setdefault(day, []).append(line)
+
+        undated = days.pop(None, [])
+        if undated:
+            log.warning(f"Skipping {len(undated)} undated lines of {key}")
+
+        for day, lines in days.items():
+            segment_key = f"{self.prefix}{day}/{0:020d}-legacy-0.log"
+            await put_object(
+                Bucket=settings.s3_bucket_name,
+                Key=segment_key,
+                Body=b"".join(lines)
+            )
+            record_write(segment_key)
+
+        log.info(f"Imported {key} into {len(days)} daily segments of {self.prefix}")
+
+        return len(days)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        await self.flush()
+
+
+damage_log = SegmentedLog(
+    prefix=settings.damage_log_prefix,
+    flush_bytes=settings.damage_log_flush_bytes,
+    flush_interval=settings.damage_log_flush_interval,
+)
+
+
+async def close_damage_log() -> None:
+    await damage_log.close()
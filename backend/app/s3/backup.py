@@ -0,0 +1,445 @@
+import asyncio
+import logging
+import random
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Optional
+
+import orjson
+from botocore.exceptions import ClientError
+
+from ..config import settings
+from ..utils.fan_out import fan_out
+from .cache import record_write
+from .client import (copy_object, list_objects, list_common_prefixes,
+                     get_object, put_object, read_body)
+from .deletion import delete_prefix
+from .serialization import encode_json
+
+log = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "backup/"
+TEMPORARY_BACKUP_PREFIX = "temporary_backup/"
+RENAME_JOURNAL_PREFIX = "rename_journal/"
+PDF_STAGING_PREFIX = "pdf_staging/"
+EXCLUDED_ROOT_PREFIXES = (BACKUP_PREFIX, TEMPORARY_BACKUP_PREFIX, RENAME_JOURNAL_PREFIX,
+                          PDF_STAGING_PREFIX)
+IMAGE_TREE_SEGMENT = "storage"
+IMAGE_TREE_SUBSTRING = "/storage/images/"
+MANIFEST_NAME = "manifest.json"
+CATALOG_KEY = f"{BACKUP_PREFIX}catalog.json"
+SNAPSHOT_DATE_FORMAT = "%d%m%Y"
+
+
+@dataclass
+class CopySummary:
+    name: str
+    total: int = 0
+    copied: int = 0
+    bytes_copied: int = 0
+    retries: int = 0
+    failed: list[tuple[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "total": self.total,
+            "copied": self.copied,
+            "bytes_copied": self.bytes_copied,
+            "retries": self.retries,
+            "failed": len(self.failed),
+            "seconds": round(self.seconds, 3),
+        }
+
+
+last_summaries: dict[str, dict] = {}
+
+
+def is_image_tree(prefix: str) -> bool:
+    return prefix.rstrip("/").rsplit("/", 1)[-1] == IMAGE_TREE_SEGMENT
+
+
+async def list_catalog_prefix(prefix: str) -> list[dict]:
+    """
+    Lists one top-level catalog prefix, one level at a time with a delimiter,
+    so that tour image trees (`<identity>/storage/...`) are never paginated.
+    """
+    objects = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix=prefix,
+        Delimiter="/"
+    )
+    sub_prefixes = await list_common_prefixes(
+        Bucket=settings.s3_bucket_name,
+        Prefix=prefix,
+        Delimiter="/"
+    )
+
+    nested = await fan_out(
+        "catalog_listing",
+        [item["Prefix"] for item in sub_prefixes if not is_image_tree(item["Prefix"])],
+        lambda sub_prefix: list_objects(Bucket=settings.s3_bucket_name, Prefix=sub_prefix),
+        name=f"catalog_listing:{prefix}"
+    )
+    nested.raise_for_failures()
+
+    for sub_objects in nested.results:
+        objects.extend(sub_objects)
+
+    return objects
+
+
+async def list_damage_catalog_objects() -> list[dict]:
+    root_objects = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix="",
+        Delimiter="/"
+    )
+    root_prefixes = await list_common_prefixes(
+        Bucket=settings.s3_bucket_name,
+        Prefix="",
+        Delimiter="/"
+    )
+
+    catalog_prefixes = [
+        item["Prefix"] for item in root_prefixes
+        if item["Prefix"] not in EXCLUDED_ROOT_PREFIXES
+        and not is_image_tree(item["Prefix"])
+    ]
+
+    log.info(f"Listing {len(catalog_prefixes)} damage catalog prefixes")
+
+    listed = await fan_out("catalog_listing", catalog_prefixes, list_catalog_prefix)
+    listed.raise_for_failures()
+
+    objects = list(root_objects)
+    for prefix_objects in listed.results:
+        objects.extend(prefix_objects)
+
+    return [
+        item for item in objects
+        if not item["Key"].endswith("/")
+        and IMAGE_TREE_SUBSTRING not in item["Key"]
+    ]
+
+
+async def copy_with_retry(src_key: str, dest_key: str, summary: CopySummary) -> None:
+    attempts = settings.s3_backup_copy_attempts
+
+    for attempt in range(1, attempts + 1):
+        try:
+            await copy_object(
+                CopySource={"Bucket": settings.s3_bucket_name, "Key": src_key},
+                Bucket=settings.s3_bucket_name,
+                Key=dest_key
+            )
+            record_write(dest_key)
+            return
+
+        except (ClientError, asyncio.TimeoutError) as e:
+            error_code = e.response["Error"]["Code"] if isinstance(e, ClientError) else "Timeout"
+            if error_code == "NoSuchKey" or attempt == attempts:
+                raise
+
+            summary.retries += 1
+            log.warning(f"Retry {attempt} copying {src_key} to {dest_key}: {error_code}")
+            await asyncio.sleep(0.2 * 2 ** attempt)
+
+
+async def copy_objects(name: str, copies: list[tuple[str, str, int]],
+                       workload: str = "backup_copy") -> CopySummary:
+    """
+    Copies (src_key, dest_key, size) triples through the `workload`
+    fan-out, logging progress and returning a summary of the run.
+    """
+    summary = CopySummary(name=name, total=len(copies))
+
+    async def copy(item: tuple[str, str, int]) -> None:
+        src_key, dest_key, size = item
+        await copy_with_retry(src_key, dest_key, summary)
+        summary.copied += 1
+        summary.bytes_copied += size
+
+    result = await fan_out(
+        workload,
+        copies,
+        copy,
+        name=name,
+        progress_every=max(1, summary.total // 10)
+    )
+
+    summary.failed = [(src_key, str(error)) for (src_key, _, _), error in result.failures]
+    summary.seconds = result.seconds
+    last_summaries[name] = summary.as_dict()
+
+    return summary
+
+
+def snapshot_date(prefix: str) -> datetime:
+    try:
+        return datetime.strptime(prefix[len(BACKUP_PREFIX):].strip("/"), SNAPSHOT_DATE_FORMAT)
+    except ValueError:
+        return datetime.min
+
+
+def order_snapshots(prefixes: list[str]) -> list[str]:
+    return sorted(prefixes, key=snapshot_date)
+
+
+async def read_manifest(snapshot: str) -> Optional[dict]:
+    try:
+        response = await get_object(
+            Bucket=settings.s3_bucket_name,
+            Key=f"{snapshot}{MANIFEST_NAME}"
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return None
+        raise
+
+    return orjson.loads(await read_body(response))
+
+
+async def write_manifest(manifest: dict) -> None:
+    key = f"{manifest['snapshot']}{MANIFEST_NAME}"
+    await put_object(
+        Bucket=settings.s3_bucket_name,
+        Key=key,
+        Body=await encode_json(manifest)
+    )
+    record_write(key)
+
+
+async def take_snapshot(snapshot: str, base_manifest: Optional[dict]) -> CopySummary:
+    """
+    Copies into `snapshot` only the catalog objects whose ETag differs from
+    `base_manifest`. Unchanged objects are recorded in the new manifest with
+    the location of the copy that already holds them, so every manifest
+    resolves each key to a physical object without walking older snapshots.
+    """
+    base_objects = base_manifest["objects"] if base_manifest else {}
+    catalog_objects = await list_damage_catalog_objects()
+
+    objects = {}
+    copies = []
+    for item in catalog_objects:
+        key = item["Key"]
+        entry = {"etag": item.get("ETag"), "size": item.get("Size", 0), "location": snapshot}
+
+        base_entry = base_objects.get(key)
+        if base_entry and base_entry["etag"] == entry["etag"]:
+            entry["location"] = base_entry["location"]
+        else:
+            copies.append((key, f"{snapshot}{key}", entry["size"]))
+
+        objects[key] = entry
+
+    log.info(f"Snapshot {snapshot}: {len(copies)} changed of {len(objects)} objects")
+
+    summary = await copy_objects(name=f"backup:{snapshot}", copies=copies)
+
+    for failed_key in {src_key for src_key, _ in summary.failed}:
+        if failed_key in base_objects:
+            objects[failed_key] = base_objects[failed_key]
+        else:
+            objects.pop(failed_key, None)
+
+    manifest = {
+        "snapshot": snapshot,
+        "base": base_manifest["snapshot"] if base_manifest else None,
+        "created": datetime.now().isoformat(),
+        "objects": objects,
+    }
+    await write_manifest(manifest)
+
+    if snapshot.startswith(BACKUP_PREFIX):
+        await record_snapshot(manifest)
+
+    return summary
+
+
+async def restore_snapshot(snapshot: str) -> Optional[CopySummary]:
+    manifest = await read_manifest(snapshot)
+    if manifest is None:
+        return None
+
+    return await copy_objects(
+        name=f"restore:{snapshot}",
+        copies=[(f"{entry['location']}{key}", key, entry["size"])
+                for key, entry in manifest["objects"].items()]
+    )
+
+
+async def rebase_snapshots(pruned: str, remaining: list[str]) -> None:
+    """
+    Before `pruned` is deleted, moves every object that later manifests still
+    reference there into the oldest remaining snapshot.
+    """
+    manifests = [manifest for manifest in
+                 await asyncio.gather(*[read_manifest(snapshot) for snapshot in remaining])
+                 if manifest is not None]
+    if not manifests:
+        return
+
+    target = manifests[0]["snapshot"]
+    referenced = {
+        key: entry["size"]
+        for manifest in manifests
+        for key, entry in manifest["objects"].items()
+        if entry["location"] == pruned
+    }
+    if not referenced:
+        return
+
+    summary = await copy_objects(
+        name=f"rebase:{pruned}",
+        copies=[(f"{pruned}{key}", f"{target}{key}", size) for key, size in referenced.items()]
+    )
+    if summary.failed:
+        raise RuntimeError(f"Failed to move {len(summary.failed)} objects out of {pruned}")
+
+    for manifest in manifests:
+        for entry in manifest["objects"].values():
+            if entry["location"] == pruned:
+                entry["location"] = target
+
+    await asyncio.gather(*[write_manifest(manifest) for manifest in manifests])
+
+
+def catalog_entry(manifest: dict) -> dict:
+    return {
+        "snapshot": manifest["snapshot"],
+        "created": manifest["created"],
+        "objects": len(manifest["objects"]),
+        "bytes": sum(entry["size"] for entry in manifest["objects"].values()),
+    }
+
+
+async def read_catalog() -> tuple[Optional[list[dict]], Optional[str]]:
+    try:
+        response = await get_object(
+            Bucket=settings.s3_bucket_name,
+            Key=CATALOG_KEY
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return None, None
+        raise
+
+    return orjson.loads(await read_body(response))["snapshots"], response.get("ETag")
+
+
+async def build_catalog() -> list[dict]:
+    """
+    Builds catalog entries for the snapshots currently under `backup/`,
+    from their manifests or, for snapshots taken before manifests existed,
+    from a listing.
+    """
+    prefixes = [item["Prefix"] for item in await list_common_prefixes(
+        Bucket=settings.s3_bucket_name,
+        Prefix=BACKUP_PREFIX,
+        Delimiter="/"
+    )]
+
+    async def describe(snapshot: str) -> dict:
+        manifest = await read_manifest(snapshot)
+        if manifest is not None:
+            return catalog_entry(manifest)
+
+        objects = await list_objects(Bucket=settings.s3_bucket_name, Prefix=snapshot)
+        return {
+            "snapshot": snapshot,
+            "created": snapshot_date(snapshot).isoformat(),
+            "objects": len(objects),
+            "bytes": sum(item.get("Size", 0) for item in objects),
+        }
+
+    result = await fan_out("catalog_listing", prefixes, describe, name="build_backup_catalog")
+    result.raise_for_failures()
+
+    return result.results
+
+
+async def update_catalog(change: Callable[[list[dict]], list[dict]]) -> list[dict]:
+    """
+    Applies `change` to the stored catalog with a conditional write and
+    returns the new entries ordered by creation time. A missing catalog is
+    built from the snapshots in the bucket first.
+    """
+    attempts = settings.s3_conditional_write_attempts
+
+    for attempt in range(1, attempts + 1):
+        entries, etag = await read_catalog()
+        conditions = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        if entries is None:
+            entries = await build_catalog()
+
+        entries = sorted(change(entries), key=lambda entry: entry["created"])
+
+        try:
+            await put_object(
+                Bucket=settings.s3_bucket_name,
+                Key=CATALOG_KEY,
+                Body=await encode_json({"snapshots": entries}),
+                **conditions
+            )
+            record_write(CATALOG_KEY)
+
+            return entries
+
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise
+
+            log.warning(f"Concurrent backup catalog update, retrying ({attempt}/{attempts})")
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    raise RuntimeError("Backup catalog was modified concurrently")
+
+
+async def list_restore_points() -> list[dict]:
+    entries, _ = await read_catalog()
+    if entries is None:
+        entries = await update_catalog(lambda current: current)
+
+    return sorted(entries, key=lambda entry: entry["created"])
+
+
+async def record_snapshot(manifest: dict) -> list[dict]:
+    entry = catalog_entry(manifest)
+
+    return await update_catalog(
+        lambda entries: [item for item in entries if item["snapshot"] != entry["snapshot"]] + [entry]
+    )
+
+
+async def prune_snapshots(retention: int, keep: Optional[str] = None) -> list[str]:
+    """
+    Deletes the oldest snapshots (by creation time) so that at most
+    `retention - 1` remain besides `keep`, making room for the next one.
+    Objects still referenced by later manifests are moved out of each
+    pruned snapshot first; the pruned prefixes are then deleted in parallel.
+    """
+    entries = await list_restore_points()
+    snapshots = [entry["snapshot"] for entry in entries if entry["snapshot"] != keep]
+    pruned = snapshots[:max(0, len(snapshots) - retention + 1)]
+    if not pruned:
+        return []
+
+    for index, snapshot in enumerate(pruned):
+        await rebase_snapshots(snapshot, snapshots[index + 1:])
+
+    summaries = await asyncio.gather(*[
+        delete_prefix(snapshot, name=f"prune_backup:{snapshot}") for snapshot in pruned
+    ])
+
+    deleted = [summary.name.split(":", 1)[1] for summary in summaries if not summary.failed]
+    for summary in summaries:
+        if summary.failed:
+            log.error(f"Failed to delete {len(summary.failed)} objects of {summary.name}")
+
+    await update_catalog(lambda current: [entry for entry in current if entry["snapshot"] not in deleted])
+    log.info(f"Pruned backups: {deleted}")
+
+    return deleted
@@ -0,0 +1,263 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field
+from typing import Optional
+
+from ..config import settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedObject:
+    etag: str
+    body: bytes
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    stale: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class JsonObjectCache:
+    """
+    LRU cache of raw S3 JSON bodies keyed by S3 key and bounded by size.
+
+    Entries are never served blindly: the reader sends the stored ETag as
+    If-None-Match and only reuses the body on 304 Not Modified.
+    """
+
+    def __init__(self, max_bytes: int, max_object_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.size = 0
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, CachedObject] = OrderedDict()
+
+    def get(self, key: str) -> Optional[CachedObject]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+
+        return entry
+
+    def put(self, key: str, etag: Optional[str], body: bytes, metadata: Optional[dict] = None) -> None:
+        self._discard(key)
+
+        if not etag or len(body) > self.max_object_bytes:
+            return
+
+        self._entries[key] = CachedObject(etag=etag, body=bytes(body), metadata=metadata or {})
+        self.size += len(body)
+
+        while self.size > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+            self.stats.evictions += 1
+            log.debug(f"Evicted {evicted_key} from S3 JSON cache")
+
+    def invalidate(self, key: str) -> None:
+        if self._discard(key):
+            self.stats.invalidations += 1
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self.invalidate(key)
+
+    def _discard(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+
+        self.size -= len(entry.body)
+        return True
+
+    def snapshot(self) -> dict:
+        return {
+            **asdict(self.stats),
+            "entries": len(self._entries),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+@dataclass
+class ExistenceStats:
+    hits: int = 0
+    misses: int = 0
+    head_requests: int = 0
+    list_requests: int = 0
+
+
+class ExistenceCache:
+    """
+    Short-lived answers to "does this key exist", kept for `ttl` seconds and
+    overwritten by our own writes and deletes.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = ExistenceStats()
+        self._entries: dict[str, tuple[bool, float]] = {}
+
+    def get(self, key: str) -> Optional[bool]:
+        entry = self._entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self.stats.misses += 1
+            return None
+
+        self.stats.hits += 1
+        return entry[0]
+
+    def set(self, key: str, exists: bool) -> None:
+        if len(self._entries) >= self.max_entries:
+            self._prune()
+
+        self._entries[key] = (exists, time.monotonic() + self.ttl)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        self._entries = {key: entry for key, entry in self._entries.items() if entry[1] >= now}
+
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        return {**asdict(self.stats), "entries": len(self._entries), "ttl": self.ttl}
+
+
+@dataclass
+class ListingStats:
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    reconciliations: int = 0
+    drift: int = 0
+
+
+class ListingCache:
+    """
+    Key listings of S3 prefixes, kept up to date by our own writes and
+    deletes and re-listed after `max_age` seconds or by `reconcile`.
+
+    A listing that is in flight while keys under its prefix change would
+    miss those changes, so mutations are journaled per pending prefix and
+    replayed when the listing is stored.
+    """
+
+    def __init__(self, max_age: float, max_entries: int):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.stats = ListingStats()
+        self._entries: OrderedDict[str, tuple[set[str], float]] = OrderedDict()
+        self._pending: dict[str, list[tuple[str, str]]] = {}
+
+    def get(self, prefix: str) -> Optional[list[str]]:
+        entry = self._entries.get(prefix)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        if entry[1] + self.max_age < time.monotonic():
+            self.stats.expired += 1
+            del self._entries[prefix]
+            return None
+
+        self._entries.move_to_end(prefix)
+        self.stats.hits += 1
+        return sorted(entry[0])
+
+    def begin(self, prefix: str) -> None:
+        self._pending.setdefault(prefix, [])
+
+    def put(self, prefix: str, keys: list[str]) -> None:
+        listed = set(keys)
+        for action, key in self._pending.pop(prefix, []):
+            self._apply(listed, action, key)
+
+        previous = self._entries.pop(prefix, None)
+        if previous is not None and previous[0] != listed:
+            self.stats.drift += len(previous[0] ^ listed)
+
+        self._entries[prefix] = (listed, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def abort(self, prefix: str) -> None:
+        self._pending.pop(prefix, None)
+
+    def prefixes(self) -> list[str]:
+        return list(self._entries)
+
+    def record(self, action: str, key: str) -> None:
+        for prefix, journal in self._pending.items():
+            if self._affects(prefix, action, key):
+                journal.append((action, key))
+
+        for prefix, (keys, _) in self._entries.items():
+            if self._affects(prefix, action, key):
+                self._apply(keys, action, key)
+
+    @staticmethod
+    def _affects(prefix: str, action: str, key: str) -> bool:
+        return key.startswith(prefix) or (action == "delete_prefix" and prefix.startswith(key))
+
+    @staticmethod
+    def _apply(keys: set[str], action: str, key: str) -> None:
+        match action:
+            case "write":
+                keys.add(key)
+            case "delete":
+                keys.discard(key)
+            case "delete_prefix":
+                keys.difference_update([item for item in keys if item.startswith(key)])
+
+    def snapshot(self) -> dict:
+        return {**asdict(self.stats), "entries": len(self._entries), "max_age": self.max_age}
+
+
+json_cache = JsonObjectCache(
+    max_bytes=settings.s3_json_cache_max_bytes,
+    max_object_bytes=settings.s3_json_cache_max_object_bytes
+)
+
+exists_cache = ExistenceCache(
+    ttl=settings.s3_exists_cache_ttl,
+    max_entries=settings.s3_exists_cache_max_entries
+)
+
+
+listing_cache = ListingCache(
+    max_age=settings.s3_listing_cache_max_age,
+    max_entries=settings.s3_listing_cache_max_entries
+)
+
+
+def record_write(key: str) -> None:
+    json_cache.invalidate(key)
+    exists_cache.set(key, True)
+    listing_cache.record("write", key)
+
+
+def record_delete(key: str) -> None:
+    json_cache.invalidate(key)
+    exists_cache.set(key, False)
+    listing_cache.record("delete", key)
+
+
+def record_prefix_delete(prefix: str) -> None:
+    json_cache.invalidate_prefix(prefix)
+    exists_cache.invalidate_prefix(prefix)
+    listing_cache.record("delete_prefix", prefix)
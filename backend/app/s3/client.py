@@ -0,0 +1,104 @@
+from typing import AsyncIterator, Optional, Protocol, runtime_checkable
+
+from ..config import settings
+
+
+@runtime_checkable
+class ObjectStorage(Protocol):
+    """
+    The S3 operations every client backend provides, with boto3 keyword
+    arguments and response dicts. The aiobotocore and executor backends
+    expose them as module-level functions and `LocalStorage` as methods;
+    errors are raised as botocore ClientError with the S3 error codes.
+    Bodies of get_object responses are consumed with the backend's
+    `read_body` / `iter_body` / `release_body`.
+    """
+
+    async def put_object(self, *, Bucket: str, Key: str, Body=b"", **kwargs) -> dict: ...
+
+    async def get_object(self, *, Bucket: str, Key: str, **kwargs) -> dict: ...
+
+    async def head_object(self, *, Bucket: str, Key: str, **kwargs) -> dict: ...
+
+    async def delete_object(self, *, Bucket: str, Key: str, **kwargs) -> dict: ...
+
+    async def delete_objects(self, *, Bucket: str, Delete: dict, **kwargs) -> dict: ...
+
+    async def copy_object(self, *, CopySource: dict, Bucket: str, Key: str, **kwargs) -> dict: ...
+
+    async def list_objects(self, *, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                           **kwargs) -> list[dict]: ...
+
+    async def list_common_prefixes(self, *, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                                   **kwargs) -> list[dict]: ...
+
+    def iter_object_pages(self, *, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                          **kwargs) -> AsyncIterator[list[dict]]: ...
+
+    async def directory_object(self, *, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                               **kwargs) -> dict: ...
+
+    async def create_multipart_upload(self, *, Bucket: str, Key: str, **kwargs) -> dict: ...
+
+    async def upload_part(self, *, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body=b"",
+                          **kwargs) -> dict: ...
+
+    async def complete_multipart_upload(self, *, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict,
+                                        **kwargs) -> dict: ...
+
+    async def abort_multipart_upload(self, *, Bucket: str, Key: str, UploadId: str, **kwargs) -> dict: ...
+
+    async def generate_presigned_post(self, *, Bucket: str, Key: str, **kwargs) -> dict: ...
+
+
+match settings.s3_client_backend:
+    case "local":
+        from .local_storage import (put_object, get_object, head_object, delete_object,
+                                    list_objects, list_common_prefixes, iter_object_pages,
+                                    delete_objects, copy_object,
+                                    directory_object, read_body, iter_body,
+                                    release_body, close_client,
+                                    create_multipart_upload, upload_part,
+                                    complete_multipart_upload, abort_multipart_upload,
+                                    generate_presigned_post)
+    case "executor":
+        from .async_boto_wrapper import (put_object, get_object, head_object, delete_object,
+                                         list_objects, list_common_prefixes, iter_object_pages,
+                                         delete_objects, copy_object,
+                                         directory_object, read_body, iter_body,
+                                         release_body, close_client,
+                                         create_multipart_upload, upload_part,
+                                         complete_multipart_upload, abort_multipart_upload,
+                                         generate_presigned_post)
+    case _:
+        from .async_s3_client import (put_object, get_object, head_object, delete_object,
+                                      list_objects, list_common_prefixes, iter_object_pages,
+                                      delete_objects, copy_object,
+                                      directory_object, read_body, iter_body,
+                                      release_body, close_client,
+                                      create_multipart_upload, upload_part,
+                                      complete_multipart_upload, abort_multipart_upload,
+                                      generate_presigned_post)
+
+__all__ = [
+    "ObjectStorage",
+    "put_object",
+    "get_object",
+    "head_object",
+    "delete_object",
+    "list_objects",
+    "list_common_prefixes",
+    "iter_object_pages",
+    "delete_objects",
+    "copy_object",
+    "directory_object",
+    "read_body",
+    "iter_body",
+    "release_body",
+    "close_client",
+    "create_multipart_upload",
+    "upload_part",
+    "complete_multipart_upload",
+    "abort_multipart_upload",
+    "generate_presigned_post",
+]
@@ -0,0 +1,76 @@
+import asyncio
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from ..config import settings
+
+GZIP = "gzip"
+# zlib wbits value selecting the gzip container
+GZIP_WBITS = 31
+
+
+def get_compression(size: Optional[int] = None) -> Optional[str]:
+    """
+    Returns the Content-Encoding new JSON objects should be stored with, or
+    None when compression is disabled or the body is too small to benefit.
+    """
+    if settings.s3_json_compression != GZIP:
+        return None
+    if size is not None and size < settings.s3_json_compression_min_bytes:
+        return None
+
+    return GZIP
+
+
+def encoding_headers(encoding: Optional[str]) -> dict:
+    # S3 returns these on GET, so public URLs are decoded by HTTP clients
+    if encoding is None:
+        return {}
+
+    return {"ContentEncoding": encoding, "ContentType": "application/json"}
+
+
+def compress(body: bytes) -> bytes:
+    compressor = zlib.compressobj(settings.s3_json_compression_level, wbits=GZIP_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+async def compress_body(body: bytes) -> bytes:
+    # Bodies large enough to stall the event loop are compressed in a worker thread
+    if len(body) > settings.s3_json_offload_threshold:
+        return await asyncio.to_thread(compress, body)
+
+    return compress(body)
+
+
+def iter_compressed(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(settings.s3_json_compression_level, wbits=GZIP_WBITS)
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+class Decompressor:
+    """
+    Incrementally decodes a body stored with `encoding`; bodies without a
+    supported Content-Encoding pass through unchanged.
+    """
+
+    def __init__(self, encoding: Optional[str]):
+        self.decompressor = zlib.decompressobj(wbits=GZIP_WBITS) if encoding == GZIP else None
+
+    def decompress(self, chunk: bytes) -> bytes:
+        if self.decompressor is None:
+            return chunk
+
+        return self.decompressor.decompress(chunk)
+
+    def flush(self) -> bytes:
+        if self.decompressor is None:
+            return b""
+
+        return self.decompressor.flush()
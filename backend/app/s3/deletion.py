@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Iterable
+
+from botocore.exceptions import ClientError
+
+from ..config import settings
+from ..utils.fan_out import fan_out
+from .cache import record_delete
+from .client import delete_objects, iter_object_pages
+
+log = logging.getLogger(__name__)
+
+DELETE_BATCH_SIZE = 1000
+
+
+@dataclass
+class DeleteSummary:
+    name: str
+    total: int = 0
+    deleted: int = 0
+    requests: int = 0
+    failed: list[tuple[str, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def raise_for_failures(self) -> None:
+        if self.failed:
+            key, error = self.failed[0]
+            raise RuntimeError(f"{self.name}: failed to delete {len(self.failed)} of "
+                               f"{self.total} objects, first: {key} ({error})")
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "total": self.total,
+            "deleted": self.deleted,
+            "requests": self.requests,
+            "failed": len(self.failed),
+            "seconds": round(self.seconds, 3),
+        }
+
+
+last_summaries: dict[str, dict] = {}
+
+
+def chunk_keys(keys: Iterable[str]) -> Iterable[list[str]]:
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) == DELETE_BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def stream_prefix_batches(prefix: str) -> AsyncIterable[list[str]]:
+    """
+    Yields the keys under `prefix` in batches of up to 1000 as listing pages
+    arrive, so deletes start after the first page instead of the last.
+    """
+    batch = []
+    async for items in iter_object_pages(Bucket=settings.s3_bucket_name, Prefix=prefix):
+        for item in items:
+            batch.append(item["Key"])
+            if len(batch) == DELETE_BATCH_SIZE:
+                yield batch
+                batch = []
+
+    if batch:
+        yield batch
+
+
+async def delete_batch(batch: list[str], summary: DeleteSummary) -> None:
+    summary.total += len(batch)
+    summary.requests += 1
+
+    try:
+        response = await delete_objects(
+            Bucket=settings.s3_bucket_name,
+            Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+        )
+    except (ClientError, asyncio.TimeoutError) as e:
+        error = e.response["Error"]["Code"] if isinstance(e, ClientError) else "Timeout"
+        log.error(f"{summary.name}: batch of {len(batch)} keys starting at {batch[0]} failed: {error}")
+        summary.failed.extend((key, error) for key in batch)
+        return
+
+    errors = {error["Key"]: f"{error.get('Code')}: {error.get('Message')}"
+              for error in response.get("Errors", [])}
+    summary.failed.extend(errors.items())
+
+    for key in batch:
+        if key not in errors:
+            record_delete(key)
+            summary.deleted += 1
+
+
+async def run_delete(name: str, batches) -> DeleteSummary:
+    summary = DeleteSummary(name=name)
+
+    result = await fan_out(
+        "delete_batch",
+        batches,
+        lambda batch: delete_batch(batch, summary),
+        name=name
+    )
+
+    summary.seconds = result.seconds
+    last_summaries[name.split(":", 1)[0]] = summary.as_dict()
+
+    return summary
+
+
+async def delete_keys(keys: Iterable[str], name: str = "delete") -> DeleteSummary:
+    """
+    Deletes `keys` with one `delete_objects` call per 1000 keys, running
+    batches in parallel through the `delete_batch` fan-out. Keys that could
+    not be deleted are collected in the summary instead of failing the run.
+    """
+    return await run_delete(name, chunk_keys(keys))
+
+
+async def delete_prefix(prefix: str, name: str = "delete_prefix") -> DeleteSummary:
+    """
+    Deletes every object under `prefix`, streaming keys from the listing
+    paginator into parallel `delete_objects` batches.
+    """
+    return await run_delete(name, stream_prefix_batches(prefix))
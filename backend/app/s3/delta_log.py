@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import random
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+import orjson
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+from starlette.status import HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
+
+from ..config import settings
+from ..utils.fan_out import fan_out
+from ..utils.json_patch import JsonPatchError, apply_patch
+from .cache import record_write
+from .client import put_object, get_object, head_object, list_objects, list_common_prefixes, read_body
+from .deletion import delete_keys
+from .file_ops import read_json_object, is_write_conflict
+from .serialization import encode_json
+from .upload import put_json_object
+
+log = logging.getLogger(__name__)
+
+DELTA_PREFIX = "result_json_deltas/"
+DELTA_CONFLICT_PREFIX = "result_json_conflicts/"
+DELTA_NAME_FORMAT = "{:010d}.json"
+# User metadata of the base document: the last delta sequence folded into it
+FOLDED_SEQUENCE_METADATA = "delta-sequence"
+
+recent_conflicts: deque[dict] = deque(maxlen=100)
+
+
+@dataclass
+class PatchedView:
+    """
+    A base document with its pending deltas applied. `folded` is the last
+    sequence already contained in the base, `keys` the deltas applied on top.
+    """
+    target: str
+    document: Union[dict, list]
+    etag: Optional[str]
+    folded: int
+    keys: list[str]
+
+    @property
+    def sequence(self) -> int:
+        return get_delta_sequence(self.keys[-1]) if self.keys else self.folded
+
+
+# Views of recently patched documents by order ID, reused by `append_patch`
+patched_views: OrderedDict[str, PatchedView] = OrderedDict()
+
+
+def get_delta_prefix(order_id: str) -> str:
+    return f"{DELTA_PREFIX}{order_id}/"
+
+
+def get_delta_sequence(key: str) -> int:
+    return int(key.rsplit("/", 1)[-1].split(".", 1)[0])
+
+
+def get_folded_sequence(metadata: dict) -> int:
+    return int(metadata.get(FOLDED_SEQUENCE_METADATA, 0))
+
+
+def get_folded_metadata(sequence: int) -> dict:
+    return {FOLDED_SEQUENCE_METADATA: str(sequence)}
+
+
+async def list_deltas(order_id: str) -> list[str]:
+    objects = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix=get_delta_prefix(order_id)
+    )
+
+    return sorted((item["Key"] for item in objects), key=get_delta_sequence)
+
+
+async def read_delta(key: str) -> dict:
+    response = await get_object(
+        Bucket=settings.s3_bucket_name,
+        Key=key
+    )
+
+    return orjson.loads(await read_body(response))
+
+
+async def read_deltas(keys: list[str]) -> list[dict]:
+    result = await fan_out("delta_log", keys, read_delta)
+    result.raise_for_failures()
+
+    return result.results
+
+
+async def drop_deltas(keys: list[str]) -> None:
+    summary = await delete_keys(keys, name="drop_deltas")
+    summary.raise_for_failures()
+
+
+async def drop_all_deltas(order_id: str) -> None:
+    patched_views.pop(order_id, None)
+    await drop_deltas(await list_deltas(order_id))
+
+
+def apply_deltas(document: Union[dict, list], deltas: list[dict],
+                 keys: list[str]) -> tuple[Union[dict, list], list[tuple[str, str]]]:
+    """
+    Applies pending deltas in order. A delta that no longer applies (the
+    base was replaced by a full write after it was accepted) is left out as
+    a whole and returned with its error as a conflict.
+    """
+    original = orjson.dumps(document)
+    conflicts = {}
+
+    while True:
+        patched = orjson.loads(original) if conflicts else document
+        try:
+            for key, delta in zip(keys, deltas):
+                if key not in conflicts:
+                    failed_key = key
+                    patched = apply_patch(patched, delta["operations"])
+
+            return patched, list(conflicts.items())
+
+        except JsonPatchError as e:
+            conflicts[failed_key] = str(e)
+
+
+async def record_conflicts(order_id: str, deltas: dict[str, dict], conflicts: list[tuple[str, str]]) -> None:
+    """
+    Keeps the deltas that no longer apply under `result_json_conflicts/`
+    together with the reason, so an accepted patch that lost to a full
+    write is reported instead of disappearing when the log is compacted.
+    """
+    for key, error in conflicts:
+        delta = deltas[key]
+        sequence = get_delta_sequence(key)
+        conflict_key = f"{DELTA_CONFLICT_PREFIX}{order_id}/{DELTA_NAME_FORMAT.format(sequence)}"
+
+        await put_object(
+            Bucket=settings.s3_bucket_name,
+            Key=conflict_key,
+            Body=await encode_json({**delta, "error": error})
+        )
+        record_write(conflict_key)
+
+        log.error(f"Patch {sequence} of {delta['target']} conflicts with a full write "
+                  f"and was not applied, kept as {conflict_key}: {error}")
+        recent_conflicts.append({"order_id": order_id, "sequence": sequence,
+                                 "target": delta["target"], "error": error})
+
+
+async def is_base_unchanged(s3_path: str, etag: Optional[str]) -> bool:
+    try:
+        response = await head_object(
+            Bucket=settings.s3_bucket_name,
+            Key=s3_path
+        )
+    except ClientError:
+        return False
+
+    return response.get("ETag") == etag
+
+
+async def read_view(order_id: str, s3_path: str, cached: Optional[PatchedView] = None) -> PatchedView:
+    """
+    Builds the current view of `s3_path`. Deltas whose sequence is not
+    above the one folded into the base are skipped: they were already
+    applied by a compaction, or replaced by a full write.
+
+    A `cached` view is brought up to date when its base is unchanged (one
+    HEAD request), so only the deltas appended since are read.
+    """
+    keys = await list_deltas(order_id)
+
+    if cached is None or cached.target != s3_path or not await is_base_unchanged(s3_path, cached.etag):
+        document, etag, metadata = await read_json_object(s3_path)
+        cached = PatchedView(s3_path, document, etag, get_folded_sequence(metadata), [])
+
+    pending = [key for key in keys if get_delta_sequence(key) > cached.sequence]
+    if pending:
+        cached.document, conflicts = apply_deltas(cached.document, await read_deltas(pending), pending)
+        cached.keys.extend(pending)
+        for key, error in conflicts:
+            log.warning(f"Delta {key} no longer applies to {s3_path}: {error}")
+
+    return cached
+
+
+def remember_view(order_id: str, view: PatchedView) -> None:
+    patched_views[order_id] = view
+    patched_views.move_to_end(order_id)
+
+    while len(patched_views) > settings.result_json_view_cache_entries:
+        patched_views.popitem(last=False)
+
+
+async def read_patched_json(order_id: str, s3_path: str) -> tuple[Union[dict, list], Optional[str], list[str]]:
+    """
+    Returns the current view of `s3_path`: the stored base with all pending
+    deltas applied, the base ETag, and the delta keys that were applied.
+    """
+    view = await read_view(order_id, s3_path)
+
+    return view.document, view.etag, view.keys
+
+
+async def append_patch(order_id: str, s3_path: str, operations: list[dict]) -> int:
+    """
+    Appends a JSON Patch to the delta log of `order_id` and returns its
+    sequence number.
+
+    The patch is checked against the current view first, so every logged
+    delta is known to apply. The view of the last append is kept, so an
+    append only reads the deltas written since. The delta object is created
+    with If-None-Match, which gives concurrent writers a strict order: the
+    loser of a race re-reads the log and retries with the next sequence
+    number.
+    """
+    attempts = settings.s3_conditional_write_attempts
+
+    for attempt in range(1, attempts + 1):
+        # Taken out of the cache while it is patched in place, and only put
+        # back once the delta is stored
+        view = await read_view(order_id, s3_path, patched_views.pop(order_id, None))
+        if len(view.keys) >= settings.result_json_max_pending_deltas:
+            await compact_patched_json(order_id, s3_path)
+            view = await read_view(order_id, s3_path)
+
+        view.document = apply_patch(view.document, operations)
+
+        sequence = view.sequence + 1
+        key = f"{get_delta_prefix(order_id)}{DELTA_NAME_FORMAT.format(sequence)}"
+
+        try:
+            await put_object(
+                Bucket=settings.s3_bucket_name,
+                Key=key,
+                Body=await encode_json({"target": s3_path, "operations": operations}),
+                IfNoneMatch="*"
+            )
+            record_write(key)
+
+            view.keys.append(key)
+            remember_view(order_id, view)
+
+            return sequence
+
+        except ClientError as e:
+            if not is_write_conflict(e):
+                raise
+
+            log.warning(f"Concurrent patch of {s3_path}, retrying ({attempt}/{attempts})")
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    raise HTTPException(
+        status_code=HTTP_409_CONFLICT,
+        detail="File was modified concurrently, try again"
+    )
+
+
+async def compact_patched_json(order_id: str, s3_path: Optional[str] = None) -> int:
+    """
+    Folds the pending deltas of `order_id` into the base document and drops
+    them. The base is written with If-Match, so a concurrent full write wins
+    and compaction is simply retried on the next run. Deltas that no longer
+    apply are recorded as conflicts before the log is dropped. Returns the
+    number of deltas folded.
+
+    The base records the last folded sequence in its metadata, so if the
+    deltas are not dropped (a crash, or a reader in between) they are
+    skipped rather than applied twice, and dropped on the next run.
+    """
+    keys = await list_deltas(order_id)
+    if not keys:
+        return 0
+
+    s3_path = s3_path or (await read_delta(keys[-1]))["target"]
+
+    try:
+        document, etag, metadata = await read_json_object(s3_path)
+    except HTTPException as e:
+        if e.status_code != HTTP_404_NOT_FOUND:
+            raise
+
+        log.warning(f"Dropping {len(keys)} deltas of missing {s3_path}")
+        await drop_deltas(keys)
+        return 0
+
+    folded = get_folded_sequence(metadata)
+    pending = [key for key in keys if get_delta_sequence(key) > folded]
+
+    if pending:
+        deltas = await read_deltas(pending)
+        document, conflicts = apply_deltas(document, deltas, pending)
+
+        await put_json_object(s3_path, document, get_folded_metadata(get_delta_sequence(pending[-1])),
+                              IfMatch=etag)
+        record_write(s3_path)
+        if conflicts:
+            await record_conflicts(order_id, dict(zip(pending, deltas)), conflicts)
+
+    await drop_deltas(keys)
+
+    log.info(f"Compacted {len(pending)} deltas into {s3_path}")
+
+    return len(pending)
+
+
+async def replace_patched_json(order_id: str, s3_path: str, data: Any) -> None:
+    """
+    Replaces the base document of `order_id` with a full write. The pending
+    deltas were accepted against the document being replaced, so they are
+    marked as folded in the new base and dropped instead of being replayed
+    on top of it.
+    """
+    keys = await list_deltas(order_id)
+    sequence = get_delta_sequence(keys[-1]) if keys else 0
+
+    await put_json_object(s3_path, data, get_folded_metadata(sequence))
+    record_write(s3_path)
+    patched_views.pop(order_id, None)
+
+    if keys:
+        log.info(f"Full write of {s3_path} discards {len(keys)} pending deltas")
+        await drop_deltas(keys)
+
+
+async def compact_all_patched_json() -> None:
+    prefixes = await list_common_prefixes(
+        Bucket=settings.s3_bucket_name,
+        Prefix=DELTA_PREFIX,
+        Delimiter="/"
+    )
+    order_ids = [item["Prefix"][len(DELTA_PREFIX):].strip("/") for item in prefixes]
+
+    if order_ids:
+        await fan_out("delta_compaction", order_ids, compact_patched_json)
@@ -1,23 +1,35 @@
 import asyncio
-import json
 import logging
+import random
+import orjson
 from datetime import datetime
-from json import dumps
-from typing import Union
+from typing import Optional, Union
 
 from ..config import settings
-from .async_boto_wrapper import (put_object, get_object, delete_object,
-                                 executor, list_objects, delete_objects,
-                                 copy_object, directory_object)
+from .client import (get_object, head_object, delete_object,
+                     list_objects, copy_object,
+                     directory_object, iter_body, iter_object_pages)
+from .compression import Decompressor
+from .metrics import json_read_metrics, Stopwatch
+from .upload import put_json_object
+from .rename import rename_prefix
+from .deletion import delete_prefix
+from .cache import (json_cache, exists_cache, listing_cache, record_write,
+                    record_delete, record_prefix_delete)
+from .backup import (copy_objects, order_snapshots, read_manifest, take_snapshot,
+                     restore_snapshot, prune_snapshots, list_restore_points,
+                     BACKUP_PREFIX, TEMPORARY_BACKUP_PREFIX, MANIFEST_NAME)
 from ..models.order import UpdateResponse
 from fastapi import HTTPException
 from starlette.status import (
-    HTTP_404_NOT_FOUND
+    HTTP_404_NOT_FOUND,
+    HTTP_409_CONFLICT
 )
 from botocore.exceptions import ClientError
+from ..utils.fan_out import fan_out
 from ..utils.url import UrlBuilder
 from ..models.damage import DamageLineItem
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -37,6 +49,7 @@ async def copy_object_in_s3(src_key, dest_key):
             Bucket=settings.s3_bucket_name,
             Key=dest_key
         )
+        record_write(dest_key)
 
         return UpdateResponse(message="Successfully copied")
     except ClientError as e:
@@ -51,8 +64,7 @@ async def sort_directory_list():
     )
 
     folders = [content['Prefix'] for content in response.get('CommonPrefixes', [])]
-    folders.sort()
-    return folders
+    return order_snapshots(folders)
 
 
 async def back_up_damage_file(
@@ -60,31 +72,19 @@ async def back_up_damage_file(
         daily_backup: bool = True
 ):
     try:
-        all_file_name = await get_file_name_s3_folder(
-            folder_path=""
-        )
-
-        exclusion_substring = '/storage/images/'
-        exclusion_prefix = 'backup/'
-        daily_exclusion_prefix = 'temporary_backup/'
-
-        damage_file_name_gen = [
-            key for key in all_file_name
-            if exclusion_substring not in key
-            and not key.endswith('/')
-            and not key.startswith(exclusion_prefix)
-            and not key.startswith(daily_exclusion_prefix)
-        ]
+        if daily_backup:
+            await prune_snapshots(settings.backup_retention, keep=dest_folder)
 
-        sort_list_directory = await sort_directory_list()
+        base_manifest = await read_manifest(dest_folder)
+        if base_manifest is None and daily_backup:
+            previous = [entry["snapshot"] for entry in await list_restore_points()
+                        if entry["snapshot"] != dest_folder]
+            base_manifest = await read_manifest(previous[-1]) if previous else None
 
-        if len(sort_list_directory) >= 7 and daily_backup:
-            await delete_all_files_from_directories(sort_list_directory[0])
+        summary = await take_snapshot(dest_folder, base_manifest)
 
-        tasks = [copy_object_in_s3(src_key, f"{dest_folder}{src_key}") for src_key in
-                 damage_file_name_gen]
-
-        await asyncio.gather(*tasks)
+        if summary.failed:
+            return UpdateResponse(message=f"Copied with {len(summary.failed)} failures")
 
         return UpdateResponse(message="Successfully copied")
     except Exception as e:
@@ -99,24 +99,54 @@ async def update_backup(destination: str):
     )
 
 
-async def reupdate_backup():
-    try:
-        all_file_name = await get_file_name_s3_folder(
-            folder_path="temporary_backup/"
+async def restore_backup(snapshot: str) -> UpdateResponse:
+    summary = await restore_snapshot(snapshot)
+
+    if summary is None:
+        backup_objects = await list_objects(
+            Bucket=settings.s3_bucket_name,
+            Prefix=snapshot
+        )
+
+        if not backup_objects:
+            log.error(f"Backup {snapshot} not found")
+
+            raise HTTPException(
+                status_code=HTTP_404_NOT_FOUND,
+                detail=f"Backup not found"
+            )
+
+        summary = await copy_objects(
+            name=f"restore:{snapshot}",
+            copies=[(item["Key"], item["Key"][len(snapshot):], item.get("Size", 0))
+                    for item in backup_objects
+                    if not item["Key"].endswith("/") and item["Key"] != f"{snapshot}{MANIFEST_NAME}"]
         )
 
-        tasks = [copy_object_in_s3(src_key, src_key[len("temporary_backup/"):]) for src_key in
-                 all_file_name]
+    if summary.failed:
+        return UpdateResponse(message=f"Copied with {len(summary.failed)} failures")
 
-        await asyncio.gather(*tasks)
+    return UpdateResponse(message="Successfully copied")
 
-        return UpdateResponse(message="Successfully copied")
+
+async def reupdate_backup():
+    try:
+        return await restore_backup(TEMPORARY_BACKUP_PREFIX)
 
     except Exception as e:
         log.error(f"Error when attempt to backup file: {e}")
         raise
 
 
+async def restore_daily_backup(backup_date: str) -> UpdateResponse:
+    try:
+        return await restore_backup(f"{BACKUP_PREFIX}{backup_date}/")
+
+    except Exception as e:
+        log.error(f"Error when attempt to restore backup {backup_date}: {e}")
+        raise
+
+
 async def daily_backup_file():
     backup_folder = datetime.now().strftime("backup/%d%m%Y/")
     return await back_up_damage_file(
@@ -136,6 +166,7 @@ async def set_new_file_name(old_name: str, new_name: str):
             CopySource=copy_source,
             Key=new_name
         )
+        record_write(new_name)
 
         return UpdateResponse(message="Files name updated successfully")
     except ClientError as e:
@@ -158,29 +189,13 @@ async def set_new_directory_name(old_prefix: str, new_prefix: str,
     log.info("set_new_directory_name call")
 
     try:
-        file_names = await get_file_name_s3_folder(f"{old_prefix}/")
-        tasks = []
-
-        for file_name in file_names:
-            task = asyncio.create_task(function_task_update_name(
-                file_name, old_prefix, new_prefix, is_copy))
-            tasks.append(task)
-
-        await asyncio.gather(*tasks)
+        await rename_prefix(old_prefix, new_prefix, is_copy)
 
     except Exception as e:
         log.error(f"Error when update file name: {e}")
         raise
 
 
-async def function_task_update_name(file_name: str, old_prefix: str, new_prefix: str, is_copy: bool):
-    new_file_name = file_name.replace(old_prefix, new_prefix, 1)
-    await set_new_file_name(file_name, new_file_name)
-
-    if not is_copy:
-        await delete_json_file(file_name)
-
-
 async def rename_new_file_name(old_path: str, new_path: str) -> UpdateResponse:
     log.info(f"set_rename_file_name call")
 
@@ -201,15 +216,32 @@ async def rename_new_file_name(old_path: str, new_path: str) -> UpdateResponse:
         raise
 
 
+async def list_folder_keys(folder_path: str) -> list[str]:
+    listing_cache.begin(folder_path)
+
+    try:
+        files = await list_objects(
+            Bucket=settings.s3_bucket_name,
+            Prefix=folder_path
+        )
+    except Exception:
+        listing_cache.abort(folder_path)
+        raise
+
+    files_names = [file["Key"] for file in files]
+    listing_cache.put(folder_path, files_names)
+
+    return files_names
+
+
 async def get_file_name_s3_folder(folder_path: str) -> list[str]:
     log.info(f"get_file_name_s3_folder call")
 
-    files = await list_objects(
-        Bucket=settings.s3_bucket_name,
-        Prefix=folder_path
-    )
+    files_names = listing_cache.get(folder_path)
+    if files_names is None:
+        files_names = await list_folder_keys(folder_path)
 
-    if not files:
+    if not files_names:
         log.critical(f"")
 
         raise HTTPException(
@@ -217,11 +249,20 @@ async def get_file_name_s3_folder(folder_path: str) -> list[str]:
             detail=f"Directory not found"
         )
 
-    files_names = [file["Key"] for file in files]
-
     return files_names
 
 
+async def reconcile_listing_cache() -> None:
+    """
+    Re-lists every cached prefix so that changes made outside this process
+    are picked up; the number of keys that differed is counted as drift.
+    """
+    prefixes = listing_cache.prefixes()
+    if prefixes:
+        result = await fan_out("listing_reconcile", prefixes, list_folder_keys)
+        listing_cache.stats.reconciliations += result.succeeded
+
+
 async def update_all_files_from_damage_directories(damage_type: str,
                                                    difference: list):
     log.info(f"update_all_files_from_damage_directories call")
@@ -245,8 +286,9 @@ async def update_all_files_from_damage_directories(damage_type: str,
 
             await write_json_file(updated_data, file_path)
 
-        update_tasks = [update_file_content(path_file) for path_file in list_file]
-        await asyncio.gather(*update_tasks)
+        result = await fan_out("damage_update", list_file, update_file_content,
+                               name=f"damage_update:{damage_type}")
+        result.raise_for_failures()
 
         return UpdateResponse(message="Files updated successfully")
     except Exception as e:
@@ -319,16 +361,15 @@ async def delete_all_files_from_directories(folder_path: str) -> UpdateResponse:
     log.info(f"delete_all_files_from_directories call")
 
     try:
-        list_file = await get_file_name_s3_folder(folder_path)
+        summary = await delete_prefix(folder_path, name=f"delete_directory:{folder_path}")
+        record_prefix_delete(folder_path)
 
-        delete_structure = {'Objects': [{'Key': file_name}
-                                        for file_name in list_file],
-                            'Quiet': False}
-
-        await delete_objects(
-            Bucket=settings.s3_bucket_name,
-            Delete=delete_structure
-        )
+        if not summary.total:
+            raise HTTPException(
+                status_code=HTTP_404_NOT_FOUND,
+                detail=f"Directory not found"
+            )
+        summary.raise_for_failures()
 
         return UpdateResponse(message="File deleted successfully")
     except Exception as e:
@@ -336,48 +377,189 @@ async def delete_all_files_from_directories(folder_path: str) -> UpdateResponse:
         raise
 
 
-async def create_json_file(json_dict: dict, s3_path: str) -> None:
+async def create_json_file(json_dict: Union[dict, BaseModel], s3_path: str) -> None:
     log.info(f"Writing {s3_path} object to {settings.s3_bucket_name} bucket")
 
     try:
 
-        await put_object(
-            Bucket=settings.s3_bucket_name,
-            Key=s3_path,
-            Body=dumps(json_dict),
-        )
+        await put_json_object(s3_path, json_dict)
+        record_write(s3_path)
 
     except Exception as e:
         log.error(f"Error when create files is s3: {e}")
 
 
 async def check_file_exists_in_s3(s3_path: str) -> bool:
+    cached = exists_cache.get(s3_path)
+    if cached is not None:
+        return cached
+
     try:
-        await get_object(
+        exists_cache.stats.head_requests += 1
+        await head_object(
             Bucket=settings.s3_bucket_name,
             Key=s3_path
         )
-        return True
+        exists = True
 
-    except Exception as e:
-        log.error(f"Error when checking file existence in S3: {e}")
-        return False
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+            log.error(f"Error when checking file existence in S3: {e}")
+            return False
 
+        exists = False
 
-async def get_json_from_s3(s3_path: str) -> Union[dict, list]:
-    try:
-        response = await get_object(
+    exists_cache.set(s3_path, exists)
+    return exists
+
+
+def get_existence_group_prefix(s3_path: str) -> str:
+    # The folder holding the key, e.g. `.../<item>/Tour/`
+    return s3_path[:s3_path.rfind("/") + 1]
+
+
+async def list_existing_keys(prefix: str, keys: list[str]) -> set[str]:
+    """
+    Lists only the objects directly in `prefix` (with a delimiter, so the
+    image folders under `Tour/` are never paged) and returns which of the
+    sorted `keys` exist. Stops at the page that passes the last key.
+    """
+    wanted = set(keys)
+    found = set()
+
+    async for items in iter_object_pages(
             Bucket=settings.s3_bucket_name,
-            Key=s3_path
-        )
+            Prefix=prefix,
+            Delimiter="/"
+    ):
+        exists_cache.stats.list_requests += 1
+        found.update(item["Key"] for item in items if item["Key"] in wanted)
+
+        if not items or items[-1]["Key"] >= keys[-1]:
+            break
+
+    return found
+
+
+async def check_files_exist_in_s3(s3_paths: list[str]) -> dict[str, bool]:
+    """
+    Answers existence for many keys at once, with bounded concurrency and
+    behind the existence cache. Keys are grouped by the folder that holds
+    them: a folder with several keys is answered by one delimited listing
+    of that folder, a single key by a HEAD request, so the cost follows the
+    number of folders checked, not the amount of data stored in them.
+    Every key gets an answer; keys whose folder could not be checked are
+    reported as missing.
+    """
+    result = {}
+    groups = {}
+
+    for s3_path in s3_paths:
+        cached = exists_cache.get(s3_path)
+        if cached is not None:
+            result[s3_path] = cached
+        else:
+            groups.setdefault(get_existence_group_prefix(s3_path), set()).add(s3_path)
+
+    async def resolve_group(prefix: str, keys: set[str]) -> None:
+        if len(keys) == 1:
+            key, = keys
+            result[key] = await check_file_exists_in_s3(key)
+            return
+
+        try:
+            found = await list_existing_keys(prefix, sorted(keys))
+        except ClientError as e:
+            log.error(f"Error when listing {prefix} for existence check: {e}")
+            result.update({key: False for key in keys})
+            return
 
-        loop = asyncio.get_running_loop()
-        json_content = await loop.run_in_executor(executor, response['Body'].read)
-        return json.loads(json_content)
+        for key in keys:
+            result[key] = key in found
+            exists_cache.set(key, result[key])
+
+    checked = await fan_out("existence_check", groups.items(), lambda group: resolve_group(*group))
+
+    for (prefix, keys), error in checked.failures:
+        log.error(f"Existence check of {len(keys)} keys under {prefix} failed: {error!r}")
+        result.update({key: False for key in keys})
+
+    return result
+
+
+async def read_json_bytes(response: dict) -> bytearray:
+    content = bytearray()
+    decompressor = Decompressor(response.get("ContentEncoding"))
+    received = 0
+
+    with Stopwatch() as read_time:
+        async for chunk in iter_body(response, settings.s3_read_chunk_size):
+            received += len(chunk)
+            content.extend(decompressor.decompress(chunk))
+
+        content.extend(decompressor.flush())
+
+    json_read_metrics.record_read(size=received, seconds=read_time.elapsed)
+
+    return content
+
+
+async def parse_json_bytes(content: Union[bytes, bytearray]) -> Union[dict, list]:
+    offloaded = len(content) > settings.s3_json_offload_threshold
+
+    with Stopwatch() as parse_time:
+        if offloaded:
+            data = await asyncio.to_thread(orjson.loads, content)
+        else:
+            data = orjson.loads(content)
+
+    json_read_metrics.record_parse(seconds=parse_time.elapsed, offloaded=offloaded)
+
+    return data
+
+
+async def read_json_object(s3_path: str) -> tuple[Union[dict, list], Optional[str], dict]:
+    """
+    Reads a JSON object together with the ETag and the user metadata of the
+    version that was read, revalidating the cached copy with If-None-Match
+    when there is one.
+    """
+    cached = json_cache.get(s3_path)
+
+    try:
+        conditions = {}
+        if cached:
+            conditions["IfNoneMatch"] = cached.etag
+            json_cache.stats.revalidations += 1
+
+        try:
+            response = await get_object(
+                Bucket=settings.s3_bucket_name,
+                Key=s3_path,
+                **conditions
+            )
+        except ClientError as e:
+            if cached and e.response['Error']['Code'] in ('304', 'NotModified'):
+                json_cache.stats.hits += 1
+                return await parse_json_bytes(cached.body), cached.etag, cached.metadata
+
+            raise
+
+        if cached:
+            json_cache.stats.stale += 1
+        else:
+            json_cache.stats.misses += 1
+
+        content = await read_json_bytes(response)
+        metadata = response.get('Metadata') or {}
+        json_cache.put(s3_path, response.get('ETag'), content, metadata)
+
+        return await parse_json_bytes(content), response.get('ETag'), metadata
 
     except ClientError as e:
         error_code = e.response['Error']['Code']
         if error_code == 'NoSuchKey':
+            record_delete(s3_path)
             log.error(f"File not found in S3 for key: {s3_path}")
 
             raise HTTPException(
@@ -385,19 +567,31 @@ async def get_json_from_s3(s3_path: str) -> Union[dict, list]:
                 detail=f"File not found"
             )
 
-        else:
-            log.error(f"Error when fetching file from S3: {e}")
+        raise
+
+
+async def get_json_and_etag_from_s3(s3_path: str) -> tuple[Union[dict, list], Optional[str]]:
+    data, etag, _ = await read_json_object(s3_path)
+
+    return data, etag
+
+
+async def get_json_from_s3(s3_path: str) -> Union[dict, list]:
+    try:
+        data, _ = await get_json_and_etag_from_s3(s3_path)
 
+        return data
 
-async def write_json_file(srt_data: Union[str, list], s3_path: str) -> UpdateResponse:
+    except ClientError as e:
+        log.error(f"Error when fetching file from S3: {e}")
+
+
+async def write_json_file(srt_data: Union[dict, list, BaseModel], s3_path: str) -> UpdateResponse:
     try:
         log.info(f"Writing {s3_path} object in {settings.s3_bucket_name} bucket")
 
-        await put_object(
-            Bucket=settings.s3_bucket_name,
-            Key=s3_path,
-            Body=json.dumps(srt_data)
-        )
+        await put_json_object(s3_path, srt_data)
+        record_write(s3_path)
 
         return UpdateResponse(message="File updated successfully")
     except ClientError as e:
@@ -424,52 +618,83 @@ def get_unique_line_item(list1: list, list2: list) -> list:
     return list(unique_objects.values())
 
 
+def is_write_conflict(error: ClientError) -> bool:
+    return error.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
 async def update_json_file(update_data: Union[dict, list], s3_path: str) -> UpdateResponse:
+    """
+    Merges `update_data` into the stored object with optimistic concurrency.
+
+    The write is conditional on the ETag that was read (or on the key not
+    existing yet). If another writer got there first, the object is read
+    again and the merge is redone, up to `s3_conditional_write_attempts`.
+    The user metadata of the stored object is kept.
+    """
     log.info(f"Update_json_file call")
 
-    try:
-        current_content = await get_json_from_s3(s3_path)
-
-        match update_data:
-            case dict():
-                updated_content = {**current_content, **update_data}
-            case list():
-                await copy_object_in_s3(
-                    s3_path, f"temporary_backup/{s3_path}"
-                )
+    if not isinstance(update_data, (dict, list)):
+        log.error("Unsupported type for update_data. It must be either dict or list.")
+        raise ValueError("update_data must be either dict or list.")
 
-                updated_content = get_unique_line_item(current_content,
-                                                       update_data)
-            case _:
-                log.error("Unsupported type for update_data. It must be either dict or list.")
-                raise ValueError("update_data must be either dict or list.")
+    attempts = settings.s3_conditional_write_attempts
 
-        log.info(f"Update {s3_path} object from {settings.s3_bucket_name} bucket")
+    for attempt in range(1, attempts + 1):
+        try:
+            current_content, etag, metadata = await read_json_object(s3_path)
+        except HTTPException as e:
+            if e.status_code != HTTP_404_NOT_FOUND:
+                raise
 
-        await put_object(
-            Bucket=settings.s3_bucket_name,
-            Key=s3_path,
-            Body=json.dumps(updated_content)
-        )
+            current_content, etag, metadata = None, None, None
 
-        return UpdateResponse(message="File updated successfully")
-    except Exception as e:
-        if "404: File not found" in str(e):
-            try:
-                await write_json_file(
-                    srt_data=update_data,
-                    s3_path=s3_path
-                )
+        if current_content is None:
+            log.info(f"Create {s3_path} object from {settings.s3_bucket_name} bucket")
 
-                log.info(f"Create {s3_path} object from {settings.s3_bucket_name} bucket")
+            updated_content = update_data
+            conditions = {"IfNoneMatch": "*"}
+            message = "File written successfully"
 
-                return UpdateResponse(message="File written successfully")
-            except Exception as e:
-                raise
         else:
+            log.info(f"Update {s3_path} object from {settings.s3_bucket_name} bucket")
 
-            log.error(f"Error when update file from S3: {e}")
-            raise
+            match update_data:
+                case dict():
+                    updated_content = {**current_content, **update_data}
+                case list():
+                    if attempt == 1:
+                        await copy_object_in_s3(
+                            s3_path, f"temporary_backup/{s3_path}"
+                        )
+
+                    updated_content = get_unique_line_item(current_content,
+                                                           update_data)
+
+            conditions = {"IfMatch": etag}
+            message = "File updated successfully"
+
+        try:
+            await put_json_object(s3_path, updated_content, metadata=metadata, **conditions)
+            record_write(s3_path)
+
+            return UpdateResponse(message=message)
+
+        except ClientError as e:
+            if not is_write_conflict(e):
+                log.error(f"Error when update file from S3: {e}")
+                raise
+
+            json_cache.invalidate(s3_path)
+            log.warning(f"Concurrent write to {s3_path}, retrying merge ({attempt}/{attempts})")
+
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    log.error(f"Giving up update of {s3_path} after {attempts} conflicting writes")
+
+    raise HTTPException(
+        status_code=HTTP_409_CONFLICT,
+        detail="File was modified concurrently, try again"
+    )
 
 
 async def delete_json_file(s3_path: str) -> UpdateResponse:
@@ -480,6 +705,7 @@ async def delete_json_file(s3_path: str) -> UpdateResponse:
             Bucket=settings.s3_bucket_name,
             Key=s3_path
         )
+        record_delete(s3_path)
 
         return UpdateResponse(message="File deleted successfully")
     except ClientError as e:
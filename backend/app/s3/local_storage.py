@@ -0,0 +1,509 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import mmap
+import os
+import secrets
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import orjson
+from botocore.exceptions import ClientError
+
+from ..config import settings
+
+METADATA_DIR = ".metadata"
+UPLOADS_DIR = ".uploads"
+SIGNING_KEY_NAME = ".signing-key"
+
+
+def client_error(code: str, operation_name: str, message: str = "") -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message or code}}, operation_name)
+
+
+class MappedBody:
+    """
+    Read-only view of a stored object backed by mmap, so large objects are
+    paged in by the OS instead of being copied into the process up front.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._position = 0
+        self.size = size
+
+    def read(self, size: int = -1) -> bytes:
+        if self._map is None:
+            return b""
+
+        end = self.size if size is None or size < 0 else min(self.size, self._position + size)
+        chunk = self._map[self._position:end]
+        self._position = end
+
+        return chunk
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class LocalStorage:
+    """
+    Filesystem implementation of the S3 client surface used by the app.
+
+    Objects live under `<root>/<bucket>/<key>`, their metadata (ETag,
+    Content-Encoding, Content-Type, user Metadata) under `<root>/.metadata/<bucket>/<key>`.
+    Writes go to a temporary file in the target directory and are published
+    with an atomic rename; reads are memory-mapped. Errors are raised as
+    botocore ClientError with the codes S3 uses, so callers cannot tell the
+    backends apart. Conditional writes are serialized per key within the
+    process.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def resolve(directory: str, key: str) -> str:
+        path = os.path.normpath(os.path.join(directory, key))
+        if not path.startswith(directory + os.sep):
+            raise client_error("InvalidRequest", "ResolvePath", f"Invalid key {key}")
+
+        return path
+
+    def get_path(self, bucket: str, key: str) -> str:
+        return self.resolve(os.path.join(self.root, bucket), key)
+
+    def get_metadata_path(self, bucket: str, key: str) -> str:
+        return self.resolve(os.path.join(self.root, METADATA_DIR, bucket), key)
+
+    def get_lock(self, bucket: str, key: str) -> asyncio.Lock:
+        return self._locks.setdefault(f"{bucket}/{key}", asyncio.Lock())
+
+    @staticmethod
+    def write_atomic(path: str, chunks) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        digest = hashlib.md5()
+
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    file.write(chunk)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.unlink(temporary_path)
+            raise
+
+        return f'"{digest.hexdigest()}"'
+
+    def read_metadata(self, bucket: str, key: str, operation_name: str) -> dict:
+        path = self.get_path(bucket, key)
+        if not os.path.isfile(path):
+            raise client_error("404" if operation_name == "HeadObject" else "NoSuchKey", operation_name)
+
+        stat = os.stat(path)
+        try:
+            with open(self.get_metadata_path(bucket, key), "rb") as file:
+                metadata = orjson.loads(file.read())
+        except FileNotFoundError:
+            with open(path, "rb") as file:
+                metadata = {"ETag": f'"{hashlib.file_digest(file, "md5").hexdigest()}"'}
+
+        return {
+            "Metadata": {},
+            **metadata,
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+        }
+
+    def check_conditions(self, bucket: str, key: str, operation_name: str,
+                         if_match: Optional[str], if_none_match: Optional[str]) -> None:
+        if if_match is None and if_none_match is None:
+            return
+
+        exists = os.path.isfile(self.get_path(bucket, key))
+        if if_none_match == "*" and exists:
+            raise client_error("PreconditionFailed", operation_name)
+        if if_match is not None:
+            if not exists:
+                raise client_error("NoSuchKey", operation_name)
+            if self.read_metadata(bucket, key, operation_name)["ETag"] != if_match:
+                raise client_error("PreconditionFailed", operation_name)
+
+    def publish(self, bucket: str, key: str, chunks, content_encoding: Optional[str],
+                content_type: Optional[str], user_metadata: Optional[dict] = None) -> str:
+        etag = self.write_atomic(self.get_path(bucket, key), chunks)
+
+        metadata = {"ETag": etag}
+        if content_encoding:
+            metadata["ContentEncoding"] = content_encoding
+        if content_type:
+            metadata["ContentType"] = content_type
+        if user_metadata:
+            metadata["Metadata"] = user_metadata
+        self.write_atomic(self.get_metadata_path(bucket, key), [orjson.dumps(metadata)])
+
+        return etag
+
+    async def put_object(self, Bucket: str, Key: str, Body=b"", ContentEncoding: Optional[str] = None,
+                         ContentType: Optional[str] = None, Metadata: Optional[dict] = None,
+                         IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None, **kwargs) -> dict:
+        body = Body.encode("utf-8") if isinstance(Body, str) else bytes(Body)
+
+        async with self.get_lock(Bucket, Key):
+            self.check_conditions(Bucket, Key, "PutObject", IfMatch, IfNoneMatch)
+            etag = await asyncio.to_thread(self.publish, Bucket, Key, [body], ContentEncoding, ContentType, Metadata)
+
+        return {"ETag": etag}
+
+    async def get_object(self, Bucket: str, Key: str, IfNoneMatch: Optional[str] = None, **kwargs) -> dict:
+        metadata = await asyncio.to_thread(self.read_metadata, Bucket, Key, "GetObject")
+        if IfNoneMatch is not None and IfNoneMatch == metadata["ETag"]:
+            raise client_error("304", "GetObject", "Not Modified")
+
+        body = await asyncio.to_thread(MappedBody, self.get_path(Bucket, Key))
+
+        return {**metadata, "Body": body}
+
+    async def head_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        return await asyncio.to_thread(self.read_metadata, Bucket, Key, "HeadObject")
+
+    def remove(self, bucket: str, key: str) -> None:
+        for path in (self.get_path(bucket, key), self.get_metadata_path(bucket, key)):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    async def delete_object(self, Bucket: str, Key: str, **kwargs) -> dict:
+        await asyncio.to_thread(self.remove, Bucket, Key)
+        return {}
+
+    async def delete_objects(self, Bucket: str, Delete: dict, **kwargs) -> dict:
+        deleted, errors = [], []
+
+        def remove_all() -> None:
+            for item in Delete.get("Objects", []):
+                try:
+                    self.remove(Bucket, item["Key"])
+                    deleted.append({"Key": item["Key"]})
+                except OSError as e:
+                    errors.append({"Key": item["Key"], "Code": "InternalError", "Message": str(e)})
+
+        await asyncio.to_thread(remove_all)
+
+        response = {"Errors": errors} if errors else {}
+        if not Delete.get("Quiet"):
+            response["Deleted"] = deleted
+
+        return response
+
+    def copy(self, source_bucket: str, source_key: str, bucket: str, key: str) -> str:
+        metadata = self.read_metadata(source_bucket, source_key, "CopyObject")
+
+        with open(self.get_path(source_bucket, source_key), "rb") as source:
+            return self.publish(bucket, key, iter(lambda: source.read(1024 * 1024), b""),
+                                metadata.get("ContentEncoding"), metadata.get("ContentType"),
+                                metadata.get("Metadata"))
+
+    async def copy_object(self, CopySource: dict, Bucket: str, Key: str, **kwargs) -> dict:
+        async with self.get_lock(Bucket, Key):
+            etag = await asyncio.to_thread(self.copy, CopySource["Bucket"], CopySource["Key"], Bucket, Key)
+
+        return {"CopyObjectResult": {"ETag": etag}}
+
+    def describe(self, bucket: str, key: str, path: str) -> dict:
+        stat = os.stat(path)
+
+        return {
+            "Key": key,
+            "Size": stat.st_size,
+            "LastModified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            "ETag": self.read_metadata(bucket, key, "ListObjectsV2")["ETag"],
+        }
+
+    @staticmethod
+    def has_files(directory: str) -> bool:
+        return any(files for _, _, files in os.walk(directory))
+
+    def scan(self, bucket: str, prefix: str, delimiter: Optional[str]) -> tuple[list[dict], list[dict]]:
+        bucket_root = os.path.join(self.root, bucket)
+        parent = prefix.rsplit("/", 1)[0] + "/" if "/" in prefix else ""
+        start = os.path.join(bucket_root, parent)
+        contents, common_prefixes = [], set()
+
+        if delimiter == "/":
+            # Only the level below `prefix` is needed, so do not walk the tree
+            if not os.path.isdir(start):
+                return [], []
+
+            for entry in os.scandir(start):
+                key = f"{parent}{entry.name}"
+                if entry.name.startswith(".") or not key.startswith(prefix):
+                    continue
+
+                if entry.is_dir():
+                    if self.has_files(entry.path):
+                        common_prefixes.add(f"{key}/")
+                else:
+                    contents.append(self.describe(bucket, key, entry.path))
+
+        else:
+            for directory, directories, files in os.walk(start):
+                directories[:] = [name for name in directories if not name.startswith(".")]
+                relative = os.path.relpath(directory, bucket_root)
+                relative = "" if relative == "." else relative.replace(os.sep, "/") + "/"
+
+                for name in files:
+                    key = f"{relative}{name}"
+                    if name.startswith(".") or not key.startswith(prefix):
+                        continue
+
+                    rest = key[len(prefix):]
+                    if delimiter and delimiter in rest:
+                        common_prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+                    else:
+                        contents.append(self.describe(bucket, key, os.path.join(directory, name)))
+
+        return (sorted(contents, key=lambda item: item["Key"]),
+                [{"Prefix": item} for item in sorted(common_prefixes)])
+
+    async def list_objects(self, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                           **kwargs) -> list[dict]:
+        contents, _ = await asyncio.to_thread(self.scan, Bucket, Prefix, Delimiter)
+        return contents
+
+    async def iter_object_pages(self, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                                PageSize: int = 1000, StartAfter: str = "", **kwargs):
+        contents, _ = await asyncio.to_thread(self.scan, Bucket, Prefix, Delimiter)
+        contents = [item for item in contents if item["Key"] > StartAfter]
+        for offset in range(0, len(contents), PageSize):
+            yield contents[offset:offset + PageSize]
+
+    async def list_common_prefixes(self, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                                   **kwargs) -> list[dict]:
+        _, common_prefixes = await asyncio.to_thread(self.scan, Bucket, Prefix, Delimiter)
+        return common_prefixes
+
+    async def directory_object(self, Bucket: str, Prefix: str = "", Delimiter: Optional[str] = None,
+                               **kwargs) -> dict:
+        contents, common_prefixes = await asyncio.to_thread(self.scan, Bucket, Prefix, Delimiter)
+
+        response = {"KeyCount": len(contents) + len(common_prefixes), "Prefix": Prefix}
+        if contents:
+            response["Contents"] = contents
+        if common_prefixes:
+            response["CommonPrefixes"] = common_prefixes
+
+        return response
+
+    def get_upload_dir(self, upload_id: str) -> str:
+        return os.path.join(self.root, UPLOADS_DIR, upload_id)
+
+    async def create_multipart_upload(self, Bucket: str, Key: str, ContentEncoding: Optional[str] = None,
+                                      ContentType: Optional[str] = None, Metadata: Optional[dict] = None,
+                                      **kwargs) -> dict:
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.get_upload_dir(upload_id)
+
+        await asyncio.to_thread(os.makedirs, upload_dir)
+        await asyncio.to_thread(self.write_atomic, os.path.join(upload_dir, "upload.json"), [orjson.dumps({
+            "Bucket": Bucket, "Key": Key, "ContentEncoding": ContentEncoding, "ContentType": ContentType,
+            "Metadata": Metadata,
+        })])
+
+        return {"Bucket": Bucket, "Key": Key, "UploadId": upload_id}
+
+    async def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body=b"",
+                          **kwargs) -> dict:
+        upload_dir = self.get_upload_dir(UploadId)
+        if not os.path.isdir(upload_dir):
+            raise client_error("NoSuchUpload", "UploadPart")
+
+        etag = await asyncio.to_thread(self.write_atomic, os.path.join(upload_dir, f"{PartNumber:05d}.part"),
+                                       [bytes(Body)])
+
+        return {"ETag": etag}
+
+    def assemble(self, upload_dir: str, parts: list[dict]):
+        for part in sorted(parts, key=lambda item: item["PartNumber"]):
+            with open(os.path.join(upload_dir, f"{part['PartNumber']:05d}.part"), "rb") as file:
+                yield from iter(lambda: file.read(1024 * 1024), b"")
+
+    async def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict,
+                                        IfMatch: Optional[str] = None, IfNoneMatch: Optional[str] = None,
+                                        **kwargs) -> dict:
+        upload_dir = self.get_upload_dir(UploadId)
+        if not os.path.isdir(upload_dir):
+            raise client_error("NoSuchUpload", "CompleteMultipartUpload")
+
+        with open(os.path.join(upload_dir, "upload.json"), "rb") as file:
+            upload = orjson.loads(file.read())
+
+        async with self.get_lock(Bucket, Key):
+            self.check_conditions(Bucket, Key, "CompleteMultipartUpload", IfMatch, IfNoneMatch)
+            etag = await asyncio.to_thread(self.publish, Bucket, Key,
+                                           self.assemble(upload_dir, MultipartUpload["Parts"]),
+                                           upload["ContentEncoding"], upload["ContentType"],
+                                           upload.get("Metadata"))
+
+        await asyncio.to_thread(shutil.rmtree, upload_dir, True)
+
+        return {"Bucket": Bucket, "Key": Key, "ETag": etag}
+
+    async def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs) -> dict:
+        await asyncio.to_thread(shutil.rmtree, self.get_upload_dir(UploadId), True)
+        return {}
+
+    def get_signing_key(self) -> bytes:
+        # Shared through the store, so every process accepts the others' policies
+        path = os.path.join(self.root, SIGNING_KEY_NAME)
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(path, "rb") as file:
+                return file.read()
+
+        key = secrets.token_bytes(32)
+        with os.fdopen(fd, "wb") as file:
+            file.write(key)
+
+        return key
+
+    def sign_policy(self, policy: str) -> str:
+        return hmac.new(self.get_signing_key(), policy.encode(), hashlib.sha256).hexdigest()
+
+    async def generate_presigned_post(self, Bucket: str, Key: str, Fields: Optional[dict] = None,
+                                      Conditions: Optional[list] = None, ExpiresIn: int = 3600,
+                                      **kwargs) -> dict:
+        """
+        Same shape as the S3 presigned POST: the client posts `fields` and
+        the file to `url`, which is the `local_storage_upload_url` route
+        serving `accept_presigned_post`. The policy is signed with a key
+        kept under the storage root.
+        """
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=ExpiresIn)
+        policy = base64.b64encode(orjson.dumps({
+            "expiration": expiration.isoformat(),
+            "conditions": [{"bucket": Bucket}, {"key": Key}, *(Conditions or [])],
+        })).decode()
+
+        return {
+            "url": settings.local_storage_upload_url,
+            "fields": {
+                **(Fields or {}),
+                "key": Key,
+                "policy": policy,
+                "signature": await asyncio.to_thread(self.sign_policy, policy),
+            },
+        }
+
+    def check_post_policy(self, fields: dict, size: int) -> str:
+        """
+        Checks the posted form against its signed policy, as S3 does, and
+        returns the bucket to store the file in.
+        """
+        policy, signature = fields.get("policy", ""), fields.get("signature", "")
+        if not policy or not hmac.compare_digest(self.sign_policy(policy), signature):
+            raise client_error("AccessDenied", "PostObject", "Invalid policy signature")
+
+        document = orjson.loads(base64.b64decode(policy))
+        if datetime.fromisoformat(document["expiration"]) < datetime.now(timezone.utc):
+            raise client_error("AccessDenied", "PostObject", "Policy expired")
+
+        bucket = None
+        for condition in document["conditions"]:
+            match condition:
+                case {"bucket": value}:
+                    bucket = value
+                case dict():
+                    for name, value in condition.items():
+                        if fields.get(name) != value:
+                            raise client_error("AccessDenied", "PostObject", f"Policy condition failed: {name}")
+                case ["content-length-range", low, high]:
+                    if size < low:
+                        raise client_error("EntityTooSmall", "PostObject")
+                    if size > high:
+                        raise client_error("EntityTooLarge", "PostObject")
+                case ["eq", name, value] if fields.get(name.lstrip("$")) != value:
+                    raise client_error("AccessDenied", "PostObject", f"Policy condition failed: {name}")
+                case ["starts-with", name, prefix] if not fields.get(name.lstrip("$"), "").startswith(prefix):
+                    raise client_error("AccessDenied", "PostObject", f"Policy condition failed: {name}")
+
+        return bucket
+
+    async def accept_presigned_post(self, fields: dict, file, size: int) -> dict:
+        """
+        Stores `file` (a binary file object of `size` bytes) under the key
+        of a form made by `generate_presigned_post`.
+        """
+        bucket = await asyncio.to_thread(self.check_post_policy, fields, size)
+        key = fields["key"]
+
+        async with self.get_lock(bucket, key):
+            etag = await asyncio.to_thread(self.publish, bucket, key, iter(lambda: file.read(1024 * 1024), b""),
+                                           None, fields.get("Content-Type"))
+
+        return {"Bucket": bucket, "Key": key, "ETag": etag}
+
+
+storage = LocalStorage(settings.local_storage_root)
+
+
+async def read_body(response: dict) -> bytes:
+    body = response["Body"]
+    try:
+        return body.read()
+    finally:
+        body.close()
+
+
+async def iter_body(response: dict, chunk_size: int):
+    body = response["Body"]
+    try:
+        while True:
+            chunk = body.read(chunk_size)
+            if not chunk:
+                break
+
+            yield chunk
+    finally:
+        body.close()
+
+
+def release_body(response: dict) -> None:
+    response["Body"].close()
+
+
+async def close_client() -> None:
+    pass
+
+
+put_object = storage.put_object
+get_object = storage.get_object
+head_object = storage.head_object
+delete_object = storage.delete_object
+list_objects = storage.list_objects
+list_common_prefixes = storage.list_common_prefixes
+iter_object_pages = storage.iter_object_pages
+delete_objects = storage.delete_objects
+copy_object = storage.copy_object
+directory_object = storage.directory_object
+create_multipart_upload = storage.create_multipart_upload
+upload_part = storage.upload_part
+complete_multipart_upload = storage.complete_multipart_upload
+abort_multipart_upload = storage.abort_multipart_upload
+generate_presigned_post = storage.generate_presigned_post
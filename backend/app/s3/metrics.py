@@ -0,0 +1,38 @@
+import time
+from dataclasses import dataclass, asdict
+
+
+@dataclass
+class JsonReadMetrics:
+    reads: int = 0
+    bytes_in: int = 0
+    max_object_bytes: int = 0
+    read_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    offloaded_parses: int = 0
+
+    def record_read(self, size: int, seconds: float) -> None:
+        self.reads += 1
+        self.bytes_in += size
+        self.max_object_bytes = max(self.max_object_bytes, size)
+        self.read_seconds += seconds
+
+    def record_parse(self, seconds: float, offloaded: bool) -> None:
+        self.parse_seconds += seconds
+        self.offloaded_parses += int(offloaded)
+
+    def snapshot(self) -> dict:
+        return asdict(self)
+
+
+class Stopwatch:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+
+
+json_read_metrics = JsonReadMetrics()
@@ -0,0 +1,191 @@
+import logging
+from datetime import datetime
+from typing import Optional
+from urllib.parse import quote
+
+import orjson
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+from starlette.status import HTTP_404_NOT_FOUND, HTTP_409_CONFLICT
+
+from ..config import settings
+from .backup import copy_objects, RENAME_JOURNAL_PREFIX
+from .cache import record_write, record_delete
+from .client import put_object, get_object, delete_object, list_objects, read_body
+from .deletion import delete_keys
+from .serialization import encode_json
+
+log = logging.getLogger(__name__)
+
+PHASE_COPY = "copy"
+PHASE_DELETE = "delete"
+
+
+def get_journal_key(old_prefix: str) -> str:
+    return f"{RENAME_JOURNAL_PREFIX}{quote(old_prefix, safe='')}.json"
+
+
+async def read_journal(old_prefix: str) -> Optional[dict]:
+    try:
+        response = await get_object(
+            Bucket=settings.s3_bucket_name,
+            Key=get_journal_key(old_prefix)
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            return None
+        raise
+
+    return orjson.loads(await read_body(response))
+
+
+async def write_journal(journal: dict) -> None:
+    key = get_journal_key(journal["old_prefix"])
+
+    await put_object(
+        Bucket=settings.s3_bucket_name,
+        Key=key,
+        Body=await encode_json(journal)
+    )
+    record_write(key)
+
+
+async def drop_journal(old_prefix: str) -> None:
+    key = get_journal_key(old_prefix)
+
+    await delete_object(
+        Bucket=settings.s3_bucket_name,
+        Key=key
+    )
+    record_delete(key)
+
+
+async def list_prefix_objects(prefix: str) -> dict[str, dict]:
+    objects = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix=prefix
+    )
+
+    return {item["Key"]: item for item in objects if not item["Key"].endswith("/")}
+
+
+async def run_rename(journal: dict, sources: Optional[dict[str, dict]] = None) -> None:
+    """
+    Drives a journaled rename to completion from whatever phase it stopped in.
+
+    In the copy phase every source object is copied unless the destination
+    already holds it with the same ETag (copied before an interruption).
+    Only when all copies succeeded does the journal move to the delete
+    phase, recording the ETag each source was copied with. A source is then
+    removed only while it still has that ETag, so an object written under
+    the old prefix after its copy is never lost. Sources are removed in
+    `delete_objects` batches: N copies and ceil(N / 1000) deletes instead
+    of a delete per object.
+    """
+    old_prefix, new_prefix = f"{journal['old_prefix']}/", f"{journal['new_prefix']}/"
+
+    if journal["phase"] == PHASE_COPY:
+        sources = sources or await list_prefix_objects(old_prefix)
+        copied = await list_prefix_objects(new_prefix)
+
+        copies = []
+        for key, item in sources.items():
+            new_key = f"{new_prefix}{key[len(old_prefix):]}"
+            etag = item.get("ETag")
+            if etag is None or copied.get(new_key, {}).get("ETag") != etag:
+                copies.append((key, new_key, item.get("Size", 0)))
+
+        log.info(f"Rename {old_prefix} -> {new_prefix}: {len(copies)} of {len(sources)} objects to copy")
+
+        summary = await copy_objects(
+            name=f"rename:{journal['old_prefix']}",
+            copies=copies,
+            workload="rename"
+        )
+        if summary.failed:
+            raise RuntimeError(f"Failed to copy {len(summary.failed)} objects from {old_prefix}, "
+                               f"the rename will be resumed")
+
+        if journal["is_copy"]:
+            await drop_journal(journal["old_prefix"])
+            return
+
+        journal["phase"] = PHASE_DELETE
+        journal["copied"] = {key: item.get("ETag") for key, item in sources.items()}
+        await write_journal(journal)
+
+    sources = await list_prefix_objects(old_prefix)
+    if "copied" in journal:
+        copied_etags = journal["copied"]
+    else:
+        # Journals written before the copied ETags were recorded: compare
+        # with the copies in place
+        copied = await list_prefix_objects(new_prefix)
+        copied_etags = {key: copied.get(f"{new_prefix}{key[len(old_prefix):]}", {}).get("ETag")
+                        for key in sources}
+
+    moved = [key for key, item in sources.items()
+             if item.get("ETag") is not None and copied_etags.get(key) == item.get("ETag")]
+    if len(moved) < len(sources):
+        log.warning(f"Rename {old_prefix} -> {new_prefix}: keeping {len(sources) - len(moved)} "
+                    f"sources changed or added since their copy")
+
+    deleted = await delete_keys(moved, name=f"rename:{journal['old_prefix']}")
+    deleted.raise_for_failures()
+
+    await drop_journal(journal["old_prefix"])
+
+
+async def rename_prefix(old_prefix: str, new_prefix: str, is_copy: bool = False) -> None:
+    """
+    Moves (or copies) every object under `old_prefix/` to `new_prefix/`.
+
+    A journal object records the rename before anything is copied, so a
+    rename interrupted by a crash or a failed copy can be finished by
+    calling this again or by `resume_renames`.
+    """
+    journal = await read_journal(old_prefix)
+
+    if journal is not None and (journal["new_prefix"], journal["is_copy"]) != (new_prefix, is_copy):
+        raise HTTPException(
+            status_code=HTTP_409_CONFLICT,
+            detail=f"Another rename of {old_prefix} to {journal['new_prefix']} is pending"
+        )
+
+    sources = None
+    if journal is None:
+        sources = await list_prefix_objects(f"{old_prefix}/")
+        if not sources:
+            raise HTTPException(
+                status_code=HTTP_404_NOT_FOUND,
+                detail="Folder is empty or not found"
+            )
+
+        journal = {
+            "old_prefix": old_prefix,
+            "new_prefix": new_prefix,
+            "is_copy": is_copy,
+            "phase": PHASE_COPY,
+            "started": datetime.now().isoformat(),
+        }
+        await write_journal(journal)
+
+    await run_rename(journal, sources)
+
+
+async def resume_renames() -> None:
+    journals = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix=RENAME_JOURNAL_PREFIX
+    )
+
+    for item in journals:
+        response = await get_object(Bucket=settings.s3_bucket_name, Key=item["Key"])
+        journal = orjson.loads(await read_body(response))
+
+        log.info(f"Resuming rename of {journal['old_prefix']} to {journal['new_prefix']} "
+                 f"in {journal['phase']} phase")
+        try:
+            await run_rename(journal)
+        except Exception as e:
+            log.error(f"Failed to resume rename of {journal['old_prefix']}: {e}")
@@ -0,0 +1,129 @@
+import asyncio
+from typing import Any, Iterable, Iterator
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+
+from ..config import settings
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json", by_alias=True)
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps_json(data: Any) -> bytes:
+    """
+    Serialize data for S3 straight to bytes.
+
+    A pydantic model passed at the top level is encoded by
+    `model_dump_json` without building the intermediate `model_dump` dict.
+    Everything else goes through orjson, which handles datetime natively.
+    """
+    if isinstance(data, BaseModel):
+        return data.model_dump_json(by_alias=True).encode()
+
+    return orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+
+
+def encode_key(key: Any) -> bytes:
+    # Lets orjson apply its own OPT_NON_STR_KEYS conversion to a single key
+    return orjson.dumps({key: 0}, option=ORJSON_OPTIONS)[1:-3]
+
+
+def iter_json(data: Any, split_items: int = 256) -> Iterator[bytes]:
+    """
+    Serialize data as a sequence of byte chunks.
+
+    Containers with more than `split_items` values are walked one value at a
+    time, smaller ones are handed to orjson whole. Joining the chunks gives
+    the same document as `dumps_json`.
+    """
+    if isinstance(data, BaseModel):
+        data = data.model_dump(mode="json", by_alias=True)
+
+    match data:
+        case dict() if len(data) > split_items:
+            yield b"{"
+            for index, (key, value) in enumerate(data.items()):
+                yield (b"," if index else b"") + encode_key(key) + b":"
+                yield from iter_json(value, split_items)
+            yield b"}"
+
+        case list() | tuple() if len(data) > split_items:
+            yield b"["
+            for index, value in enumerate(data):
+                if index:
+                    yield b","
+                yield from iter_json(value, split_items)
+            yield b"]"
+
+        case _:
+            yield orjson.dumps(data, default=default, option=ORJSON_OPTIONS)
+
+
+def iter_parts(chunks: Iterable[bytes], part_size: int) -> Iterator[bytes]:
+    """
+    Groups byte chunks into parts of at least `part_size` bytes (the last
+    part may be smaller).
+    """
+    part = bytearray()
+
+    for chunk in chunks:
+        part += chunk
+        if len(part) >= part_size:
+            yield bytes(part)
+            part = bytearray()
+
+    if part:
+        yield bytes(part)
+
+
+def iter_json_parts(data: Any, part_size: int) -> Iterator[bytes]:
+    return iter_parts(iter_json(data), part_size)
+
+
+def is_large_payload(data: Any, limit: int) -> bool:
+    stack = [data]
+    seen = 0
+
+    while stack:
+        item = stack.pop()
+
+        match item:
+            case BaseModel():
+                values = item.__dict__.values()
+            case dict():
+                values = item.values()
+            case list() | tuple():
+                values = item
+            case _:
+                continue
+
+        seen += len(values)
+        if seen > limit:
+            return True
+
+        stack.extend(values)
+
+    return False
+
+
+async def encode_json(data: Any) -> bytes:
+    """
+    Serializes a document that is written to S3 in one piece, in a worker
+    thread when it is large enough to stall the event loop.
+    """
+    if is_large_payload(data, settings.s3_json_serialize_offload_items):
+        return await asyncio.to_thread(dumps_json, data)
+
+    return dumps_json(data)
@@ -0,0 +1,125 @@
+import logging
+import os
+import re
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
+
+from botocore.exceptions import ClientError
+from fastapi import HTTPException
+from starlette.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
+
+from ..config import settings
+from .backup import PDF_STAGING_PREFIX
+from .cache import record_delete
+from .client import (generate_presigned_post, get_object, delete_object, list_objects,
+                     iter_body, release_body)
+from .deletion import delete_keys
+
+log = logging.getLogger(__name__)
+
+PDF_CONTENT_TYPE = "application/pdf"
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+STAGED_PDF_GRACE = timedelta(days=1)
+
+
+def get_staging_prefix(upload_id: str) -> str:
+    if not UPLOAD_ID_PATTERN.match(upload_id):
+        raise HTTPException(
+            status_code=HTTP_400_BAD_REQUEST,
+            detail="Invalid upload id"
+        )
+
+    return f"{PDF_STAGING_PREFIX}{upload_id}/"
+
+
+def clean_filename(filename: str) -> str:
+    name = re.sub(r"[^\w.\- ]", "_", os.path.basename(filename.replace("\\", "/"))).strip()
+    return name or "estimate.pdf"
+
+
+async def create_pdf_upload(filename: str) -> dict:
+    """
+    Issues a presigned POST that lets the client upload one PDF of at most
+    `pdf_upload_max_bytes` straight to a fresh staging prefix.
+    """
+    upload_id = uuid.uuid4().hex
+    key = f"{get_staging_prefix(upload_id)}{clean_filename(filename)}"
+
+    presigned = await generate_presigned_post(
+        Bucket=settings.s3_bucket_name,
+        Key=key,
+        Fields={"Content-Type": PDF_CONTENT_TYPE},
+        Conditions=[
+            {"Content-Type": PDF_CONTENT_TYPE},
+            ["content-length-range", 1, settings.pdf_upload_max_bytes],
+        ],
+        ExpiresIn=settings.pdf_upload_expires_in
+    )
+
+    return {
+        "upload_id": upload_id,
+        "url": presigned["url"],
+        "fields": presigned["fields"],
+        "expires_in": settings.pdf_upload_expires_in,
+    }
+
+
+@asynccontextmanager
+async def open_staged_pdf(upload_id: str) -> AsyncIterator[tuple[str, str, AsyncIterator[bytes]]]:
+    """
+    Opens the PDF uploaded for `upload_id` and yields (key, filename,
+    chunks). The body is streamed in `s3_read_chunk_size` chunks instead of
+    being read into memory, and released on exit.
+    """
+    objects = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix=get_staging_prefix(upload_id)
+    )
+    if not objects:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND,
+            detail="Uploaded file not found"
+        )
+
+    key = objects[0]["Key"]
+    try:
+        response = await get_object(Bucket=settings.s3_bucket_name, Key=key)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "NoSuchKey":
+            raise HTTPException(
+                status_code=HTTP_404_NOT_FOUND,
+                detail="Uploaded file not found"
+            )
+        raise
+
+    try:
+        yield key, key.rsplit("/", 1)[-1], iter_body(response, settings.s3_read_chunk_size)
+    finally:
+        release_body(response)
+
+
+async def drop_staged_pdf(key: str) -> None:
+    try:
+        await delete_object(Bucket=settings.s3_bucket_name, Key=key)
+        record_delete(key)
+    except ClientError as e:
+        log.warning(f"Failed to delete staged upload {key}: {e}")
+
+
+async def prune_staged_pdfs() -> None:
+    """
+    Deletes staged uploads that were never processed, once their presigned
+    POST has long expired.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.pdf_upload_expires_in) - STAGED_PDF_GRACE
+    objects = await list_objects(
+        Bucket=settings.s3_bucket_name,
+        Prefix=PDF_STAGING_PREFIX
+    )
+
+    stale = [item["Key"] for item in objects if item["LastModified"] < cutoff]
+    if stale:
+        summary = await delete_keys(stale, name="prune_staged_pdfs")
+        log.info(f"Pruned {summary.deleted} stale staged uploads")
@@ -0,0 +1,176 @@
+import asyncio
+import functools
+import logging
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from ..config import settings
+from .client import (put_object, create_multipart_upload, upload_part,
+                     complete_multipart_upload, abort_multipart_upload)
+from .compression import get_compression, encoding_headers, compress_body, iter_compressed
+from .serialization import encode_json, iter_json, iter_parts, is_large_payload
+
+log = logging.getLogger(__name__)
+
+# S3 rejects multipart parts below 5 MiB, except the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def get_part_size() -> int:
+    return max(settings.s3_multipart_part_size, MIN_PART_SIZE)
+
+
+def slice_parts(body: bytes, part_size: int) -> Iterator[bytes]:
+    for offset in range(0, len(body), part_size):
+        yield body[offset:offset + part_size]
+
+
+async def iter_parts_in_thread(buffered: list[bytes], parts: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Yields the `buffered` parts, then produces each following part in a
+    worker thread only when it is asked for.
+    """
+    while buffered:
+        yield buffered.pop(0)
+
+    while (part := await asyncio.to_thread(next, parts, None)) is not None:
+        yield part
+
+
+async def put_json_object(s3_path: str, data: Any, metadata: Optional[dict] = None, **conditions) -> None:
+    """
+    Writes `data` as JSON to `s3_path`, choosing between a single PUT and a
+    multipart upload by the size of the encoded (and compressed) body.
+
+    Documents with few items are encoded in one go; a body above
+    `s3_multipart_threshold` is then uploaded in parts. Documents with many
+    items are encoded part by part in a worker thread; parts are buffered
+    until the multipart threshold is reached, and if the body turns out to
+    be smaller it is still sent as a single PUT. Otherwise a multipart
+    upload is started and each following part is encoded while the previous
+    ones are being uploaded, with at most `s3_multipart_concurrency` parts
+    held in memory. Every part but the last is at least 5 MiB.
+
+    When `s3_json_compression` is enabled the body is gzip-compressed
+    (streamed through the same pipeline for large payloads) and stored with
+    the matching Content-Encoding.
+
+    `metadata` is stored as the object's S3 user metadata. `conditions`
+    (IfMatch / IfNoneMatch) are sent with the request that makes the object
+    visible: the PUT, or CompleteMultipartUpload.
+    """
+    part_size = get_part_size()
+    headers = {"Metadata": metadata} if metadata else {}
+
+    if not is_large_payload(data, settings.s3_json_serialize_offload_items):
+        body = await encode_json(data)
+        encoding = get_compression(len(body))
+        if encoding:
+            body = await compress_body(body)
+        headers.update(encoding_headers(encoding))
+
+        if len(body) > settings.s3_multipart_threshold:
+            parts = iter_parts_in_thread([], slice_parts(body, part_size))
+            await put_multipart(s3_path, parts, headers, conditions)
+            return
+
+        await put_object(
+            Bucket=settings.s3_bucket_name,
+            Key=s3_path,
+            Body=body,
+            **headers,
+            **conditions
+        )
+        return
+
+    encoding = get_compression()
+    chunks = iter_json(data)
+    if encoding:
+        chunks = iter_compressed(chunks)
+    headers.update(encoding_headers(encoding))
+
+    parts = iter_parts(chunks, part_size)
+    next_part = functools.partial(next, parts, None)
+
+    buffered = []
+    buffered_size = 0
+    while buffered_size <= settings.s3_multipart_threshold:
+        part = await asyncio.to_thread(next_part)
+        if part is None:
+            await put_object(
+                Bucket=settings.s3_bucket_name,
+                Key=s3_path,
+                Body=b"".join(buffered),
+                **headers,
+                **conditions
+            )
+            return
+
+        buffered.append(part)
+        buffered_size += len(part)
+
+    await put_multipart(s3_path, iter_parts_in_thread(buffered, parts), headers, conditions)
+
+
+async def put_multipart(s3_path: str, parts: AsyncIterator[bytes],
+                        headers: dict, conditions: dict) -> None:
+    """
+    Uploads `parts` as one multipart upload, pulling the next part only when
+    a slot is free, and aborts the upload on any failure. `headers`
+    (Content-Encoding, user Metadata) are set when the upload is created.
+    """
+    upload = await create_multipart_upload(
+        Bucket=settings.s3_bucket_name,
+        Key=s3_path,
+        **headers
+    )
+    upload_id = upload["UploadId"]
+    slots = asyncio.Semaphore(settings.s3_multipart_concurrency)
+    tasks = []
+
+    async def send_part(part_number: int, body: bytes) -> dict:
+        try:
+            response = await upload_part(
+                Bucket=settings.s3_bucket_name,
+                Key=s3_path,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            body = await anext(parts, None)
+            if body is None:
+                slots.release()
+                break
+
+            tasks.append(asyncio.create_task(send_part(len(tasks) + 1, body)))
+
+        uploaded = await asyncio.gather(*tasks)
+
+        await complete_multipart_upload(
+            Bucket=settings.s3_bucket_name,
+            Key=s3_path,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": uploaded},
+            **conditions
+        )
+
+        log.info(f"Uploaded {s3_path} in {len(uploaded)} parts")
+
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        log.error(f"Aborting multipart upload of {s3_path}")
+        await abort_multipart_upload(
+            Bucket=settings.s3_bucket_name,
+            Key=s3_path,
+            UploadId=upload_id
+        )
+        raise
@@ -3,6 +3,7 @@ import logging
 import aiohttp
 
 from beanie import PydanticObjectId
+from botocore.exceptions import ClientError
 from fastapi.exceptions import HTTPException
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
 
@@ -11,8 +12,9 @@ from ..models.area import AiMeAPIResponse
 from ..models.estimate import Estimate
 from ..models.floorplan_order import FloorplanOrder
 from ..crud.order import retrieve_order_by_id
-from ..crud.user import retrieve_user_by_id
-from ..s3.file_ops import create_json_file, check_file_exists_in_s3
+from ..crud.user import retrieve_user_by_id, user_loader_scope
+from ..s3.delta_log import replace_patched_json
+from ..s3.file_ops import check_files_exist_in_s3
 from ..utils.url import UrlBuilder
 
 logging.basicConfig(level=logging.INFO)
@@ -63,14 +65,16 @@ async def retrieve_valid_orders(fpo_results_with_pdf):
     tasks = [(retrieve_order_by_id(fpo_id), pdfFile) for fpo_id, pdfFile in fpo_results_with_pdf]
     orders_with_exceptions = await asyncio.gather(*[task for task, _ in tasks], return_exceptions=True)
 
-    user_tasks = [retrieve_user_by_id(order.userID) for order in orders_with_exceptions if
-                  order is not None and not isinstance(order, Exception)]
-    users = await asyncio.gather(*user_tasks)
+    with user_loader_scope():
+        user_tasks = [retrieve_user_by_id(order.userID) for order in orders_with_exceptions if
+                      order is not None and not isinstance(order, Exception)]
+        users = await asyncio.gather(*user_tasks)
 
     valid_orders_with_pdf = []
     for order, user, (_, pdfFile) in zip(orders_with_exceptions, users, tasks):
         if order is not None and not isinstance(order, Exception) and user is not None:
-            valid_orders_with_pdf.append(({"itemID": order.itemID, "user_identity": user.identity}, pdfFile))
+            valid_orders_with_pdf.append(({"id": str(order.id), "itemID": order.itemID,
+                                           "user_identity": user.identity}, pdfFile))
             if len(valid_orders_with_pdf) >= 10:
                 break
 
@@ -123,15 +127,16 @@ async def process_pdf_file(pdf_url: str) -> AiMeAPIResponse:
 
 
 async def process_orders_and_create_jsons(valid_orders, counter: int) -> int:
-    for order, pdfFile in valid_orders:
+    s3_json_paths = [UrlBuilder(order["user_identity"], order["itemID"]).get_s3_json_path("result.json")
+                     for order, _ in valid_orders]
+    existing_jsons = await check_files_exist_in_s3(s3_json_paths)
+
+    for (order, pdfFile), s3_json_path in zip(valid_orders, s3_json_paths):
         if counter >= 10:
             break
 
-        builder = UrlBuilder(order["user_identity"], order["itemID"])
-        s3_json_path = builder.get_s3_json_path("result.json")
-
         log.info(f"Checking for an order with an ItemId: {order['itemID']}")
-        success = await check_file_exists_in_s3(s3_json_path)
+        success = existing_jsons.get(s3_json_path, False)
 
         if success:
             log.info(f"For order {order['itemID']} already has json")
@@ -140,11 +145,13 @@ async def process_orders_and_create_jsons(valid_orders, counter: int) -> int:
             try:
                 log.info(f"Starting to create a json file for the order: {order['itemID']}")
                 api_result = await process_pdf_file(pdfFile)
-                await create_json_file(api_result.model_dump(by_alias=True), s3_json_path)
+                await replace_patched_json(order["id"], s3_json_path, api_result)
                 counter += 1
                 log.info(f"Json uploaded successfully")
             except HTTPException as e:
                 log.error(f"Error processing PDF for order {order['itemID']}: {e.detail}")
+            except ClientError as e:
+                log.error(f"Error when writing json for order {order['itemID']}: {e}")
 
     return counter
 
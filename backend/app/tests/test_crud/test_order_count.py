@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+from beanie import PydanticObjectId
+
+from backend.app.crud import order_count
+from backend.app.crud.order_count import OrderCounts
+
+USER_ID = PydanticObjectId()
+
+
+class UserField:
+    # `Order.userID == user_id` passes the user id on to `find`
+    def __eq__(self, user_id):
+        return user_id
+
+
+class FakeOrders:
+    """
+    Stands in for the Order document: counts come from `users`, and every
+    query is recorded.
+    """
+    userID = UserField()
+
+    def __init__(self, users: dict[PydanticObjectId, int]):
+        self.users = users
+        self.queries = []
+
+    def find(self, user_id: PydanticObjectId = None):
+        async def count() -> int:
+            self.queries.append(("count", user_id))
+            return self.users.get(user_id, 0) if user_id else sum(self.users.values())
+
+        return SimpleNamespace(count=count)
+
+    def get_motor_collection(self):
+        async def estimated_document_count() -> int:
+            self.queries.append(("estimated", None))
+            return sum(self.users.values())
+
+        return SimpleNamespace(estimated_document_count=estimated_document_count)
+
+
+@pytest.fixture
+def orders(monkeypatch):
+    orders = FakeOrders({USER_ID: 3, PydanticObjectId(): 4})
+    monkeypatch.setattr(order_count, "Order", orders)
+
+    return orders
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(order_count, "time", SimpleNamespace(monotonic=lambda: clock.now))
+
+    return clock
+
+
+@pytest.mark.asyncio
+async def test_total_uses_the_estimated_count_and_is_cached(orders, clock):
+    counts = OrderCounts(ttl=60, max_entries=10)
+
+    assert await counts.total() == 7
+    assert await counts.total() == 7
+    assert orders.queries == [("estimated", None)]
+
+    assert await counts.total(exact=True) == 7
+    assert orders.queries[-1] == ("count", None)
+    assert (counts.stats.estimated_counts, counts.stats.exact_counts, counts.stats.hits) == (1, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_user_count_expires_after_the_ttl(orders, clock):
+    counts = OrderCounts(ttl=60, max_entries=10)
+
+    assert await counts.by_user(USER_ID) == 3
+    orders.users[USER_ID] = 5
+    clock.now += 59
+    assert await counts.by_user(USER_ID) == 3
+
+    clock.now += 2
+    assert await counts.by_user(USER_ID) == 5
+    assert orders.queries == [("count", USER_ID), ("count", USER_ID)]
+
+
+@pytest.mark.asyncio
+async def test_created_orders_increment_cached_counts(orders, clock):
+    counts = OrderCounts(ttl=60, max_entries=10)
+    await counts.total()
+    await counts.by_user(USER_ID)
+
+    counts.record_created(USER_ID)
+    counts.record_created(PydanticObjectId())
+
+    assert await counts.total() == 9
+    assert await counts.by_user(USER_ID) == 4
+    assert len(orders.queries) == 2
+
+
+@pytest.mark.asyncio
+async def test_deleted_orders_drop_cached_counts(orders, clock):
+    counts = OrderCounts(ttl=60, max_entries=10)
+    await counts.total()
+    await counts.by_user(USER_ID)
+
+    orders.users[USER_ID] = 2
+    counts.record_deleted(USER_ID)
+
+    assert await counts.total() == 6
+    assert await counts.by_user(USER_ID) == 2
+    assert orders.queries[2:] == [("estimated", None), ("count", USER_ID)]
+    assert counts.stats.invalidations == 1
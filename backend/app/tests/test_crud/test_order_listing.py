@@ -0,0 +1,182 @@
+from types import SimpleNamespace
+
+import pytest
+from beanie import PydanticObjectId
+from fastapi import HTTPException
+
+import backend.app.logging.logging_config  # noqa: F401 (adds Logger.success)
+from backend.app.config import settings
+from backend.app.crud import order as order_crud
+from backend.app.models.order import OrderWithPicture
+from backend.app.routers import order as order_router
+from backend.app.utils.cursor import decode_cursor
+from backend.app.utils.url import ImageSize, UrlBuilder
+
+USER_ID = PydanticObjectId()
+ITEM_ID = PydanticObjectId()
+
+
+class FakeOrders:
+    """
+    Stands in for the Order document: `aggregate` records the pipeline it
+    was given and returns `rows`.
+    """
+
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.pipelines = []
+
+    def aggregate(self, pipeline: list[dict]):
+        self.pipelines.append(pipeline)
+
+        async def to_list() -> list[dict]:
+            return [dict(row) for row in self.rows]
+
+        return SimpleNamespace(to_list=to_list)
+
+
+@pytest.fixture(autouse=True)
+def uninitialised_beanie(monkeypatch):
+    # Collection names and document construction need an initialised Beanie
+    monkeypatch.setattr(order_crud, "User", SimpleNamespace(get_collection_name=lambda: "users"))
+    monkeypatch.setattr(OrderWithPicture, "get_motor_collection", classmethod(lambda cls: None))
+
+    for name in ("base_image_url", "base_json_url", "s3_path_prefix"):
+        monkeypatch.setattr(settings, name, f"https://{name}.test/", raising=False)
+
+
+def row(**fields) -> dict:
+    return {"_id": PydanticObjectId(), "name": "order", "userID": USER_ID, "itemID": ITEM_ID, **fields}
+
+
+def stages(pipeline: list[dict]) -> dict:
+    return {name: stage[name] for stage in pipeline for name in stage}
+
+
+def test_pipeline_joins_the_user_and_projects_the_first_panorama():
+    pipeline = order_crud.order_listing_pipeline({"userID": USER_ID}, limit=20, offset=40, after=None)
+
+    assert [next(iter(stage)) for stage in pipeline] == ["$match", "$sort", "$skip", "$limit", "$lookup", "$project"]
+    assert stages(pipeline)["$match"] == {"userID": USER_ID}
+    assert stages(pipeline)["$skip"] == 40
+    assert stages(pipeline)["$lookup"] == {"from": "users", "localField": "userID", "foreignField": "_id", "as": "user"}
+
+    projection = stages(pipeline)["$project"]
+    assert "panoramas" not in projection and "user" not in projection
+    assert projection["user_identity"] == {"$arrayElemAt": ["$user.identity", 0]}
+
+    first_panorama, index = projection["first_panorama"]["$arrayElemAt"]
+    assert index == 0
+    assert first_panorama["$map"]["in"] == "$$room.filename"
+    assert first_panorama["$map"]["input"]["$filter"] == {
+        "input": {"$ifNull": ["$panoramas", []]},
+        "as": "room",
+        "cond": {"$eq": ["$$room.isFirst", True]},
+    }
+
+
+def test_pipeline_with_a_cursor_seeks_instead_of_skipping():
+    after = PydanticObjectId()
+
+    pipeline = order_crud.order_listing_pipeline({"userID": USER_ID}, limit=20, offset=40, after=after)
+
+    assert "$skip" not in stages(pipeline)
+    assert stages(pipeline)["$match"] == {"userID": USER_ID, "_id": {"$gt": after}}
+    assert stages(pipeline)["$sort"] == {"_id": 1}
+
+
+@pytest.mark.asyncio
+async def test_listing_builds_picture_urls_from_the_joined_fields(monkeypatch):
+    rows = [
+        row(user_identity="ident", first_panorama="room1.jpg"),
+        row(user_identity="ident"),
+        row(first_panorama="room1.jpg"),
+    ]
+    orders = FakeOrders(rows)
+    monkeypatch.setattr(order_crud, "Order", orders)
+
+    listing = await order_crud.retrieve_order_listing(limit=3, offset=0, user_id=USER_ID)
+
+    assert stages(orders.pipelines[0])["$match"] == {"userID": USER_ID}
+    assert [order.id for order, _ in listing] == [item["_id"] for item in rows]
+    assert [identity for _, identity in listing] == ["ident", "ident", None]
+    assert [order.url_picture for order, _ in listing] == [
+        UrlBuilder("ident", ITEM_ID).get_img_url(ImageSize.size_150, "room1.jpg"), None, None
+    ]
+
+
+@pytest.mark.asyncio
+async def test_json_url_is_set_only_for_existing_result_files(monkeypatch):
+    with_json, without_json, without_user = (OrderWithPicture(id=PydanticObjectId(), name="order",
+                                                              userID=USER_ID, itemID=PydanticObjectId())
+                                             for _ in range(3))
+    checked = []
+
+    async def retrieve_order_listing(limit, offset, after, user_id):
+        return [(with_json, "ident"), (without_json, "ident"), (without_user, None)]
+
+    async def check_files_exist_in_s3(s3_paths):
+        checked.append(s3_paths)
+        return {path: path == UrlBuilder("ident", with_json.itemID).get_s3_json_path("result.json")
+                for path in s3_paths}
+
+    monkeypatch.setattr(order_router, "retrieve_order_listing", retrieve_order_listing)
+    monkeypatch.setattr(order_router, "check_files_exist_in_s3", check_files_exist_in_s3)
+
+    orders = await order_router.get_order_listing(limit=3, offset=0)
+
+    assert orders == [with_json, without_json, without_user]
+    assert len(checked) == 1 and len(checked[0]) == 2
+    assert with_json.lineItemJsonUrl == UrlBuilder("ident", with_json.itemID).get_external_json_url("result.json")
+    assert without_json.lineItemJsonUrl is None
+    assert without_user.lineItemJsonUrl is None
+
+
+@pytest.fixture
+def user_listing(monkeypatch):
+    listing = SimpleNamespace(orders=[], counts=[])
+
+    async def get_order_listing(limit, offset, after, user_id):
+        return listing.orders[:limit]
+
+    async def retrieve_orders_count_by_user_id(user_id, exact=False):
+        listing.counts.append((user_id, exact))
+        return 7
+
+    monkeypatch.setattr(order_router, "get_order_listing", get_order_listing)
+    monkeypatch.setattr(order_router, "retrieve_orders_count_by_user_id", retrieve_orders_count_by_user_id)
+
+    return listing
+
+
+@pytest.mark.asyncio
+async def test_user_listing_reports_the_users_total_not_the_page_size(user_listing):
+    user_listing.orders = [OrderWithPicture(id=PydanticObjectId(), name="order", userID=USER_ID)
+                           for _ in range(2)]
+
+    response = await order_router.get_orders_by_user_id(USER_ID, limit=2, offset=0, cursor=None,
+                                                        exact_total=True)
+
+    assert response.total_orders == 7
+    assert decode_cursor(response.next_cursor) == user_listing.orders[-1].id
+    assert user_listing.counts == [(USER_ID, True)]
+
+
+@pytest.mark.asyncio
+async def test_user_listing_without_orders_is_an_empty_page(user_listing):
+    response = await order_router.get_orders_by_user_id(USER_ID, limit=20, offset=0, cursor=None,
+                                                        exact_total=False)
+
+    assert response.orders == []
+    assert response.total_orders == 7
+    assert response.next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_user_listing_rejects_an_invalid_cursor(user_listing):
+    with pytest.raises(HTTPException) as error:
+        await order_router.get_orders_by_user_id(USER_ID, limit=20, offset=0, cursor="not-a-cursor",
+                                                 exact_total=False)
+
+    assert error.value.status_code == 400
+    assert user_listing.counts == []
@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from beanie import PydanticObjectId
+
+from backend.app.crud.user_cache import MISSING, UserCache
+
+
+def make_user(email: str) -> SimpleNamespace:
+    return SimpleNamespace(id=PydanticObjectId(), email=email)
+
+
+def test_user_cache_serves_by_id_and_email():
+    cache = UserCache(ttl=60, negative_ttl=60, max_entries=10)
+    user = make_user("a@example.com")
+
+    cache.put(cache.id_key(user.id), user)
+
+    assert cache.get(cache.id_key(user.id)) is user
+    assert cache.get(cache.email_key("a@example.com")) is user
+    assert cache.stats.hits == 2
+
+
+def test_user_cache_negative_entries_and_expiry():
+    cache = UserCache(ttl=60, negative_ttl=0, max_entries=10)
+    missing = cache.id_key(PydanticObjectId())
+
+    cache.put(missing, None)
+
+    assert cache.get(missing) is MISSING
+    assert cache.stats.expired == 1
+
+    cache.negative_ttl = 60
+    cache.put(missing, None)
+
+    assert cache.get(missing) is None
+    assert cache.stats.negative_hits == 1
+
+
+def test_user_cache_evicts_least_recently_used():
+    cache = UserCache(ttl=60, negative_ttl=60, max_entries=4)
+    first, second, third = (make_user(f"{name}@example.com") for name in ("first", "second", "third"))
+
+    cache.put(cache.id_key(first.id), first)
+    cache.put(cache.id_key(second.id), second)
+    cache.get(cache.id_key(first.id))
+    cache.put(cache.id_key(third.id), third)
+
+    assert cache.get(cache.id_key(second.id)) is MISSING
+    assert cache.get(cache.id_key(first.id)) is first
+    assert cache.stats.evictions == 2
@@ -0,0 +1,58 @@
+import asyncio
+from types import SimpleNamespace
+
+from beanie import PydanticObjectId
+
+from backend.app.crud import user as user_crud
+
+
+def test_loader_coalesces_lookups_into_one_query(monkeypatch):
+    known = [PydanticObjectId() for _ in range(3)]
+    missing = PydanticObjectId()
+    queries = []
+
+    async def retrieve_users_by_ids(user_ids):
+        queries.append(set(user_ids))
+        return [SimpleNamespace(id=user_id, email=f"{user_id}@example.com") for user_id in user_ids if user_id in known]
+
+    monkeypatch.setattr(user_crud, "retrieve_users_by_ids", retrieve_users_by_ids)
+
+    async def main():
+        with user_crud.user_loader_scope() as loader:
+            users = await asyncio.gather(*[user_crud.retrieve_user_by_id(user_id)
+                                           for user_id in known + known + [missing]])
+            again = await user_crud.retrieve_user_by_id(known[0])
+
+            return users, again, loader.queries
+
+    users, again, query_count = asyncio.run(main())
+
+    assert query_count == 1
+    assert queries == [set(known) | {missing}]
+    assert [user.id for user in users[:6]] == known + known
+    assert users[6] is None
+    assert again.id == known[0]
+
+
+def test_cancelled_caller_does_not_cancel_shared_load(monkeypatch):
+    user_id = PydanticObjectId()
+
+    async def retrieve_users_by_ids(user_ids):
+        await asyncio.sleep(0.01)
+        return [SimpleNamespace(id=user_id, email="user@example.com")]
+
+    monkeypatch.setattr(user_crud, "retrieve_users_by_ids", retrieve_users_by_ids)
+
+    async def main():
+        with user_crud.user_loader_scope() as loader:
+            cancelled = asyncio.create_task(loader.load(user_id))
+            waiting = asyncio.create_task(loader.load(user_id))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+
+            return await waiting, cancelled.cancelled()
+
+    user, was_cancelled = asyncio.run(main())
+
+    assert was_cancelled
+    assert user.id == user_id
@@ -0,0 +1,23 @@
+from pymongo import IndexModel
+
+from backend.app.db.indexes import compare_indexes
+
+
+def test_compare_indexes_matches_by_key():
+    declared = [
+        IndexModel([("userID", 1), ("_id", 1)]),
+        IndexModel([("email", 1)]),
+        IndexModel([("internalOrderId", 1)]),
+    ]
+    live = {
+        "_id_": {"key": [("_id", 1)], "v": 2},
+        "by_user": {"key": [("userID", 1), ("_id", 1)], "v": 2},
+        "email_-1": {"key": [("email", -1)], "v": 2},
+        "name_1": {"key": [("name", 1)], "v": 2},
+    }
+
+    missing, present, extra = compare_indexes(declared, live)
+
+    assert [index.document["name"] for index in missing] == ["email_1", "internalOrderId_1"]
+    assert present == ["userID_1__id_1"]
+    assert extra == ["email_-1", "name_1"]
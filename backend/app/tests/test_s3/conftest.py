@@ -0,0 +1,75 @@
+from collections import OrderedDict
+
+import orjson
+import pytest
+
+from backend.app.config import settings
+from backend.app.s3 import (audit_log, backup, client, delta_log, deletion, file_ops, local_storage,
+                            rename, staging, upload)
+from backend.app.s3.cache import json_cache, exists_cache, listing_cache, CacheStats, ExistenceStats
+
+S3_MODULES = [audit_log, backup, delta_log, deletion, file_ops, rename, staging, upload]
+MODULE_FUNCTIONS = ["read_body", "iter_body", "release_body", "close_client"]
+
+
+@pytest.fixture
+def local_s3(tmp_path, monkeypatch):
+    """
+    Points every S3 module at a fresh `LocalStorage` under `tmp_path`,
+    whichever client backend is configured, and starts with empty caches.
+    """
+    storage = local_storage.LocalStorage(str(tmp_path))
+    monkeypatch.setattr(settings, "s3_bucket_name", "bucket", raising=False)
+
+    for module in S3_MODULES:
+        for name in client.__all__:
+            if not hasattr(module, name):
+                continue
+
+            if name in MODULE_FUNCTIONS:
+                monkeypatch.setattr(module, name, getattr(local_storage, name))
+            else:
+                monkeypatch.setattr(module, name, getattr(storage, name))
+
+    monkeypatch.setattr(json_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(json_cache, "size", 0)
+    monkeypatch.setattr(json_cache, "stats", CacheStats())
+    monkeypatch.setattr(exists_cache, "_entries", {})
+    monkeypatch.setattr(exists_cache, "stats", ExistenceStats())
+    monkeypatch.setattr(listing_cache, "_entries", OrderedDict())
+    monkeypatch.setattr(listing_cache, "_pending", {})
+    monkeypatch.setattr(delta_log, "patched_views", OrderedDict())
+
+    return storage
+
+
+@pytest.fixture
+def put(local_s3):
+    async def put(key: str, body: bytes = b"{}") -> dict:
+        return await local_s3.put_object(Bucket="bucket", Key=key, Body=body)
+
+    return put
+
+
+@pytest.fixture
+def read(local_s3):
+    async def read(key: str) -> bytes:
+        return await local_storage.read_body(await local_s3.get_object(Bucket="bucket", Key=key))
+
+    return read
+
+
+@pytest.fixture
+def read_stored(read):
+    async def read_stored(key: str):
+        return orjson.loads(await read(key))
+
+    return read_stored
+
+
+@pytest.fixture
+def list_keys(local_s3):
+    async def list_keys(prefix: str) -> list[str]:
+        return [item["Key"] for item in await local_s3.list_objects(Bucket="bucket", Prefix=prefix)]
+
+    return list_keys
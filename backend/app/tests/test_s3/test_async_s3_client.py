@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+from backend.app.config import settings
+from backend.app.s3.async_s3_client import AsyncS3Client
+
+
+@pytest.fixture
+def fake_s3():
+    """
+    Serves a fixed HEAD/GET object response on a free local port from a
+    thread with its own event loop.
+    """
+    async def get_object(request):
+        return web.Response(body=b"{}", headers={"ETag": '"etag"', "Content-Type": "application/json"})
+
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", get_object)
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{port}"
+
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture
+def s3_client(fake_s3, monkeypatch):
+    monkeypatch.setattr(settings, "s3_access_key_id", "key", raising=False)
+    monkeypatch.setattr(settings, "s3_secret_access_key", "secret", raising=False)
+    monkeypatch.setattr(settings, "s3_region_name", "us-east-1", raising=False)
+
+    return AsyncS3Client(
+        max_pool_connections=4,
+        keepalive_timeout=5,
+        connect_timeout=5,
+        read_timeout=5,
+        retry_mode="standard",
+        max_attempts=1,
+        operation_timeout=5,
+        operation_timeouts={},
+        endpoint_url=fake_s3,
+    )
+
+
+def head_in_thread(s3_client) -> str:
+    # Same as a worker thread running `asyncio.run` on its own loop
+    result = {}
+
+    async def head():
+        try:
+            response = await s3_client.operation("head_object")(Bucket="bucket", Key="a.json")
+            return response["ETag"]
+        finally:
+            await s3_client.close()
+
+    thread = threading.Thread(target=lambda: result.update(etag=asyncio.run(head())))
+    thread.start()
+    thread.join()
+
+    return result["etag"]
+
+
+@pytest.mark.asyncio
+async def test_client_works_from_a_second_loop(s3_client):
+    head_object = s3_client.operation("head_object")
+
+    assert (await head_object(Bucket="bucket", Key="a.json"))["ETag"] == '"etag"'
+    assert head_in_thread(s3_client) == '"etag"'
+    assert (await head_object(Bucket="bucket", Key="a.json"))["ETag"] == '"etag"'
+
+    await s3_client.close()
+
+
+@pytest.mark.asyncio
+async def test_client_first_opened_on_another_loop(s3_client):
+    assert head_in_thread(s3_client) == '"etag"'
+
+    response = await s3_client.operation("head_object")(Bucket="bucket", Key="a.json")
+
+    assert response["ETag"] == '"etag"'
+    assert len(s3_client._clients) == 1
+
+    await s3_client.close()
+    assert s3_client._clients == {}
@@ -0,0 +1,106 @@
+from datetime import date
+
+import pytest
+from botocore.exceptions import ClientError
+
+from backend.app.s3 import audit_log
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def segmented_log(local_s3):
+    segmented_log = audit_log.SegmentedLog(prefix="damage_log/", flush_bytes=64, flush_interval=3600)
+    yield segmented_log
+
+    if segmented_log._flush_task is not None:
+        segmented_log._flush_task.cancel()
+
+
+@pytest.fixture
+def segments(list_keys):
+    async def segments() -> list[str]:
+        return await list_keys(f"damage_log/{TODAY.strftime(audit_log.SEGMENT_DATE_FORMAT)}/")
+
+    return segments
+
+
+@pytest.mark.asyncio
+async def test_entries_are_buffered_until_flushed(segmented_log, segments):
+    await segmented_log.append("first\n")
+    await segmented_log.append("second\n")
+
+    assert await segments() == []
+    assert segmented_log._flush_task is not None
+
+    await segmented_log.flush()
+
+    assert len(await segments()) == 1
+    assert await segmented_log.read(TODAY) == "first\nsecond\n"
+
+
+@pytest.mark.asyncio
+async def test_a_full_buffer_rolls_over_to_a_new_segment(segmented_log, segments):
+    # 9 characters, but 18 bytes in UTF-8
+    entry = "пожежа 🔥\n"
+
+    for _ in range(3):
+        await segmented_log.append(entry)
+    assert await segments() == []
+
+    await segmented_log.append(entry)
+    assert len(await segments()) == 1
+
+    await segmented_log.append("tail\n")
+    await segmented_log.flush()
+
+    assert len(await segments()) == 2
+    assert await segmented_log.read(TODAY) == entry * 4 + "tail\n"
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_entries_for_the_next_one(segmented_log, segments, monkeypatch, local_s3):
+    async def unavailable(**kwargs):
+        raise ClientError({"Error": {"Code": "ServiceUnavailable", "Message": "down"}}, "PutObject")
+
+    monkeypatch.setattr(audit_log, "put_object", unavailable)
+    await segmented_log.append("x" * 70 + "\n")
+
+    assert await segments() == []
+    assert segmented_log._buffer_bytes == 71
+    assert segmented_log._flush_task is not None
+
+    monkeypatch.setattr(audit_log, "put_object", local_s3.put_object)
+    await segmented_log.append("next\n")
+
+    assert await segmented_log.read(TODAY) == "x" * 70 + "\nnext\n"
+    assert segmented_log._buffer == []
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_the_buffer(segmented_log, segments):
+    await segmented_log.append("last\n")
+
+    await segmented_log.close()
+
+    assert segmented_log._flush_task is None
+    assert await segmented_log.read(TODAY) == "last\n"
+
+
+@pytest.mark.asyncio
+async def test_legacy_log_is_split_by_day(segmented_log, put, list_keys):
+    await put(audit_log.LEGACY_LOG_KEY, (
+        b"[2026-10-14 09:00:00] IP: 1.2.3.4, Damage Type: water, DataJSON: {}, ]\n"
+        b"[2026-10-14 09:00:00] Response Status: 200\n"
+        b"[2026-10-15 10:00:00] IP: 1.2.3.4, Damage Type: water, DataJSON: {}, ]\n"
+        b"[2026-10-15 10:00:00] Response Status: 500\n"
+    ))
+
+    assert await segmented_log.import_legacy(audit_log.LEGACY_LOG_KEY) == 2
+    assert await segmented_log.import_legacy(audit_log.LEGACY_LOG_KEY) == 2
+
+    assert len(await list_keys("damage_log/2026-10-14/")) == 1
+    assert await segmented_log.read(date(2026, 10, 15)) == (
+        "[2026-10-15 10:00:00] IP: 1.2.3.4, Damage Type: water, DataJSON: {}, ]\n"
+        "[2026-10-15 10:00:00] Response Status: 500\n"
+    )
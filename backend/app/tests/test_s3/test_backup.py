@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from backend.app.s3 import backup
+from backend.app.s3.backup import catalog_entry, order_snapshots
+from backend.app.s3.file_ops import get_file_name_s3_folder
+
+
+def test_order_snapshots_by_date_not_name():
+    prefixes = ["backup/01012026/", "backup/31122025/", "backup/15122025/"]
+
+    assert order_snapshots(prefixes) == ["backup/15122025/", "backup/31122025/", "backup/01012026/"]
+
+
+def test_catalog_entry_counts_objects_and_bytes():
+    manifest = {
+        "snapshot": "backup/16102026/",
+        "created": "2026-10-16T07:00:00",
+        "objects": {
+            "water/a.json": {"etag": "1", "size": 10, "location": "backup/15102026/"},
+            "water/b.json": {"etag": "2", "size": 5, "location": "backup/16102026/"},
+        },
+    }
+
+    assert catalog_entry(manifest) == {
+        "snapshot": "backup/16102026/",
+        "created": "2026-10-16T07:00:00",
+        "objects": 2,
+        "bytes": 15,
+    }
+
+
+def track_copies(monkeypatch, storage, fail_on: tuple = ()) -> list[str]:
+    copied = []
+
+    async def copy_object(**kwargs):
+        source = kwargs["CopySource"]["Key"]
+        if source in fail_on:
+            raise EndpointConnectionError(endpoint_url="http://s3")
+
+        copied.append(source)
+        return await storage.copy_object(**kwargs)
+
+    monkeypatch.setattr(backup, "copy_object", copy_object)
+    return copied
+
+
+@pytest.mark.asyncio
+async def test_incremental_snapshots_prune_and_restore(local_s3, monkeypatch, put, read, list_keys):
+    first, second, third = "backup/01102026/", "backup/02102026/", "backup/03102026/"
+    await put("water/a.json", b"a1")
+    await put("water/b.json", b"b1")
+    await put("root.json", b"r1")
+    await put("u1/storage/images/p.jpg", b"jpg")
+    await put("temporary_backup/water/a.json", b"a0")
+
+    copied = track_copies(monkeypatch, local_s3)
+    await backup.take_snapshot(first, None)
+
+    assert sorted(copied) == ["root.json", "water/a.json", "water/b.json"]
+
+    # Changed, added and deleted objects
+    await put("water/a.json", b"a2")
+    await put("fire/c.json", b"c1")
+    await local_s3.delete_object(Bucket="bucket", Key="root.json")
+
+    copied = track_copies(monkeypatch, local_s3)
+    await backup.take_snapshot(second, await backup.read_manifest(first))
+    manifest = await backup.read_manifest(second)
+
+    assert sorted(copied) == ["fire/c.json", "water/a.json"]
+    assert {key: entry["location"] for key, entry in manifest["objects"].items()} == {
+        "water/a.json": second,
+        "water/b.json": first,
+        "fire/c.json": second,
+    }
+
+    # Copies that fail fall back to the base entry, or are left out
+    await put("water/b.json", b"b2")
+    await put("water/d.json", b"d1")
+
+    copied = track_copies(monkeypatch, local_s3, fail_on=("water/b.json", "water/d.json"))
+    summary = await backup.take_snapshot(third, manifest)
+    manifest = await backup.read_manifest(third)
+
+    assert copied == []
+    assert len(summary.failed) == 2
+    assert manifest["objects"]["water/b.json"] == (await backup.read_manifest(second))["objects"]["water/b.json"]
+    assert "water/d.json" not in manifest["objects"]
+    assert [entry["snapshot"] for entry in await backup.list_restore_points()] == [first, second, third]
+
+    track_copies(monkeypatch, local_s3)
+    assert await backup.prune_snapshots(retention=2) == [first, second]
+
+    manifest = await backup.read_manifest(third)
+    assert {entry["location"] for entry in manifest["objects"].values()} == {third}
+    assert await list_keys(first) == await list_keys(second) == []
+    assert [entry["snapshot"] for entry in await backup.list_restore_points()] == [third]
+
+    for key in ("water/a.json", "water/b.json", "fire/c.json"):
+        await put(key, b"damaged")
+
+    await backup.restore_snapshot(third)
+
+    assert await read("water/a.json") == b"a2"
+    assert await read("water/b.json") == b"b1"
+    assert await read("fire/c.json") == b"c1"
+
+
+@pytest.mark.asyncio
+async def test_catalog_listing_skips_backups_and_image_trees(local_s3, monkeypatch, put):
+    for key in ("root.json", "water/a.json", "water/mold/b.json", "backup/01102026/water/a.json",
+                "temporary_backup/water/a.json", "u1/storage/images/p.jpg", "water/storage/images/q.jpg"):
+        await put(key, b"{}")
+
+    listed = []
+
+    async def list_objects(**kwargs):
+        listed.append(kwargs["Prefix"])
+        return await local_s3.list_objects(**kwargs)
+
+    monkeypatch.setattr(backup, "list_objects", list_objects)
+
+    objects = await backup.list_damage_catalog_objects()
+
+    assert sorted(item["Key"] for item in objects) == ["root.json", "water/a.json", "water/mold/b.json"]
+    # u1/ is listed one level deep only, its storage/ tree is never paged
+    assert sorted(listed) == ["", "u1/", "water/", "water/mold/"]
+
+
+@pytest.mark.asyncio
+async def test_copies_retry_transient_errors_and_report_failures(local_s3, monkeypatch, put):
+    monkeypatch.setattr(backup.settings, "s3_backup_copy_attempts", 3)
+    sleep = asyncio.sleep
+    monkeypatch.setattr(backup.asyncio, "sleep", lambda delay: sleep(0))
+    for name in ("a", "b", "c"):
+        await put(f"water/{name}.json", name.encode())
+
+    attempts = []
+
+    async def copy_object(**kwargs):
+        source = kwargs["CopySource"]["Key"]
+        attempts.append(source)
+        if source == "water/b.json" and attempts.count(source) < 3:
+            raise ClientError({"Error": {"Code": "SlowDown"}}, "CopyObject")
+        return await local_s3.copy_object(**kwargs)
+
+    monkeypatch.setattr(backup, "copy_object", copy_object)
+    copies = [(f"water/{name}.json", f"backup/01102026/water/{name}.json", 1) for name in ("a", "b", "c", "x")]
+
+    summary = await backup.copy_objects("test_copy", copies)
+
+    assert attempts.count("water/b.json") == 3
+    assert attempts.count("water/x.json") == 1
+    assert (summary.total, summary.copied, summary.bytes_copied, summary.retries) == (4, 3, 3, 2)
+    assert [key for key, _ in summary.failed] == ["water/x.json"]
+    assert backup.last_summaries["test_copy"]["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_written_manifest_shows_in_cached_listing(put):
+    await put("backup/01102026/water/a.json", b"a")
+    assert await get_file_name_s3_folder("backup/01102026/") == ["backup/01102026/water/a.json"]
+
+    await backup.write_manifest({"snapshot": "backup/01102026/", "created": "2026-10-01T07:00:00", "objects": {}})
+
+    assert await get_file_name_s3_folder("backup/01102026/") == [
+        "backup/01102026/manifest.json",
+        "backup/01102026/water/a.json",
+    ]
@@ -0,0 +1,73 @@
+from backend.app.s3.cache import JsonObjectCache, ListingCache
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    cache = JsonObjectCache(max_bytes=10, max_object_bytes=10)
+
+    cache.put("a.json", '"a"', b"aaaa")
+    cache.put("b.json", '"b"', b"bbbb")
+    cache.get("a.json")
+    cache.put("c.json", '"c"', b"cccc")
+
+    assert cache.get("b.json") is None
+    assert cache.get("a.json").body == b"aaaa"
+    assert cache.size == 8
+    assert cache.stats.evictions == 1
+
+
+def test_cache_skips_large_objects_and_missing_etag():
+    cache = JsonObjectCache(max_bytes=100, max_object_bytes=4)
+
+    cache.put("large.json", '"l"', b"too large")
+    cache.put("no_etag.json", None, b"{}")
+
+    assert cache.get("large.json") is None
+    assert cache.get("no_etag.json") is None
+    assert cache.size == 0
+
+
+def test_cache_invalidate_prefix():
+    cache = JsonObjectCache(max_bytes=100, max_object_bytes=100)
+
+    cache.put("water/water.json", '"1"', b"[]")
+    cache.put("water/subtype/a.json", '"2"', b"[]")
+    cache.put("mold/mold.json", '"3"', b"[]")
+    cache.invalidate_prefix("water/")
+
+    assert cache.get("water/water.json") is None
+    assert cache.get("mold/mold.json") is not None
+    assert cache.stats.invalidations == 2
+
+
+def test_listing_cache_tracks_own_writes_and_deletes():
+    cache = ListingCache(max_age=60, max_entries=10)
+    cache.put("water/", ["water/a.json", "water/b.json"])
+
+    cache.record("write", "water/c.json")
+    cache.record("write", "fire/a.json")
+    cache.record("delete", "water/a.json")
+
+    assert cache.get("water/") == ["water/b.json", "water/c.json"]
+
+    cache.record("delete_prefix", "water")
+    assert cache.get("water/") == []
+    assert cache.get("fire/") is None
+
+
+def test_listing_cache_replays_changes_made_during_listing():
+    cache = ListingCache(max_age=60, max_entries=10)
+
+    cache.begin("water/")
+    cache.record("write", "water/new.json")
+    cache.record("delete", "water/old.json")
+    cache.put("water/", ["water/old.json"])
+
+    assert cache.get("water/") == ["water/new.json"]
+
+
+def test_listing_cache_expires_entries():
+    cache = ListingCache(max_age=-1, max_entries=10)
+    cache.put("water/", ["water/a.json"])
+
+    assert cache.get("water/") is None
+    assert cache.stats.expired == 1
@@ -0,0 +1,32 @@
+import gzip
+
+from backend.app.config import settings
+from backend.app.s3.compression import Decompressor, compress, get_compression, iter_compressed
+
+
+def test_compressed_chunks_are_valid_gzip():
+    chunks = [b'{"a":', b'"' + b"x" * 10_000 + b'"', b"}"]
+
+    assert gzip.decompress(b"".join(iter_compressed(chunks))) == b"".join(chunks)
+    assert gzip.decompress(compress(b"".join(chunks))) == b"".join(chunks)
+
+
+def test_decompressor_streams_and_passes_through():
+    body = b"[" + b"1," * 5_000 + b"1]"
+    compressed = compress(body)
+
+    decompressor = Decompressor("gzip")
+    decoded = b"".join(decompressor.decompress(compressed[i:i + 100]) for i in range(0, len(compressed), 100))
+
+    assert decoded + decompressor.flush() == body
+    assert Decompressor(None).decompress(body) == body
+
+
+def test_compression_is_opt_in(monkeypatch):
+    monkeypatch.setattr(settings, "s3_json_compression", None, raising=False)
+    assert get_compression(1024 * 1024) is None
+
+    monkeypatch.setattr(settings, "s3_json_compression", "gzip")
+    monkeypatch.setattr(settings, "s3_json_compression_min_bytes", 100)
+    assert get_compression(10) is None
+    assert get_compression(1000) == "gzip"
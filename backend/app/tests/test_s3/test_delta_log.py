@@ -0,0 +1,141 @@
+import orjson
+import pytest
+
+from backend.app.s3 import delta_log
+from backend.app.s3.file_ops import get_json_and_etag_from_s3
+from backend.app.s3.upload import put_json_object
+from backend.app.utils.json_patch import JsonPatchError
+
+ORDER_ID = "64b000000000000000000001"
+RESULT_JSON = "u1/1/Tour/result.json"
+
+
+async def put_delta(put, sequence: int, operations: list[dict]) -> None:
+    key = f"{delta_log.get_delta_prefix(ORDER_ID)}{delta_log.DELTA_NAME_FORMAT.format(sequence)}"
+    await put(key, orjson.dumps({"target": RESULT_JSON, "operations": operations}))
+
+
+@pytest.mark.asyncio
+async def test_append_and_replay_in_order(read_stored):
+    await put_json_object(RESULT_JSON, {"rooms": [], "total": 0})
+
+    first = await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "add", "path": "/rooms/-", "value": "kitchen"}])
+    second = await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "replace", "path": "/total", "value": 1},
+                                                                   {"op": "add", "path": "/rooms/-", "value": "hall"}])
+    document, _, keys = await delta_log.read_patched_json(ORDER_ID, RESULT_JSON)
+
+    assert (first, second) == (1, 2)
+    assert [delta_log.get_delta_sequence(key) for key in keys] == [1, 2]
+    assert document == {"rooms": ["kitchen", "hall"], "total": 1}
+    assert await read_stored(RESULT_JSON) == {"rooms": [], "total": 0}
+
+
+@pytest.mark.asyncio
+async def test_patch_that_does_not_apply_is_not_logged(local_s3):
+    await put_json_object(RESULT_JSON, {"total": 0})
+
+    with pytest.raises(JsonPatchError):
+        await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "remove", "path": "/rooms"}])
+
+    assert await delta_log.list_deltas(ORDER_ID) == []
+
+
+@pytest.mark.asyncio
+async def test_compaction_folds_and_drops_deltas(read_stored):
+    await put_json_object(RESULT_JSON, {"total": 0})
+    for total in (1, 2, 3):
+        await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "replace", "path": "/total", "value": total}])
+
+    assert await delta_log.compact_patched_json(ORDER_ID) == 3
+    assert await read_stored(RESULT_JSON) == {"total": 3}
+    assert await delta_log.list_deltas(ORDER_ID) == []
+    assert (await get_json_and_etag_from_s3(RESULT_JSON))[0] == {"total": 3}
+
+
+@pytest.mark.asyncio
+async def test_append_compacts_inline_at_the_pending_limit(monkeypatch, read_stored):
+    monkeypatch.setattr(delta_log.settings, "result_json_max_pending_deltas", 2)
+    await put_json_object(RESULT_JSON, {"total": 0})
+
+    sequences = [await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "replace", "path": "/total", "value": total}])
+                 for total in (1, 2, 3)]
+
+    assert sequences == [1, 2, 3]
+    assert await read_stored(RESULT_JSON) == {"total": 2}
+    assert (await delta_log.read_patched_json(ORDER_ID, RESULT_JSON))[0] == {"total": 3}
+
+
+@pytest.mark.asyncio
+async def test_deltas_left_after_compaction_are_not_applied_twice(local_s3, monkeypatch, read_stored):
+    await put_json_object(RESULT_JSON, {"rooms": []})
+    for room in ("kitchen", "hall"):
+        await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "add", "path": "/rooms/-", "value": room}])
+
+    async def crash(keys):
+        raise RuntimeError("crashed before the deltas were dropped")
+
+    drop_deltas = delta_log.drop_deltas
+    monkeypatch.setattr(delta_log, "drop_deltas", crash)
+    with pytest.raises(RuntimeError):
+        await delta_log.compact_patched_json(ORDER_ID)
+    monkeypatch.setattr(delta_log, "drop_deltas", drop_deltas)
+
+    document, _, keys = await delta_log.read_patched_json(ORDER_ID, RESULT_JSON)
+    assert document == {"rooms": ["kitchen", "hall"]}
+    assert keys == []
+
+    assert await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "add", "path": "/rooms/-", "value": "bath"}]) == 3
+    assert await delta_log.compact_patched_json(ORDER_ID) == 1
+    assert await read_stored(RESULT_JSON) == {"rooms": ["kitchen", "hall", "bath"]}
+    assert await delta_log.list_deltas(ORDER_ID) == []
+
+
+@pytest.mark.asyncio
+async def test_append_reads_only_new_deltas(monkeypatch, put):
+    await put_json_object(RESULT_JSON, {"total": 0})
+    await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "replace", "path": "/total", "value": 1}])
+
+    read_keys = []
+    read_delta = delta_log.read_delta
+
+    async def track_read(key):
+        read_keys.append(key)
+        return await read_delta(key)
+
+    monkeypatch.setattr(delta_log, "read_delta", track_read)
+    for total in (2, 3):
+        await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "replace", "path": "/total", "value": total}])
+    assert read_keys == []
+
+    # Appended by another process, so the next append has to read it
+    await put_delta(put, 4, [{"op": "add", "path": "/rooms", "value": []}])
+    await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "add", "path": "/rooms/-", "value": "hall"}])
+
+    assert [delta_log.get_delta_sequence(key) for key in read_keys] == [4]
+    assert delta_log.patched_views[ORDER_ID].document == {"total": 3, "rooms": ["hall"]}
+
+
+@pytest.mark.asyncio
+async def test_full_write_discards_pending_deltas(monkeypatch, put, read_stored):
+    monkeypatch.setattr(delta_log, "recent_conflicts", delta_log.deque(maxlen=10))
+    await put_json_object(RESULT_JSON, {"rooms": {"kitchen": {"area": 10}}, "total": 0})
+    await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "replace", "path": "/total", "value": 1}])
+
+    await delta_log.replace_patched_json(ORDER_ID, RESULT_JSON, {"rooms": {}, "total": 0})
+
+    assert await delta_log.list_deltas(ORDER_ID) == []
+    assert (await delta_log.read_patched_json(ORDER_ID, RESULT_JSON))[0] == {"rooms": {}, "total": 0}
+
+    assert await delta_log.append_patch(ORDER_ID, RESULT_JSON, [{"op": "add", "path": "/rooms/hall", "value": {}}]) == 2
+    # Checked against the replaced document by a writer racing the full write
+    await put_delta(put, 3, [{"op": "replace", "path": "/rooms/kitchen/area", "value": 12}])
+
+    assert await delta_log.compact_patched_json(ORDER_ID) == 2
+    assert await read_stored(RESULT_JSON) == {"rooms": {"hall": {}}, "total": 0}
+    assert await delta_log.list_deltas(ORDER_ID) == []
+
+    conflict = await read_stored(f"{delta_log.DELTA_CONFLICT_PREFIX}{ORDER_ID}/0000000003.json")
+    assert conflict["operations"] == [{"op": "replace", "path": "/rooms/kitchen/area", "value": 12}]
+    assert conflict["target"] == RESULT_JSON
+    assert conflict["error"]
+    assert [(item["order_id"], item["sequence"]) for item in delta_log.recent_conflicts] == [(ORDER_ID, 3)]
@@ -0,0 +1,194 @@
+import orjson
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from fastapi import HTTPException
+
+from backend.app.s3 import file_ops
+from backend.app.s3.cache import exists_cache
+from backend.app.s3.metrics import JsonReadMetrics
+
+TOUR = "storage/images/v1/items/u1/1/Tour/"
+
+
+def test_existence_groups_by_the_folder_of_the_key():
+    assert file_ops.get_existence_group_prefix(f"{TOUR}result.json") == TOUR
+    assert file_ops.get_existence_group_prefix(f"{TOUR}rooms/a.json") == f"{TOUR}rooms/"
+    assert file_ops.get_existence_group_prefix("backup/catalog.json") == "backup/"
+
+
+@pytest.mark.asyncio
+async def test_bulk_existence_lists_shared_folders_and_heads_single_keys(put, monkeypatch):
+    for key in (f"{TOUR}result.json", f"{TOUR}floorplan.json", f"{TOUR}150-images/a.jpg",
+                f"{TOUR}1080-images/a.jpg", "storage/images/v1/items/u1/3/Tour/result.json"):
+        await put(key)
+
+    listings = []
+    iter_object_pages = file_ops.iter_object_pages
+
+    def tracking_iter_object_pages(**kwargs):
+        listings.append((kwargs["Prefix"], kwargs.get("Delimiter")))
+        return iter_object_pages(**kwargs)
+
+    monkeypatch.setattr(file_ops, "iter_object_pages", tracking_iter_object_pages)
+    paths = [f"{TOUR}result.json", f"{TOUR}floorplan.json", f"{TOUR}missing.json",
+             "storage/images/v1/items/u1/2/Tour/result.json", "storage/images/v1/items/u1/3/Tour/result.json"]
+
+    result = await file_ops.check_files_exist_in_s3(paths)
+
+    assert result == {
+        f"{TOUR}result.json": True,
+        f"{TOUR}floorplan.json": True,
+        f"{TOUR}missing.json": False,
+        "storage/images/v1/items/u1/2/Tour/result.json": False,
+        "storage/images/v1/items/u1/3/Tour/result.json": True,
+    }
+    assert listings == [(TOUR, "/")]
+    assert exists_cache.stats.list_requests == 1
+    assert exists_cache.stats.head_requests == 2
+
+    assert await file_ops.check_files_exist_in_s3(paths) == result
+    assert exists_cache.stats.head_requests == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_existence_answers_every_key_on_errors(local_s3, monkeypatch):
+    def unreachable(**kwargs):
+        raise EndpointConnectionError(endpoint_url="http://s3")
+
+    async def head_unreachable(**kwargs):
+        unreachable()
+
+    monkeypatch.setattr(file_ops, "iter_object_pages", unreachable)
+    monkeypatch.setattr(file_ops, "head_object", head_unreachable)
+
+    paths = ["u1/1/Tour/result.json", "u1/1/Tour/floorplan.json", "u2/9/Tour/result.json"]
+
+    assert await file_ops.check_files_exist_in_s3(paths) == dict.fromkeys(paths, False)
+
+
+def race_writes(monkeypatch, storage, key: str, documents: list):
+    """
+    Lets another writer store the next of `documents` right before each of
+    our conditional PUTs, until they run out.
+    """
+    put_json_object = file_ops.put_json_object
+    pending = list(documents)
+    calls = []
+
+    async def racing_put(s3_path, data, metadata=None, **conditions):
+        calls.append(conditions)
+        if pending:
+            await storage.put_object(Bucket="bucket", Key=key, Body=orjson.dumps(pending.pop(0)))
+        await put_json_object(s3_path, data, metadata, **conditions)
+
+    monkeypatch.setattr(file_ops, "put_json_object", racing_put)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_update_rereads_and_merges_after_precondition_failure(local_s3, monkeypatch, put, read_stored):
+    await put("u1/1/Tour/result.json", b'{"a": 1}')
+    calls = race_writes(monkeypatch, local_s3, "u1/1/Tour/result.json", [{"a": 1, "b": 2}])
+
+    response = await file_ops.update_json_file({"c": 3}, "u1/1/Tour/result.json")
+
+    assert response.message == "File updated successfully"
+    assert await read_stored("u1/1/Tour/result.json") == {"a": 1, "b": 2, "c": 3}
+    assert len(calls) == 2
+    assert calls[0]["IfMatch"] != calls[1]["IfMatch"]
+
+
+@pytest.mark.asyncio
+async def test_create_merges_when_another_writer_creates_first(local_s3, monkeypatch, read_stored):
+    calls = race_writes(monkeypatch, local_s3, "u1/1/Tour/result.json", [{"b": 2}])
+
+    await file_ops.update_json_file({"c": 3}, "u1/1/Tour/result.json")
+
+    assert await read_stored("u1/1/Tour/result.json") == {"b": 2, "c": 3}
+    assert calls[0] == {"IfNoneMatch": "*"}
+    assert "IfMatch" in calls[1]
+
+
+@pytest.mark.asyncio
+async def test_list_update_backs_up_once_and_merges_by_id(local_s3, monkeypatch, put, read_stored):
+    await put("damage_type.json", orjson.dumps([{"Id": 1, "name": "old"}]))
+    race_writes(monkeypatch, local_s3, "damage_type.json", [[{"Id": 1, "name": "old"}, {"Id": 2, "name": "theirs"}]])
+
+    await file_ops.update_json_file([{"Id": 1, "name": "ours"}], "damage_type.json")
+
+    assert await read_stored("damage_type.json") == [{"Id": 1, "name": "ours"}, {"Id": 2, "name": "theirs"}]
+    assert await read_stored("temporary_backup/damage_type.json") == [{"Id": 1, "name": "old"}]
+
+
+@pytest.mark.asyncio
+async def test_update_gives_up_after_the_attempt_limit(local_s3, monkeypatch, put, read_stored):
+    monkeypatch.setattr(file_ops.settings, "s3_conditional_write_attempts", 3)
+    await put("u1/1/Tour/result.json", b'{"a": 0}')
+    calls = race_writes(monkeypatch, local_s3, "u1/1/Tour/result.json", [{"a": n} for n in range(1, 10)])
+
+    with pytest.raises(HTTPException) as error:
+        await file_ops.update_json_file({"c": 3}, "u1/1/Tour/result.json")
+
+    assert error.value.status_code == 409
+    assert len(calls) == 3
+    assert await read_stored("u1/1/Tour/result.json") == {"a": 3}
+
+
+@pytest.fixture
+def read_metrics(monkeypatch):
+    metrics = JsonReadMetrics()
+    monkeypatch.setattr(file_ops, "json_read_metrics", metrics)
+    return metrics
+
+
+@pytest.mark.asyncio
+async def test_json_read_is_streamed_in_chunks(read_metrics, monkeypatch, put):
+    monkeypatch.setattr(file_ops.settings, "s3_read_chunk_size", 16)
+    chunks = []
+    iter_body = file_ops.iter_body
+
+    async def counting_iter_body(response, chunk_size):
+        async for chunk in iter_body(response, chunk_size):
+            chunks.append(len(chunk))
+            yield chunk
+
+    monkeypatch.setattr(file_ops, "iter_body", counting_iter_body)
+    body = orjson.dumps({"rooms": [{"name": f"room {index}"} for index in range(10)]})
+    await put("u1/1/Tour/result.json", body)
+
+    data = await file_ops.get_json_from_s3("u1/1/Tour/result.json")
+
+    assert data == orjson.loads(body)
+    assert sum(chunks) == len(body)
+    assert max(chunks) == 16
+    assert (read_metrics.reads, read_metrics.bytes_in, read_metrics.max_object_bytes) == (1, len(body), len(body))
+    assert read_metrics.offloaded_parses == 0
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_parsed_off_the_event_loop(read_metrics, monkeypatch, put):
+    monkeypatch.setattr(file_ops.settings, "s3_json_offload_threshold", 64)
+    threads = []
+    to_thread = file_ops.asyncio.to_thread
+
+    async def tracking_to_thread(function, *args):
+        threads.append(function)
+        return await to_thread(function, *args)
+
+    monkeypatch.setattr(file_ops.asyncio, "to_thread", tracking_to_thread)
+    await put("small.json", b'{"a": 1}')
+    await put("large.json", orjson.dumps(["x" * 10] * 10))
+
+    assert await file_ops.get_json_from_s3("small.json") == {"a": 1}
+    assert await file_ops.get_json_from_s3("large.json") == ["x" * 10] * 10
+    assert threads.count(orjson.loads) == 1
+    assert (read_metrics.reads, read_metrics.offloaded_parses) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_missing_json_is_a_404(local_s3, read_metrics):
+    with pytest.raises(HTTPException) as error:
+        await file_ops.get_json_from_s3("u1/1/Tour/result.json")
+
+    assert error.value.status_code == 404
+    assert read_metrics.reads == 0
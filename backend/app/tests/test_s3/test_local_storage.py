@@ -0,0 +1,101 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from backend.app.s3 import local_storage
+from backend.app.s3.client import ObjectStorage
+from backend.app.s3.local_storage import LocalStorage, read_body
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorage(str(tmp_path))
+
+
+def error_code(error: pytest.ExceptionInfo) -> str:
+    return error.value.response["Error"]["Code"]
+
+
+@pytest.mark.asyncio
+async def test_put_get_head_and_conditions(storage):
+    put = await storage.put_object(Bucket="b", Key="Tour/a.json", Body=b"{}", ContentEncoding="gzip")
+    response = await storage.get_object(Bucket="b", Key="Tour/a.json")
+
+    assert await read_body(response) == b"{}"
+    assert response["ETag"] == put["ETag"]
+    assert response["ContentEncoding"] == "gzip"
+    assert (await storage.head_object(Bucket="b", Key="Tour/a.json"))["ContentLength"] == 2
+
+    with pytest.raises(ClientError) as error:
+        await storage.get_object(Bucket="b", Key="Tour/a.json", IfNoneMatch=put["ETag"])
+    assert error_code(error) == "304"
+
+    with pytest.raises(ClientError) as error:
+        await storage.put_object(Bucket="b", Key="Tour/a.json", Body=b"[]", IfMatch='"other"')
+    assert error_code(error) == "PreconditionFailed"
+
+    with pytest.raises(ClientError) as error:
+        await storage.put_object(Bucket="b", Key="Tour/a.json", Body=b"[]", IfNoneMatch="*")
+    assert error_code(error) == "PreconditionFailed"
+
+    await storage.put_object(Bucket="b", Key="Tour/a.json", Body=b"[]", IfMatch=put["ETag"])
+
+    with pytest.raises(ClientError) as error:
+        await storage.head_object(Bucket="b", Key="Tour/missing.json")
+    assert error_code(error) == "404"
+
+    with pytest.raises(ClientError) as error:
+        await storage.get_object(Bucket="b", Key="Tour/missing.json")
+    assert error_code(error) == "NoSuchKey"
+
+
+@pytest.mark.asyncio
+async def test_list_copy_and_delete(storage):
+    for key in ("root.json", "water/water.json", "water/sub/a.json", "fire/fire.json"):
+        await storage.put_object(Bucket="b", Key=key, Body=b"{}")
+
+    assert [item["Key"] for item in await storage.list_objects(Bucket="b", Prefix="water/")] == \
+           ["water/sub/a.json", "water/water.json"]
+    assert [item["Key"] for item in await storage.list_objects(Bucket="b", Prefix="", Delimiter="/")] == \
+           ["root.json"]
+    assert await storage.list_common_prefixes(Bucket="b", Prefix="", Delimiter="/") == \
+           [{"Prefix": "fire/"}, {"Prefix": "water/"}]
+
+    await storage.copy_object(CopySource={"Bucket": "b", "Key": "root.json"}, Bucket="b", Key="backup/root.json")
+    await storage.delete_objects(Bucket="b", Delete={"Objects": [{"Key": "water/water.json"}, {"Key": "root.json"}]})
+
+    keys = [item["Key"] for item in await storage.list_objects(Bucket="b", Prefix="")]
+    assert keys == ["backup/root.json", "fire/fire.json", "water/sub/a.json"]
+
+
+@pytest.mark.asyncio
+async def test_multipart_upload(storage):
+    upload = await storage.create_multipart_upload(Bucket="b", Key="big.json", Metadata={"delta-sequence": "3"})
+    parts = []
+    for number, body in ((2, b"2]"), (1, b"[1,")):
+        part = await storage.upload_part(Bucket="b", Key="big.json", UploadId=upload["UploadId"],
+                                         PartNumber=number, Body=body)
+        parts.append({"PartNumber": number, "ETag": part["ETag"]})
+
+    await storage.complete_multipart_upload(Bucket="b", Key="big.json", UploadId=upload["UploadId"],
+                                            MultipartUpload={"Parts": parts})
+
+    response = await storage.get_object(Bucket="b", Key="big.json")
+    assert await read_body(response) == b"[1,2]"
+    assert response["Metadata"] == {"delta-sequence": "3"}
+
+    await storage.copy_object(CopySource={"Bucket": "b", "Key": "big.json"}, Bucket="b", Key="copy.json")
+    assert (await storage.head_object(Bucket="b", Key="copy.json"))["Metadata"] == {"delta-sequence": "3"}
+
+
+@pytest.mark.asyncio
+async def test_rejects_keys_outside_bucket(storage):
+    with pytest.raises(ClientError):
+        await storage.put_object(Bucket="b", Key="../escape.json", Body=b"{}")
+
+    with pytest.raises(ClientError):
+        storage.get_metadata_path("b", "../../b/escape.json")
+
+
+def test_implements_the_storage_protocol(storage):
+    assert isinstance(storage, ObjectStorage)
+    assert isinstance(local_storage, ObjectStorage)
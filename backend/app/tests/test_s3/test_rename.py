@@ -0,0 +1,107 @@
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from fastapi import HTTPException
+
+from backend.app.s3 import backup, rename
+from backend.app.s3.file_ops import set_new_directory_name
+
+
+def count_copies(monkeypatch, storage, fail_on: str = None) -> list[str]:
+    copied = []
+
+    async def copy_object(**kwargs):
+        if kwargs["CopySource"]["Key"] == fail_on:
+            raise EndpointConnectionError(endpoint_url="http://s3")
+
+        copied.append(kwargs["CopySource"]["Key"])
+        return await storage.copy_object(**kwargs)
+
+    monkeypatch.setattr(backup, "copy_object", copy_object)
+    return copied
+
+
+@pytest.mark.asyncio
+async def test_interrupted_copy_is_resumed_by_running_the_rename_again(local_s3, monkeypatch, put, list_keys):
+    for name in ("a", "b", "c"):
+        await put(f"u1/old/{name}.json", name.encode())
+
+    count_copies(monkeypatch, local_s3, fail_on="u1/old/b.json")
+    with pytest.raises(RuntimeError):
+        await set_new_directory_name("u1/old", "u1/new")
+
+    journal = await rename.read_journal("u1/old")
+    assert journal["phase"] == rename.PHASE_COPY
+    assert await list_keys("u1/old/") == ["u1/old/a.json", "u1/old/b.json", "u1/old/c.json"]
+    assert await list_keys("u1/new/") == ["u1/new/a.json", "u1/new/c.json"]
+
+    copied = count_copies(monkeypatch, local_s3)
+    await set_new_directory_name("u1/old", "u1/new")
+
+    assert copied == ["u1/old/b.json"]
+    assert await list_keys("u1/old/") == []
+    assert await list_keys("u1/new/") == ["u1/new/a.json", "u1/new/b.json", "u1/new/c.json"]
+    assert await rename.read_journal("u1/old") is None
+
+
+@pytest.mark.asyncio
+async def test_delete_phase_resume_keeps_sources_without_a_matching_copy(local_s3, monkeypatch, put, list_keys):
+    for name in ("a", "b"):
+        await put(f"u1/old/{name}.json", name.encode())
+        await put(f"u1/new/{name}.json", name.encode())
+    # Changed after its copy, and written after the copy phase
+    await put("u1/old/b.json", b"b2")
+    await put("u1/old/c.json", b"c")
+
+    await rename.write_journal({
+        "old_prefix": "u1/old",
+        "new_prefix": "u1/new",
+        "is_copy": False,
+        "phase": rename.PHASE_DELETE,
+        "started": "2026-10-16T07:00:00",
+    })
+    copied = count_copies(monkeypatch, local_s3)
+
+    await rename.resume_renames()
+
+    assert copied == []
+    assert await list_keys("u1/old/") == ["u1/old/b.json", "u1/old/c.json"]
+    assert await list_keys("u1/new/") == ["u1/new/a.json", "u1/new/b.json"]
+    assert await list_keys(rename.RENAME_JOURNAL_PREFIX) == []
+
+
+@pytest.mark.asyncio
+async def test_source_changed_after_its_copy_is_kept(local_s3, monkeypatch, put, read, list_keys):
+    for name in ("a", "b"):
+        await put(f"u1/old/{name}.json", name.encode())
+
+    write_journal = rename.write_journal
+
+    async def write_during_rename(journal):
+        await write_journal(journal)
+        if journal["phase"] == rename.PHASE_DELETE:
+            await put("u1/old/b.json", b"b2")
+
+    monkeypatch.setattr(rename, "write_journal", write_during_rename)
+    await set_new_directory_name("u1/old", "u1/new")
+
+    assert await list_keys("u1/old/") == ["u1/old/b.json"]
+    assert await read("u1/old/b.json") == b"b2"
+    assert await list_keys("u1/new/") == ["u1/new/a.json", "u1/new/b.json"]
+    assert await rename.read_journal("u1/old") is None
+
+
+@pytest.mark.asyncio
+async def test_pending_rename_to_another_prefix_conflicts(put):
+    await put("u1/old/a.json", b"a")
+    await rename.write_journal({
+        "old_prefix": "u1/old",
+        "new_prefix": "u1/other",
+        "is_copy": False,
+        "phase": rename.PHASE_COPY,
+        "started": "2026-10-16T07:00:00",
+    })
+
+    with pytest.raises(HTTPException) as error:
+        await rename.rename_prefix("u1/old", "u1/new")
+
+    assert error.value.status_code == 409
@@ -0,0 +1,76 @@
+import json
+from datetime import datetime
+
+import pytest
+from beanie import PydanticObjectId
+
+from backend.app.models.area import AiMeAPIResponse
+from backend.app.s3.serialization import (dumps_json, encode_json, is_large_payload,
+                                          iter_json, iter_json_parts)
+
+test_data = {
+    "ID": 113,
+    "Claim": "113",
+    "SubmittedFile": "TEST_DATA",
+    "LineItemTotal": 113,
+    "LineItems": [
+        {"cat": "WTR", "sel": "ACT3", "desc": "TEST_DATA", "Quantity": "514.66"}
+    ],
+    "Areas": [],
+}
+
+
+def test_dumps_json_model_matches_model_dump():
+    model = AiMeAPIResponse.model_validate(test_data)
+
+    assert json.loads(dumps_json(model)) == json.loads(json.dumps(model.model_dump(by_alias=True)))
+
+
+def test_dumps_json_object_id_and_datetime():
+    object_id = PydanticObjectId("615e9c55a67fb455bafbef6b")
+    created = datetime(2024, 1, 2, 3, 4, 5)
+
+    result = json.loads(dumps_json({"id": object_id, "created": created, 1: "int key"}))
+
+    assert result == {"id": str(object_id), "created": "2024-01-02T03:04:05", "1": "int key"}
+
+
+def test_dumps_json_nested_model():
+    model = AiMeAPIResponse.model_validate(test_data)
+
+    result = json.loads(dumps_json([model]))
+
+    assert result[0]["LineItems"][0]["cat"] == "WTR"
+
+
+def test_is_large_payload():
+    assert not is_large_payload({"a": [1, 2, 3]}, limit=10)
+    assert is_large_payload([{"Id": i} for i in range(10)], limit=10)
+
+
+@pytest.mark.asyncio
+async def test_encode_json_large_payload_offloaded():
+    data = [{"Id": str(i)} for i in range(30_000)]
+
+    assert json.loads(await encode_json(data)) == data
+
+
+def test_iter_json_matches_dumps_json():
+    object_id = PydanticObjectId("615e9c55a67fb455bafbef6b")
+    data = {
+        "items": [{"Id": index, "owner": object_id, "created": datetime(2024, 1, 2)} for index in range(50)],
+        1: "non str key",
+        "model": AiMeAPIResponse.model_validate(test_data),
+    }
+
+    assert b"".join(iter_json(data, split_items=4)) == dumps_json(data)
+
+
+def test_iter_json_parts_respects_part_size():
+    data = [{"Id": index, "desc": "x" * 100} for index in range(1000)]
+
+    parts = list(iter_json_parts(data, part_size=10_000))
+
+    assert b"".join(parts) == dumps_json(data)
+    assert all(len(part) >= 10_000 for part in parts[:-1])
+    assert len(parts) > 1
@@ -0,0 +1,114 @@
+import base64
+from urllib.parse import urlencode
+
+import orjson
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI, HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from backend.app.external_apis.aime_api import iter_estimate_form
+from backend.app.models.order import PdfUploadResponse
+from backend.app.routers import order, storage
+from backend.app.s3 import staging
+from backend.app.s3.backup import PDF_STAGING_PREFIX
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 4 + b"\n%%EOF"
+ORDER_ID = "64b000000000000000000001"
+
+
+@pytest_asyncio.fixture
+async def upload_client(local_s3, monkeypatch):
+    monkeypatch.setattr(storage, "storage", local_s3)
+    app = FastAPI()
+    app.include_router(storage.router)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def post_file(upload_client, fields: dict, content: bytes = PDF):
+    return await upload_client.post("/local_storage/upload", data=fields,
+                                    files={"file": ("estimate.pdf", content, "application/pdf")})
+
+
+def decode_policy(fields: dict) -> dict:
+    return orjson.loads(base64.b64decode(fields["policy"]))
+
+
+async def chunks_of(content: bytes, size: int):
+    for offset in range(0, len(content), size):
+        yield content[offset:offset + size]
+
+
+@pytest.mark.asyncio
+async def test_presigned_post_limits_type_and_size(local_s3):
+    ticket = await staging.create_pdf_upload("../scans/My Estimate?.pdf")
+
+    assert ticket["fields"]["key"] == f"{PDF_STAGING_PREFIX}{ticket['upload_id']}/My Estimate_.pdf"
+    assert ticket["fields"]["Content-Type"] == "application/pdf"
+    assert ticket["expires_in"] == staging.settings.pdf_upload_expires_in
+
+    conditions = decode_policy(ticket["fields"])["conditions"]
+    assert {"Content-Type": "application/pdf"} in conditions
+    assert ["content-length-range", 1, staging.settings.pdf_upload_max_bytes] in conditions
+
+
+@pytest.mark.asyncio
+async def test_local_upload_route_enforces_the_policy(upload_client, monkeypatch, read):
+    monkeypatch.setattr(staging.settings, "pdf_upload_max_bytes", 2048)
+    ticket = await staging.create_pdf_upload("estimate.pdf")
+
+    fields = ticket["fields"]
+
+    assert (await post_file(upload_client, {**fields, "Content-Type": "text/html"})).status_code == 403
+    assert (await post_file(upload_client, {**fields, "key": "u1/1/Tour/result.json"})).status_code == 403
+    assert (await post_file(upload_client, {**fields, "signature": "0" * 64})).status_code == 403
+    assert (await post_file(upload_client, fields, content=PDF * 2)).status_code == 400
+
+    assert (await post_file(upload_client, fields)).status_code == 204
+    assert await read(ticket["fields"]["key"]) == PDF
+
+
+@pytest.mark.asyncio
+async def test_confirm_streams_the_staged_pdf_and_drops_it(upload_client, monkeypatch, list_keys):
+    monkeypatch.setattr(staging.settings, "s3_read_chunk_size", 100)
+    ticket = await staging.create_pdf_upload("estimate.pdf")
+    await post_file(upload_client, ticket["fields"])
+    received = []
+
+    async def process_order_estimate_pdf(order_id, filename, content):
+        received.append(filename)
+        received.extend([chunk async for chunk in content])
+        return PdfUploadResponse(order_id=order_id, claim_number=None, order_json_url=None, rooms_json_urls=[])
+
+    monkeypatch.setattr(order, "process_order_estimate_pdf", process_order_estimate_pdf)
+
+    response = await order.upload_staged_pdf_to_order(ORDER_ID, ticket["upload_id"])
+
+    assert str(response.order_id) == ORDER_ID
+    assert received[0] == "estimate.pdf"
+    assert b"".join(received[1:]) == PDF
+    assert len(received) > 2
+    assert await list_keys(PDF_STAGING_PREFIX) == []
+
+
+@pytest.mark.asyncio
+async def test_confirm_rejects_unknown_uploads(local_s3):
+    with pytest.raises(HTTPException) as error:
+        await order.upload_staged_pdf("0" * 32)
+    assert error.value.status_code == 404
+
+    with pytest.raises(HTTPException) as error:
+        await order.upload_staged_pdf("../u1")
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_streamed_estimate_form_matches_the_encoded_form():
+    fields = {"UserID": "user", "FileName": "My Estimate.pdf", "CompanyCode": "c"}
+    expected = urlencode({**fields, "Base64PdfString": base64.b64encode(PDF).decode()}).encode()
+
+    for chunk_size in (1, 100, 1024, len(PDF)):
+        body = b"".join([part async for part in iter_estimate_form(fields, chunks_of(PDF, chunk_size))])
+        assert body == expected
@@ -0,0 +1,56 @@
+import pytest
+
+from backend.app.s3 import upload
+
+MIB = 1024 * 1024
+
+
+def track_parts(monkeypatch, storage) -> list[int]:
+    sizes = []
+
+    async def upload_part(**kwargs):
+        sizes.append(len(kwargs["Body"]))
+        return await storage.upload_part(**kwargs)
+
+    monkeypatch.setattr(upload, "upload_part", upload_part)
+    return sizes
+
+
+@pytest.mark.asyncio
+async def test_few_large_items_are_uploaded_in_parts(local_s3, monkeypatch, read_stored):
+    monkeypatch.setattr(upload.settings, "s3_multipart_threshold", 6 * MIB)
+    monkeypatch.setattr(upload.settings, "s3_multipart_part_size", 1 * MIB)
+    sizes = track_parts(monkeypatch, local_s3)
+    data = {"estimate": "x" * (12 * MIB)}
+
+    await upload.put_json_object("u1/1/Tour/result.json", data)
+
+    assert await read_stored("u1/1/Tour/result.json") == data
+    assert len(sizes) == 3
+    assert all(size == upload.MIN_PART_SIZE for size in sizes[:-1])
+
+
+@pytest.mark.asyncio
+async def test_many_small_items_are_sent_with_one_put(local_s3, monkeypatch, read_stored):
+    monkeypatch.setattr(upload.settings, "s3_json_serialize_offload_items", 100)
+    sizes = track_parts(monkeypatch, local_s3)
+    data = [{"Id": index} for index in range(1_000)]
+
+    await upload.put_json_object("damage_type.json", data)
+
+    assert await read_stored("damage_type.json") == data
+    assert sizes == []
+
+
+@pytest.mark.asyncio
+async def test_many_items_above_the_threshold_are_streamed_in_parts(local_s3, monkeypatch, read_stored):
+    monkeypatch.setattr(upload.settings, "s3_json_serialize_offload_items", 100)
+    monkeypatch.setattr(upload.settings, "s3_multipart_threshold", 6 * MIB)
+    sizes = track_parts(monkeypatch, local_s3)
+    data = [{"Id": index, "text": "x" * 1000} for index in range(12_000)]
+
+    await upload.put_json_object("damage_type.json", data)
+
+    assert await read_stored("damage_type.json") == data
+    assert len(sizes) > 1
+    assert all(size >= upload.MIN_PART_SIZE for size in sizes[:-1])
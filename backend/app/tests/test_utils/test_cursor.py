@@ -0,0 +1,38 @@
+import base64
+
+import pytest
+from beanie import PydanticObjectId
+
+from backend.app.utils.cursor import InvalidCursor, decode_cursor, encode_cursor, next_cursor
+
+
+def test_cursor_round_trip():
+    order_id = PydanticObjectId()
+
+    assert decode_cursor(encode_cursor(order_id)) == order_id
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+def test_cursor_round_trip_is_url_safe_and_unpadded():
+    for order_id in [PydanticObjectId("f" * 24), PydanticObjectId("0" * 24)] + [PydanticObjectId() for _ in range(50)]:
+        cursor = encode_cursor(order_id)
+
+        assert len(cursor) == 16
+        assert not set(cursor) & set("+/=")
+        assert decode_cursor(cursor) == order_id
+
+
+def test_invalid_cursor():
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+    with pytest.raises(InvalidCursor):
+        decode_cursor(base64.urlsafe_b64encode(bytes(11)).decode())
+
+
+def test_next_cursor_only_for_full_pages():
+    ids = [PydanticObjectId() for _ in range(3)]
+
+    assert decode_cursor(next_cursor(ids, limit=3)) == ids[-1]
+    assert next_cursor(ids, limit=5) is None
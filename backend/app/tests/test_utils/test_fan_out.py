@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from backend.app.utils.fan_out import fan_out
+
+
+def test_fan_out_keeps_order_and_bounds_concurrency():
+    async def worker(item: int) -> int:
+        await asyncio.sleep(0.01 * (item % 3))
+        return item * 2
+
+    result = asyncio.run(fan_out("test", range(20), worker, limit=4))
+
+    assert result.results == [item * 2 for item in range(20)]
+    assert result.total == 20
+    assert result.max_in_flight == 4
+    assert not result.failures
+
+
+def test_fan_out_collects_failures():
+    async def worker(item: int) -> int:
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    result = asyncio.run(fan_out("test", range(5), worker, limit=2))
+
+    assert result.results == [0, 1, 2, None, 4]
+    assert result.succeeded == 4
+    assert result.failures[0][0] == 3
+
+    with pytest.raises(ValueError):
+        result.raise_for_failures()
+
+
+def test_fan_out_accepts_async_iterable():
+    async def pages():
+        for page in range(3):
+            await asyncio.sleep(0)
+            yield [page] * 2
+
+    async def worker(item: list) -> int:
+        await asyncio.sleep(0.01)
+        return sum(item)
+
+    result = asyncio.run(fan_out("test", pages(), worker, limit=2))
+
+    assert result.results == [0, 2, 4]
+    assert result.max_in_flight == 2
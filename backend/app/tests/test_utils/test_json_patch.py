@@ -0,0 +1,44 @@
+import pytest
+
+from backend.app.utils.json_patch import JsonPatchError, apply_patch, parse_pointer
+
+
+def test_apply_patch_rfc6902_operations():
+    document = {"LineItems": [{"ID": "a", "Quantity": "1"}], "Areas": [], "a/b": {"~c": 1}}
+
+    result = apply_patch(document, [
+        {"op": "replace", "path": "/LineItems/0/Quantity", "value": "2"},
+        {"op": "add", "path": "/LineItems/-", "value": {"ID": "b"}},
+        {"op": "copy", "from": "/LineItems/1", "path": "/Areas/0"},
+        {"op": "move", "from": "/a~1b/~0c", "path": "/moved"},
+        {"op": "remove", "path": "/a~1b"},
+        {"op": "test", "path": "/moved", "value": 1},
+    ])
+
+    assert result == {
+        "LineItems": [{"ID": "a", "Quantity": "2"}, {"ID": "b"}],
+        "Areas": [{"ID": "b"}],
+        "moved": 1,
+    }
+
+
+@pytest.mark.parametrize("operation", [
+    {"op": "remove", "path": "/missing"},
+    {"op": "replace", "path": "/items/5", "value": 1},
+    {"op": "add", "path": "/items/01", "value": 1},
+    {"op": "test", "path": "/items/0", "value": 2},
+    {"op": "move", "from": "/items", "path": "/items/0"},
+    {"op": "add", "path": "/items/0"},
+    {"op": "unknown", "path": "/items"},
+])
+def test_apply_patch_rejects_invalid_operations(operation):
+    with pytest.raises(JsonPatchError):
+        apply_patch({"items": [1]}, [operation])
+
+
+def test_parse_pointer():
+    assert parse_pointer("") == []
+    assert parse_pointer("/a~1b/~01") == ["a/b", "~1"]
+
+    with pytest.raises(JsonPatchError):
+        parse_pointer("a")
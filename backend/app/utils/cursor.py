@@ -0,0 +1,35 @@
+import base64
+import binascii
+from typing import Optional
+
+from beanie import PydanticObjectId
+from bson.errors import InvalidId
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(last_id: PydanticObjectId) -> str:
+    return base64.urlsafe_b64encode(bytes.fromhex(str(last_id))).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[PydanticObjectId]:
+    """
+    Returns the `_id` a page should start after, or None for the first page.
+    """
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return PydanticObjectId(raw.hex())
+    except (binascii.Error, InvalidId, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def next_cursor(ids: list[PydanticObjectId], limit: int) -> Optional[str]:
+    """
+    Cursor for the page after `ids`, or None if this page was the last one.
+    """
+    return encode_cursor(ids[-1]) if len(ids) == limit else None
@@ -0,0 +1,121 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+from ..config import settings
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class FanOutResult:
+    name: str
+    total: int = 0
+    results: list = field(default_factory=list)
+    failures: list[tuple[Any, BaseException]] = field(default_factory=list)
+    seconds: float = 0.0
+    max_in_flight: int = 0
+
+    @property
+    def succeeded(self) -> int:
+        return self.total - len(self.failures)
+
+    def raise_for_failures(self) -> None:
+        if self.failures:
+            item, error = self.failures[0]
+            log.error(f"{self.name}: {len(self.failures)} of {self.total} items failed, first: {item}")
+            raise error
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": len(self.failures),
+            "seconds": round(self.seconds, 3),
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+last_runs: dict[str, dict] = {}
+
+_DONE = object()
+
+
+def get_limit(workload: str) -> int:
+    return settings.fan_out_limits.get(workload, settings.fan_out_default_limit)
+
+
+async def fan_out(
+        workload: str,
+        items: Union[Iterable, AsyncIterable],
+        worker: Callable[[Any], Awaitable[Any]],
+        limit: Optional[int] = None,
+        name: Optional[str] = None,
+        progress_every: Optional[int] = None,
+) -> FanOutResult:
+    """
+    Runs `worker` over `items` with at most `limit` calls in flight.
+
+    Items are pulled from the iterable only when a slot frees up, so large
+    inputs are never turned into thousands of pending tasks at once. `items`
+    may also be an async iterable (e.g. a paginated listing), which lets
+    work start before the input is fully produced.
+    Failures do not stop the run: they are collected in the result together
+    with the item that caused them, and results keep the input order
+    (None for failed items).
+    """
+    limit = limit or get_limit(workload)
+    result = FanOutResult(name=name or workload)
+    results: dict[int, Any] = {}
+    in_flight = 0
+    start = time.perf_counter()
+
+    if isinstance(items, AsyncIterable):
+        async_iterator = aiter(items)
+        lock = asyncio.Lock()
+        counter = itertools.count()
+
+        async def next_item():
+            # An async generator cannot be advanced by two workers at once
+            async with lock:
+                item = await anext(async_iterator, _DONE)
+                return _DONE if item is _DONE else (next(counter), item)
+    else:
+        iterator = enumerate(items)
+
+        async def next_item():
+            return next(iterator, _DONE)
+
+    async def run_worker() -> None:
+        nonlocal in_flight
+
+        while (entry := await next_item()) is not _DONE:
+            index, item = entry
+            result.total += 1
+            in_flight += 1
+            result.max_in_flight = max(result.max_in_flight, in_flight)
+
+            try:
+                results[index] = await worker(item)
+            except Exception as e:
+                log.error(f"{result.name}: failed for {item}: {e}")
+                result.failures.append((item, e))
+            finally:
+                in_flight -= 1
+
+            if progress_every and result.total % progress_every == 0:
+                log.info(f"{result.name}: {result.total} items started, {len(result.failures)} failed")
+
+    await asyncio.gather(*[run_worker() for _ in range(limit)])
+
+    result.results = [results.get(index) for index in range(result.total)]
+    result.seconds = time.perf_counter() - start
+    last_runs[workload] = result.as_dict()
+
+    log.info(f"{result.name} finished: {result.as_dict()}")
+
+    return result
@@ -0,0 +1,133 @@
+import copy
+from typing import Any, Union
+
+Document = Union[dict, list]
+
+
+class JsonPatchError(ValueError):
+    pass
+
+
+def parse_pointer(pointer: str) -> list[str]:
+    """
+    Splits an RFC 6901 JSON Pointer into unescaped reference tokens.
+    """
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JsonPatchError(f"Invalid JSON pointer: {pointer!r}")
+
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def get_list_index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == "-":
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise JsonPatchError(f"Invalid array index: {token!r}")
+
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f"Array index out of range: {index}")
+
+    return index
+
+
+def resolve(document: Any, tokens: list[str]) -> Any:
+    target = document
+
+    for token in tokens:
+        match target:
+            case dict():
+                if token not in target:
+                    raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+                target = target[token]
+            case list():
+                target = target[get_list_index(target, token)]
+            case _:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+    return target
+
+
+def add_value(document: Any, tokens: list[str], value: Any) -> Any:
+    if not tokens:
+        return value
+
+    parent = resolve(document, tokens[:-1])
+    match parent:
+        case dict():
+            parent[tokens[-1]] = value
+        case list():
+            parent.insert(get_list_index(parent, tokens[-1], allow_end=True), value)
+        case _:
+            raise JsonPatchError(f"Cannot add to a scalar at /{'/'.join(tokens)}")
+
+    return document
+
+
+def remove_value(document: Any, tokens: list[str]) -> Any:
+    if not tokens:
+        raise JsonPatchError("Cannot remove the whole document")
+
+    parent = resolve(document, tokens[:-1])
+    match parent:
+        case dict():
+            if tokens[-1] not in parent:
+                raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+            return parent.pop(tokens[-1])
+        case list():
+            return parent.pop(get_list_index(parent, tokens[-1]))
+        case _:
+            raise JsonPatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def apply_operation(document: Any, operation: dict) -> Any:
+    op = operation.get("op")
+    tokens = parse_pointer(operation.get("path", ""))
+
+    match op:
+        case "add":
+            return add_value(document, tokens, operation["value"])
+        case "remove":
+            remove_value(document, tokens)
+            return document
+        case "replace":
+            resolve(document, tokens)
+            if not tokens:
+                return operation["value"]
+            remove_value(document, tokens)
+            return add_value(document, tokens, operation["value"])
+        case "move":
+            from_tokens = parse_pointer(operation["from"])
+            if tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                raise JsonPatchError("Cannot move a value into one of its children")
+            if tokens == from_tokens:
+                resolve(document, tokens)
+                return document
+            return add_value(document, tokens, remove_value(document, from_tokens))
+        case "copy":
+            value = copy.deepcopy(resolve(document, parse_pointer(operation["from"])))
+            return add_value(document, tokens, value)
+        case "test":
+            if resolve(document, tokens) != operation["value"]:
+                raise JsonPatchError(f"Test failed at {operation['path']}")
+            return document
+        case _:
+            raise JsonPatchError(f"Unknown operation: {op!r}")
+
+
+def apply_patch(document: Document, operations: list[dict]) -> Document:
+    """
+    Applies RFC 6902 operations to `document` in place and returns the
+    result (which differs from `document` only when the root is replaced).
+    Raises JsonPatchError if any operation cannot be applied; the document
+    may then be partially modified and should be discarded.
+    """
+    for operation in operations:
+        try:
+            document = apply_operation(document, operation)
+        except KeyError as e:
+            raise JsonPatchError(f"Operation {operation.get('op')!r} is missing {e}")
+
+    return document
@@ -0,0 +1,181 @@
+"""
+Compares the thread-pool boto3 wrapper with the native async S3 client.
+
+Runs against a local S3 stand-in: either an endpoint given in
+S3_BENCHMARK_ENDPOINT (MinIO, LocalStack, ...) or an in-process moto server.
+
+    cd backend
+    pip install "moto[server]"
+    python -m benchmarks.s3_client_benchmark --objects 500 --copies 2000
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import os
+import time
+
+import boto3
+
+from app.config import settings
+
+settings.s3_access_key_id = os.getenv("S3_BENCHMARK_ACCESS_KEY", "benchmark")
+settings.s3_secret_access_key = os.getenv("S3_BENCHMARK_SECRET_KEY", "benchmark")
+settings.s3_region_name = os.getenv("S3_BENCHMARK_REGION", "us-east-1")
+settings.s3_bucket_name = os.getenv("S3_BENCHMARK_BUCKET", "benchmark")
+
+from app.s3.async_s3_client import AsyncS3Client  # noqa: E402
+
+PAYLOAD = b'{"Id": "benchmark", "LineItems": []}' * 256
+
+
+def start_stand_in() -> tuple[str, object]:
+    endpoint = os.getenv("S3_BENCHMARK_ENDPOINT")
+    if endpoint:
+        return endpoint, None
+
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    return f"http://{host}:{port}", server
+
+
+def create_bucket(endpoint: str) -> None:
+    s3 = boto3.client(
+        "s3",
+        aws_access_key_id=settings.s3_access_key_id,
+        aws_secret_access_key=settings.s3_secret_access_key,
+        region_name=settings.s3_region_name,
+        endpoint_url=endpoint,
+    )
+    try:
+        s3.create_bucket(Bucket=settings.s3_bucket_name)
+    except s3.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+
+def executor_operations(endpoint: str) -> dict:
+    executor = concurrent.futures.ThreadPoolExecutor()
+    s3 = boto3.client(
+        "s3",
+        aws_access_key_id=settings.s3_access_key_id,
+        aws_secret_access_key=settings.s3_secret_access_key,
+        region_name=settings.s3_region_name,
+        endpoint_url=endpoint,
+    )
+
+    def aio(f):
+        async def aio_wrapper(**kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, functools.partial(f, **kwargs))
+
+        return aio_wrapper
+
+    async def read(response):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, response["Body"].read)
+
+    async def close():
+        executor.shutdown(wait=True)
+
+    return {
+        "put_object": aio(s3.put_object),
+        "get_object": aio(s3.get_object),
+        "copy_object": aio(s3.copy_object),
+        "read": read,
+        "close": close,
+    }
+
+
+def native_operations(endpoint: str, pool_size: int) -> dict:
+    client = AsyncS3Client(
+        max_pool_connections=pool_size,
+        keepalive_timeout=settings.s3_keepalive_timeout,
+        connect_timeout=settings.s3_connect_timeout,
+        read_timeout=settings.s3_read_timeout,
+        retry_mode=settings.s3_retry_mode,
+        max_attempts=settings.s3_max_attempts,
+        operation_timeout=settings.s3_operation_timeout,
+        operation_timeouts=settings.s3_operation_timeouts,
+        endpoint_url=endpoint,
+    )
+
+    async def read(response):
+        async with response["Body"] as stream:
+            return await stream.read()
+
+    return {
+        "put_object": client.operation("put_object"),
+        "get_object": client.operation("get_object"),
+        "copy_object": client.operation("copy_object"),
+        "read": read,
+        "close": client.close,
+    }
+
+
+async def run_workload(name: str, operations: dict, objects: int, copies: int) -> dict:
+    bucket = settings.s3_bucket_name
+    prefix = f"benchmark/{name}/"
+    timings = {}
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        operations["put_object"](Bucket=bucket, Key=f"{prefix}src/{i}.json", Body=PAYLOAD)
+        for i in range(objects)
+    ])
+    timings["put"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        operations["copy_object"](
+            Bucket=bucket,
+            CopySource={"Bucket": bucket, "Key": f"{prefix}src/{i % objects}.json"},
+            Key=f"{prefix}copy/{i}.json",
+        )
+        for i in range(copies)
+    ])
+    timings["copy"] = time.perf_counter() - start
+
+    async def get(i: int) -> bytes:
+        response = await operations["get_object"](Bucket=bucket, Key=f"{prefix}src/{i}.json")
+        return await operations["read"](response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[get(i) for i in range(objects)])
+    timings["get"] = time.perf_counter() - start
+
+    await operations["close"]()
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=200)
+    parser.add_argument("--copies", type=int, default=1000)
+    parser.add_argument("--pool-size", type=int, default=settings.s3_max_pool_connections)
+    args = parser.parse_args()
+
+    endpoint, server = start_stand_in()
+    try:
+        create_bucket(endpoint)
+
+        results = {
+            "executor": asyncio.run(run_workload(
+                "executor", executor_operations(endpoint), args.objects, args.copies)),
+            "aiobotocore": asyncio.run(run_workload(
+                "aiobotocore", native_operations(endpoint, args.pool_size), args.objects, args.copies)),
+        }
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(f"endpoint={endpoint} objects={args.objects} copies={args.copies} pool={args.pool_size}")
+    print(f"{'client':<12}{'put, s':>10}{'copy, s':>10}{'get, s':>10}")
+    for name, timings in results.items():
+        print(f"{name:<12}{timings['put']:>10.3f}{timings['copy']:>10.3f}{timings['get']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()